@@ -1,9 +1,34 @@
-from .ingestion import collect_failures_from_allure
+from .cache import IngestionCache
+from .facets import FacetIndex
+from .ingestion import (
+    collect_failures_from_allure, iter_failures_from_allure, ingestion_cache_signature, IngestionOptions
+)
 from .fingerprinter import Fingerprinter
+from .records import FailureRecord
+from .report_cache import ReportCache
 from .reporting import generate_report_json
+from .trend_store import TrendStore
 
 __all__ = [
     'collect_failures_from_allure',
+    'iter_failures_from_allure',
+    'ingestion_cache_signature',
+    'IngestionCache',
+    'IngestionOptions',
+    'FailureRecord',
+    'FacetIndex',
     'Fingerprinter',
     'generate_report_json',
-]
\ No newline at end of file
+    'ReportCache',
+    'GroupIndex',
+    'TrendStore',
+]
+
+
+def __getattr__(name):
+    # GroupIndex needs NumPy, which only the web server uses: imported on first access
+    # so that a headless analysis does not pay for it
+    if name == 'GroupIndex':
+        from .search_index import GroupIndex
+        return GroupIndex
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
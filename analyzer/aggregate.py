@@ -0,0 +1,360 @@
+"""
+Count-based failure groups that are updated record by record or merged from
+other aggregates, for callers that do not group one finished run in memory:
+watch mode (see watch.py) and sharded map/reduce analysis.
+
+Only counters, facet counts and a bounded exemplar sample are kept per group,
+never the records. Merging is associative and commutative: counts add up and
+each group keeps the exemplars with the smallest sample keys (a stable hash of
+the result file and failure), so partial aggregates can be combined in any
+order or tree shape with the same result.
+"""
+import datetime as dt
+import gzip
+import hashlib
+import heapq
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .diff import fingerprint_hash
+from .facets import DEFAULT_FACET_LABELS, FacetIndex
+from .ingestion import _json_loads, load_attachment_excerpt
+from .records import FailureRecord
+
+DEFAULT_MAX_EXEMPLARS = 3
+
+PARTIAL_FORMAT = 'allure-analyzer-partial'
+PARTIAL_VERSION = 1
+PARTIAL_SUFFIX = '.partial.json.gz'
+
+# (sample key, exemplar fields)
+Exemplar = Tuple[int, Dict[str, Any]]
+
+
+def _sample_key(record: FailureRecord) -> int:
+    """Stable 64-bit hash of a failure (with an exemplar), identical on every machine and in every process."""
+    exemplar = record.exemplar
+    text = '\0'.join((record.source or '', record.fingerprint or '',
+                      '/'.join(exemplar.get('step_path') or []), exemplar.get('message') or ''))
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'big')
+
+
+def _merge_exemplars(a: List[Exemplar], b: List[Exemplar], limit: int) -> List[Exemplar]:
+    """The `limit` exemplars with the smallest keys out of both (sorted) samples, without duplicates."""
+    if len(a) >= limit and (not b or b[0][0] >= a[-1][0]):
+        return a  # nothing in `b` can make it into the sample
+    merged = dict(a)
+    merged.update(b)
+    return sorted(merged.items(), key=lambda kv: kv[0])[:limit]
+
+
+class GroupAggregate:
+    """Running totals of one failure group. Ids are assigned in order of first appearance and never change."""
+    __slots__ = ('id', 'fingerprint', 'count', 'failed', 'broken', 'exemplars')
+
+    def __init__(self, group_id: int, fingerprint: str):
+        self.id = group_id
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.failed = 0
+        self.broken = 0
+        self.exemplars: List[Exemplar] = []
+
+    @property
+    def exemplar(self) -> Optional[Dict[str, Any]]:
+        """The exemplar shown for the group (the first of the sample)."""
+        return self.exemplars[0][1] if self.exemplars else None
+
+    def add(self, record: FailureRecord, max_exemplars: int = DEFAULT_MAX_EXEMPLARS) -> None:
+        self.count += 1
+        status = record.status.lower()
+        if status == 'failed':
+            self.failed += 1
+        elif status == 'broken':
+            self.broken += 1
+        # Only exemplar candidates carry message/trace text
+        if record.exemplar is not None:
+            key = _sample_key(record)
+            if len(self.exemplars) < max_exemplars or key < self.exemplars[-1][0]:
+                fields = dict(record.exemplar)
+                fields['status'] = record.status
+                fields['_source'] = record.source
+                self.exemplars = _merge_exemplars(self.exemplars, [(key, fields)], max_exemplars)
+
+    def merge(self, other: 'GroupAggregate', max_exemplars: int = DEFAULT_MAX_EXEMPLARS) -> None:
+        self.count += other.count
+        self.failed += other.failed
+        self.broken += other.broken
+        self.exemplars = _merge_exemplars(self.exemplars, other.exemplars, max_exemplars)
+
+
+class FailureAggregate:
+    """Failure groups keyed by fingerprint, with per-group and global facet counts."""
+
+    def __init__(self, facet_names: Sequence[str] = DEFAULT_FACET_LABELS, include_broken: bool = True,
+                 max_exemplars: int = DEFAULT_MAX_EXEMPLARS):
+        self.include_broken = include_broken
+        self.max_exemplars = max(1, max_exemplars)
+        self.groups: Dict[str, GroupAggregate] = {}
+        self._by_id: List[GroupAggregate] = []
+        self.facet_index = FacetIndex(facet_names)
+        self.total_failures = 0
+        self.failed = 0
+        self.broken = 0
+        # Global facet totals kept up to date here, so they never need a pass over all groups
+        self._facet_totals = {name: Counter() for name in self.facet_index.facet_names}
+        self._facet_missing: Counter = Counter()
+
+    def _group(self, fingerprint: str) -> GroupAggregate:
+        group = self.groups.get(fingerprint)
+        if group is None:
+            group = self.groups[fingerprint] = GroupAggregate(len(self.groups) + 1, fingerprint)
+            self._by_id.append(group)
+        return group
+
+    def add(self, record: FailureRecord) -> Optional[GroupAggregate]:
+        """Counts one compact failure record. Returns its group, or None when the record is filtered out."""
+        status = record.status.lower()
+        if not self.include_broken and status != 'failed':
+            return None
+        fingerprint = record.fingerprint
+        group = self._group(fingerprint)
+        group.add(record, self.max_exemplars)
+        self.total_failures += 1
+        if status == 'failed':
+            self.failed += 1
+        elif status == 'broken':
+            self.broken += 1
+
+        labels = record.labels
+        self.facet_index.add(fingerprint, labels)
+        seen = set()
+        for name, value in labels:
+            totals = self._facet_totals.get(name)
+            if totals is not None:
+                totals[value] += 1
+                seen.add(name)
+        if len(seen) < len(self._facet_totals):
+            self._facet_missing.update(name for name in self._facet_totals if name not in seen)
+        return group
+
+    def add_records(self, records: Iterable[FailureRecord]) -> Set[str]:
+        """Counts a batch of records and returns the fingerprints of the groups that changed."""
+        changed = set()
+        for record in records:
+            group = self.add(record)
+            if group is not None:
+                changed.add(group.fingerprint)
+        return changed
+
+    def merge(self, other: 'FailureAggregate') -> None:
+        """Adds all groups and totals of `other` (an aggregate over different result files) to this one."""
+        for fingerprint, theirs in other.groups.items():
+            self._group(fingerprint).merge(theirs, self.max_exemplars)
+            self.facet_index.add_counts(fingerprint, other.facet_index.group_counts(fingerprint),
+                                        other.facet_index.group_missing(fingerprint))
+        self.total_failures += other.total_failures
+        self.failed += other.failed
+        self.broken += other.broken
+        for name, counts in other._facet_totals.items():
+            if name in self._facet_totals:
+                self._facet_totals[name].update(counts)
+        self._facet_missing.update({name: n for name, n in other._facet_missing.items() if name in self._facet_totals})
+
+    def merge_group(self, target: str, source: str) -> None:
+        """Folds group `source` into group `target` (e.g. near-duplicates found by clustering)."""
+        if target == source:
+            return
+        theirs = self.groups.pop(source, None)
+        if theirs is None:
+            return
+        self._group(target).merge(theirs, self.max_exemplars)
+        self.facet_index.merge_groups(target, source)
+
+    def group_by_id(self, group_id: int) -> Optional[GroupAggregate]:
+        group = self._by_id[group_id - 1] if 0 < group_id <= len(self._by_id) else None
+        return group if group is not None and self.groups.get(group.fingerprint) is group else None
+
+    def ranked(self, limit: Optional[int] = None) -> List[GroupAggregate]:
+        """Groups by descending count (all of them, or the `limit` largest)."""
+        if limit is not None and limit > 0:
+            return heapq.nlargest(limit, self.groups.values(), key=lambda g: g.count)
+        return sorted(self.groups.values(), key=lambda g: g.count, reverse=True)
+
+    def resolve_attachment_traces(self, counters: Optional[Counter] = None) -> None:
+        """Reads the attachment traces of all exemplars, so they survive without the results directory."""
+        for group in self.groups.values():
+            for _, fields in group.exemplars:
+                if not fields.get('trace') and fields.get('trace_attachment'):
+                    fields['trace'] = load_attachment_excerpt(fields['trace_attachment'], counters)
+                fields['trace_attachment'] = None
+
+    def group_dict(self, group: GroupAggregate) -> Dict[str, Any]:
+        """One group in the report's `groups` format. The example trace is fetched separately."""
+        what, where = group.fingerprint.split('|', 1) if '|' in group.fingerprint else (group.fingerprint, '')
+        facets = self.facet_index.group_counts(group.fingerprint)
+        example = group.exemplar or {}
+        percentage = (group.count / self.total_failures * 100.0) if self.total_failures > 0 else 0.0
+        return {
+            "id": group.id,
+            "title": what,
+            "count": group.count,
+            "failure_count": group.count,
+            "percentage": round(percentage, 2),
+            "status_counts": {"failed": group.failed, "broken": group.broken},
+            "fingerprint_what": what,
+            "fingerprint_where": where,
+            "fingerprint_hash": fingerprint_hash(group.fingerprint),
+            "epics": sorted(facets.get('epic', {})),
+            "features": sorted(facets.get('feature', {})),
+            "facets": facets,
+            "example": {
+                "test_name": example.get('fullName') or example.get('name'),
+                "step_path": example.get('step_path') or [],
+                "message": example.get('message', '(No message)'),
+            },
+        }
+
+    def report_groups(self) -> List[Dict[str, Any]]:
+        """All groups in report format, largest first."""
+        return [self.group_dict(group) for group in self.ranked()]
+
+    def metadata(self) -> Dict[str, Any]:
+        """Report-style metadata for the current state."""
+        return {
+            "generation_date": dt.datetime.now().isoformat(),
+            "total_failures": self.total_failures,
+            "unique_groups": len(self.groups),
+            "status_totals": {"failed": self.failed, "broken": self.broken},
+            "facet_totals": {name: dict(counts.most_common()) for name, counts in self._facet_totals.items()},
+            "facet_missing": {name: self._facet_missing.get(name, 0) for name in self._facet_totals},
+        }
+
+    # --- Partial aggregates (map/reduce) ---
+
+    def to_partial(self, signature: str, sources: int = 0) -> Dict[str, Any]:
+        """JSON-serializable form of the aggregate. `signature` identifies the fingerprinting setup."""
+        return {
+            "format": PARTIAL_FORMAT,
+            "version": PARTIAL_VERSION,
+            "signature": signature,
+            "facet_names": list(self.facet_index.facet_names),
+            "include_broken": self.include_broken,
+            "max_exemplars": self.max_exemplars,
+            "sources": sources,
+            "total_failures": self.total_failures,
+            "failed": self.failed,
+            "broken": self.broken,
+            "facet_totals": {name: dict(counts) for name, counts in self._facet_totals.items()},
+            "facet_missing": dict(self._facet_missing),
+            "groups": [
+                [g.fingerprint, g.count, g.failed, g.broken,
+                 {name: values for name, values in self.facet_index.group_counts(g.fingerprint).items() if values},
+                 self.facet_index.group_missing(g.fingerprint),
+                 [[key, fields] for key, fields in g.exemplars]]
+                for g in self.groups.values()
+            ],
+        }
+
+    def merge_partial(self, data: Dict[str, Any]) -> None:
+        """Merges a decoded partial aggregate (see to_partial) without building an aggregate for it first."""
+        _check_partial(data)
+        limit = self.max_exemplars
+        add_facets = self.facet_index.add_counts
+        for fingerprint, count, failed, broken, facets, missing, exemplars in data["groups"]:
+            group = self.groups.get(fingerprint) or self._group(fingerprint)
+            group.count += count
+            group.failed += failed
+            group.broken += broken
+            if exemplars:
+                group.exemplars = _merge_exemplars(group.exemplars, exemplars, limit)
+            if facets or missing:
+                add_facets(fingerprint, facets, missing)
+        self.total_failures += data["total_failures"]
+        self.failed += data["failed"]
+        self.broken += data["broken"]
+        for name, counts in data["facet_totals"].items():
+            if name in self._facet_totals:
+                self._facet_totals[name].update(counts)
+        self._facet_missing.update({name: n for name, n in data["facet_missing"].items() if name in self._facet_totals})
+
+    @classmethod
+    def from_partial(cls, data: Dict[str, Any]) -> 'FailureAggregate':
+        _check_partial(data)
+        aggregate = cls(data["facet_names"], include_broken=data.get("include_broken", True),
+                        max_exemplars=data.get("max_exemplars", DEFAULT_MAX_EXEMPLARS))
+        aggregate.merge_partial(data)
+        return aggregate
+
+
+def _check_partial(data: Dict[str, Any]) -> None:
+    if not isinstance(data, dict) or data.get("format") != PARTIAL_FORMAT:
+        raise ValueError("not a partial aggregate file")
+    if data.get("version") != PARTIAL_VERSION:
+        raise ValueError(f"unsupported partial aggregate version {data.get('version')}")
+
+
+def write_partial(aggregate: FailureAggregate, path: str, signature: str, sources: int = 0) -> None:
+    """Writes a gzip-compressed partial aggregate file."""
+    payload = json.dumps(aggregate.to_partial(signature, sources), ensure_ascii=False, separators=(',', ':'))
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        f.write(payload)
+
+
+def _load_partial(path: str) -> Dict[str, Any]:
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if raw[:2] == b'\x1f\x8b':
+        raw = gzip.decompress(raw)
+    data = _json_loads(raw)
+    _check_partial(data)
+    return data
+
+
+def _merge_partial_files(paths: Sequence[str]) -> Tuple[Dict[str, Any], List[str]]:
+    """Merges partial files into one decoded partial plus the distinct signatures seen. Runs in reduce workers."""
+    merged: Optional[FailureAggregate] = None
+    signatures: List[str] = []
+    sources = 0
+    for path in paths:
+        data = _load_partial(path)
+        sources += data.get("sources", 0)
+        if data.get("signature") not in signatures:
+            signatures.append(data.get("signature"))
+        if merged is None:
+            merged = FailureAggregate.from_partial(data)
+        else:
+            merged.merge_partial(data)
+    return merged.to_partial(signatures[0], sources), signatures
+
+
+def merge_partials(paths: Sequence[str], max_workers: int = 1) -> Tuple[FailureAggregate, Dict[str, Any]]:
+    """
+    Merges partial aggregate files into one aggregate. Returns it with the merged
+    header: summed `sources` and every distinct `signature` (more than one means the
+    shards were fingerprinted with different rules or options). With several
+    workers, slices of the files are merged in parallel first (a two-level tree).
+    """
+    if not paths:
+        raise ValueError("no partial aggregates to merge")
+    workers = max(1, min(max_workers, len(paths) // 2))
+    if workers == 1:
+        slices = [_merge_partial_files(paths)]
+    else:
+        step = -(-len(paths) // workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            slices = list(executor.map(_merge_partial_files, [paths[i:i + step] for i in range(0, len(paths), step)]))
+
+    merged: Optional[FailureAggregate] = None
+    signatures: List[str] = []
+    sources = 0
+    for data, slice_signatures in slices:
+        sources += data.get("sources", 0)
+        signatures.extend(sig for sig in slice_signatures if sig not in signatures)
+        if merged is None:
+            merged = FailureAggregate.from_partial(data)
+        else:
+            merged.merge_partial(data)
+    return merged, {"sources": sources, "signatures": signatures, "partials": len(paths)}
@@ -0,0 +1,143 @@
+"""
+Compact views of reports for the AI analyst's tools.
+
+Every tool result is sent to the model on each following turn of a chat, so the
+views keep only what answers questions (titles, counts, statuses, top facet
+values, a short example message) and are trimmed to a token budget. Full traces
+are only included for a single group on request.
+"""
+import heapq
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+# Rough size of a token in characters of JSON, good enough for budgeting
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 4000
+DEFAULT_TOP_K = 10
+
+_MAX_TITLE_CHARS = 200
+_MAX_MESSAGE_CHARS = 300
+_FACET_VALUES_PER_GROUP = 3
+_FACET_VALUES_PER_REPORT = 5
+
+
+def estimate_tokens(value: Any) -> int:
+    """Approximate number of tokens `value` takes once serialized as JSON."""
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str,
+                                                           separators=(',', ':'))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_text(text: Optional[str], max_chars: int) -> str:
+    """`text` cut to `max_chars` characters, noting how much was left out."""
+    text = text or ''
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}… [{len(text) - max_chars} more characters]"
+
+
+def fit_to_budget(payload: Dict[str, Any], list_key: str, token_budget: int,
+                  convert: Optional[Callable[[Any], Any]] = None) -> Dict[str, Any]:
+    """
+    Keeps the leading items of payload[list_key] that fit in `token_budget` tokens
+    together with the rest of the payload (at least one item), and records how
+    many were left out. Items are passed through `convert` only once they are kept.
+    """
+    items = payload.get(list_key) or []
+    used = estimate_tokens({**payload, list_key: []})
+    kept = []
+    for item in items:
+        if convert is not None:
+            item = convert(item)
+        cost = estimate_tokens(item)
+        if kept and used + cost > token_budget:
+            break
+        kept.append(item)
+        used += cost
+    result = {**payload, list_key: kept}
+    if len(kept) < len(items):
+        result["omitted"] = len(items) - len(kept)
+        result["note"] = (f"Trimmed to a budget of about {token_budget} tokens; "
+                          "ask for fewer, specific or searched groups to see the rest.")
+    return result
+
+
+def _top_facet_values(facets: Dict[str, Dict[str, int]], limit: int) -> Dict[str, List[str]]:
+    """The `limit` most frequent values of each facet, facets without values left out."""
+    top = {}
+    for name, counts in facets.items():
+        if counts:
+            top[name] = [value for value, _ in heapq.nlargest(limit, counts.items(), key=lambda kv: kv[1])]
+    return top
+
+
+def compact_group(group: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of a report group the analyst needs, without the trace."""
+    example = group.get('example') or {}
+    facets = group.get('facets') or {'epic': dict.fromkeys(group.get('epics') or [], 1),
+                                     'feature': dict.fromkeys(group.get('features') or [], 1)}
+    compact = {
+        "id": group.get('id'),
+        "title": truncate_text(group.get('title'), _MAX_TITLE_CHARS),
+        "count": group.get('count', 0),
+        "status_counts": group.get('status_counts') or {},
+        "where": group.get('fingerprint_where'),
+        "top_facets": _top_facet_values(facets, _FACET_VALUES_PER_GROUP),
+        "example_test": example.get('test_name'),
+        "example_message": truncate_text(example.get('message'), _MAX_MESSAGE_CHARS),
+    }
+    if group.get('member_fingerprints'):
+        compact["merged_fingerprints"] = len(group['member_fingerprints'])
+    return compact
+
+
+def top_groups(groups: List[Dict[str, Any]], top_k: Optional[int]) -> List[Dict[str, Any]]:
+    """The `top_k` largest groups (all of them for None), largest first."""
+    if top_k is None or top_k >= len(groups):
+        return sorted(groups, key=lambda g: g.get('count', 0), reverse=True)
+    return heapq.nlargest(max(top_k, 0), groups, key=lambda g: g.get('count', 0))
+
+
+def report_summary(data: Optional[Dict[str, Any]], top_k: Optional[int] = DEFAULT_TOP_K,
+                   token_budget: int = DEFAULT_TOKEN_BUDGET) -> Dict[str, Any]:
+    """
+    Totals, status counts and the most frequent facet values of a report plus its
+    `top_k` largest groups (as many as fit when None), within `token_budget` tokens.
+    """
+    data = data or {}
+    metadata = data.get('metadata') or {}
+    groups = data.get('groups') or []
+    status_totals = {"failed": 0, "broken": 0}
+    for group in groups:
+        for status, count in (group.get('status_counts') or {}).items():
+            status_totals[status] = status_totals.get(status, 0) + count
+    payload = {
+        "generation_date": metadata.get('generation_date'),
+        "total_failures": metadata.get('total_failures'),
+        "unique_groups": metadata.get('unique_groups', len(groups)),
+        "status_totals": status_totals,
+        "top_facet_values": _top_facet_values(metadata.get('facet_totals') or {}, _FACET_VALUES_PER_REPORT),
+        "groups": top_groups(groups, top_k),
+    }
+    return fit_to_budget(payload, "groups", token_budget, convert=compact_group)
+
+
+def group_details(group: Dict[str, Any], trace: Optional[str],
+                  token_budget: int = DEFAULT_TOKEN_BUDGET) -> Dict[str, Any]:
+    """One group with all its facet counts and its example trace, the trace cut to fit `token_budget`."""
+    example = group.get('example') or {}
+    details = {
+        **compact_group(group),
+        "facets": group.get('facets') or {},
+        "example_step_path": example.get('step_path') or [],
+        "merged_fingerprints": group.get('member_fingerprints') or [],
+    }
+    details.pop("top_facets")
+    room = max(token_budget - estimate_tokens(details), 0) * CHARS_PER_TOKEN
+    excerpt = truncate_text(trace, room)
+    if estimate_tokens({**details, "example_trace": excerpt}) > token_budget:
+        # JSON escapes (newlines, quotes) make a trace longer than its character count
+        escaped = len(json.dumps(excerpt, ensure_ascii=False)) - 2 - len(excerpt)
+        excerpt = truncate_text(trace, max(room - escaped, 0))
+    details["example_trace"] = excerpt
+    return details
@@ -0,0 +1,87 @@
+import json
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .records import FailureRecord, LabelSetTable
+
+class IngestionCache:
+    """
+    Persistent per-file cache of ingestion results, keyed by path, size and mtime.
+    An empty record list is stored for files without failures, so passed results
+    are skipped on re-runs as well. The whole cache is dropped when its signature
+    (ingestion code version + fingerprint rules) changes.
+    """
+
+    def __init__(self, db_path: str, signature: str):
+        self.db_path = db_path
+        self.signature = signature
+        self.hits = 0
+        self.misses = 0
+        self._index: Dict[str, Tuple[int, int, bool]] = {}
+        # Records of all cached files share label sets, as fresh records do
+        self._label_sets = LabelSetTable()
+
+        parent = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                has_failures INTEGER NOT NULL,
+                records TEXT NOT NULL
+            );
+        """)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        if row is None or row[0] != signature:
+            if row is not None:
+                print("🟡 Ingestion cache signature changed, discarding cached results.")
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('signature', ?)", (signature,))
+            self._conn.commit()
+
+    def load_directory(self, results_dir: str) -> None:
+        """Preloads the (size, mtime) index for one results directory in a single query."""
+        prefix = os.path.join(os.path.abspath(results_dir), '')
+        rows = self._conn.execute(
+            "SELECT path, size, mtime_ns, has_failures FROM files WHERE substr(path, 1, ?) = ?",
+            (len(prefix), prefix),
+        )
+        self._index = {path: (size, mtime_ns, bool(has_failures)) for path, size, mtime_ns, has_failures in rows}
+
+    def get(self, path: str, size: int, mtime_ns: int) -> Optional[List[FailureRecord]]:
+        """Returns the cached records for an unchanged file, or None on a miss."""
+        entry = self._index.get(path)
+        if entry is None or entry[0] != size or entry[1] != mtime_ns:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if not entry[2]:
+            return []
+        row = self._conn.execute("SELECT records FROM files WHERE path = ?", (path,)).fetchone()
+        if not row:
+            return []
+        return [FailureRecord.from_row(r, self._label_sets) for r in json.loads(row[0])]
+
+    def put(self, path: str, size: int, mtime_ns: int, records: List[FailureRecord]) -> None:
+        rows = [record.to_row() for record in records]
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, has_failures, records) VALUES (?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, int(bool(records)), json.dumps(rows, ensure_ascii=False)),
+        )
+
+    def prune(self, seen_paths: Iterable[str]) -> None:
+        """Forgets files of the loaded directory that no longer exist."""
+        stale = set(self._index) - set(seen_paths)
+        if stale:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in stale))
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class ChatSessionStore:
+    """
+    Thread-safe store of chat histories for a long-running server. Sessions idle
+    for longer than `ttl_seconds` expire, and only the `max_sessions` most recently
+    used ones are kept. Histories are stored as given (a list of messages of any
+    type); compact them with `truncate_history` before storing.
+    """
+
+    def __init__(self, max_sessions: int = 200, ttl_seconds: float = 7200,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._sessions: 'OrderedDict[str, Tuple[float, List[Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        # Least recently used first: stop at the first session that is still fresh
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if now - last_used <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+
+    def get(self, session_id: str) -> Optional[List[Any]]:
+        """A copy of the session's history, or None for unknown or expired sessions."""
+        with self._lock:
+            self._expire(self._clock())
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            return list(entry[1])
+
+    def put(self, session_id: str, history: List[Any]) -> None:
+        """Stores the session's history, evicting the least recently used sessions beyond max_sessions."""
+        with self._lock:
+            now = self._clock()
+            self._sessions[session_id] = (now, list(history))
+            self._sessions.move_to_end(session_id)
+            self._expire(now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+def truncate_history(history: List[Any], keep_head: int, max_messages: int,
+                     summarize: Callable[[List[Any]], List[Any]]) -> List[Any]:
+    """
+    Keeps the first `keep_head` messages (e.g. the priming) and the newest
+    `max_messages` of the rest. Older messages are replaced by the messages
+    `summarize` makes of them. Histories alternate user and model messages, so
+    whole turns are dropped.
+    """
+    body = history[keep_head:]
+    if len(body) <= max_messages:
+        return history
+    cut = len(body) - max_messages
+    cut += cut % 2
+    return history[:keep_head] + list(summarize(body[:cut])) + body[cut:]
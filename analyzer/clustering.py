@@ -0,0 +1,113 @@
+"""
+Near-duplicate clustering of failure fingerprints (MinHash + locality-sensitive hashing).
+
+Exact grouping splits one root cause into many groups whenever a message contains
+selectors, IDs or timestamps the generic rules do not normalize. This stage merges
+groups whose message keys are similar (estimated Jaccard similarity of character
+3-gram shingles) and that share the same code location, in roughly linear time.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+_SHINGLE = 3
+_MAX_KEY_CHARS = 512  # message keys are shortened to 160 chars; this only guards the gram arrays
+
+def _lsh_shape(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Picks (bands, rows) so the LSH candidate threshold sits just below the similarity threshold."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        candidate_threshold = (1.0 / bands) ** (1.0 / rows)
+        score = abs(candidate_threshold - threshold * 0.9)
+        if best is None or score < best[0]:
+            best = (score, bands, rows)
+    return best[1], best[2]
+
+def _shingle_codes(keys: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (gram codes, grams per key) for all character 3-grams of all keys,
+    computed on one concatenated byte buffer. Codes are laid out key by key.
+    """
+    encoded = [("^^" + k.lower()[:_MAX_KEY_CHARS] + "$").encode("utf-8") for k in keys]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    buf = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+
+    offsets = np.zeros(len(encoded), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    counts = lengths - (_SHINGLE - 1)  # the '^^'/'$' padding guarantees at least one gram per key
+    gram_starts = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(offsets, counts)
+
+    codes = (buf[gram_starts] << np.uint64(16)) | (buf[gram_starts + 1] << np.uint64(8)) | buf[gram_starts + 2]
+    return codes, counts
+
+def minhash_signatures(keys: Sequence[str], num_perm: int = 64, seed: int = 1) -> np.ndarray:
+    """MinHash signatures (len(keys) x num_perm, uint32) using multiply-shift hashing."""
+    codes, counts = _shingle_codes(keys)
+    starts = np.cumsum(counts) - counts
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    sig = np.empty((len(keys), num_perm), dtype=np.uint32)
+    with np.errstate(over='ignore'):
+        for i in range(num_perm):
+            hashed = ((a[i] * codes + b[i]) >> np.uint64(32)).astype(np.uint32)
+            sig[:, i] = np.minimum.reduceat(hashed, starts)
+    return sig
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def cluster_fingerprints(fingerprints: Sequence[str], threshold: float = 0.8,
+                         num_perm: int = 64, seed: int = 1) -> List[List[int]]:
+    """
+    Clusters fingerprints ('message_key|code_location') whose message keys are
+    near-duplicates and whose code locations are equal. Returns lists of indices
+    into `fingerprints`, one per cluster with at least two members.
+    """
+    n = len(fingerprints)
+    if n < 2:
+        return []
+
+    whats, wheres = zip(*(fp.split('|', 1) if '|' in fp else (fp, '') for fp in fingerprints))
+    _, location_ids = np.unique(np.array(wheres, dtype=object), return_inverse=True)
+    location_ids = location_ids.astype(np.uint64)
+    sig = minhash_signatures(whats, num_perm=num_perm, seed=seed)
+
+    bands, rows = _lsh_shape(num_perm, threshold)
+    rng = np.random.default_rng(seed + 1)
+    mixers = rng.integers(1, 2 ** 63, size=rows + 1, dtype=np.uint64) | np.uint64(1)
+    parent = list(range(n))
+
+    with np.errstate(over='ignore'):
+        for band in range(bands):
+            block = sig[:, band * rows:(band + 1) * rows].astype(np.uint64)
+            # Bucket key: band rows mixed with the code location (collisions are filtered below)
+            bucket = (block * mixers[:rows]).sum(axis=1) + location_ids * mixers[rows]
+            order = np.argsort(bucket, kind='stable')
+            sorted_bucket = bucket[order]
+            is_head = np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]]
+            head_pos = np.maximum.accumulate(np.where(is_head, np.arange(n), 0))
+            heads = order[head_pos]
+
+            members = np.flatnonzero(~is_head)
+            if not len(members):
+                continue
+            a_idx, b_idx = order[members], heads[members]
+            similar = (sig[a_idx] == sig[b_idx]).mean(axis=1) >= threshold
+            similar &= location_ids[a_idx] == location_ids[b_idx]
+            for x, y in zip(a_idx[similar].tolist(), b_idx[similar].tolist()):
+                rx, ry = _find(parent, x), _find(parent, y)
+                if rx != ry:
+                    parent[rx] = ry
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(n):
+        clusters.setdefault(_find(parent, i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
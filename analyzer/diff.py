@@ -0,0 +1,124 @@
+"""
+Comparison of failure groups between runs ("what changed since the last run?").
+
+Every report group carries a `fingerprint_hash`, a stable hash of its fingerprint,
+so two runs are compared with one pass over the groups of each: the cost does not
+depend on the number of failures. A run can also be compared with a rolling
+baseline, the mean count of every group over the previous N runs. Only the groups
+stored in the reports take part (see `top_n_groups_to_report`).
+"""
+import hashlib
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+DEFAULT_BASELINE_RUNS = 5
+# A group grew or shrank when its count changed by at least MIN_CHANGE failures and MIN_RATIO of its old count
+DEFAULT_MIN_CHANGE = 2
+DEFAULT_MIN_RATIO = 0.25
+
+DIFF_KINDS = ('new', 'resolved', 'grown', 'shrunk')
+
+
+def fingerprint_hash(fingerprint: str) -> str:
+    """Stable 16-hex-digit hash of a group fingerprint, identical in every process and on every machine."""
+    return hashlib.blake2b(fingerprint.encode('utf-8', 'surrogatepass'), digest_size=8).hexdigest()
+
+
+class GroupCounts(NamedTuple):
+    """The part of a report group a diff needs."""
+    id: Optional[int]
+    title: str
+    where: str
+    count: float
+    failed: float
+    broken: float
+
+
+def group_hash(group: Dict[str, Any]) -> str:
+    """A report group's fingerprint hash (computed for reports written before hashes were stored)."""
+    stored = group.get('fingerprint_hash')
+    if stored:
+        return stored
+    what = group.get('fingerprint_what') or group.get('title') or ''
+    return fingerprint_hash(f"{what}|{group.get('fingerprint_where') or ''}")
+
+
+def report_group_counts(data: Optional[Dict[str, Any]]) -> Dict[str, GroupCounts]:
+    """Fingerprint hash -> GroupCounts for all groups of a parsed report."""
+    counts = {}
+    for group in (data or {}).get('groups') or []:
+        status = group.get('status_counts') or {}
+        counts[group_hash(group)] = GroupCounts(
+            group.get('id'), group.get('fingerprint_what') or group.get('title') or '',
+            group.get('fingerprint_where') or '', group.get('count', 0),
+            status.get('failed', 0), status.get('broken', 0))
+    return counts
+
+
+def baseline_counts(runs: Sequence[Dict[str, GroupCounts]]) -> Dict[str, GroupCounts]:
+    """
+    The mean counts of every group over `runs` (newest first), a group counting 0 in
+    runs without it. Titles and ids are those of the newest run containing the group.
+    """
+    if not runs:
+        return {}
+    sums: Dict[str, List[float]] = {}
+    latest: Dict[str, GroupCounts] = {}
+    for run in runs:
+        for key, group in run.items():
+            total = sums.setdefault(key, [0.0, 0.0, 0.0])
+            total[0] += group.count
+            total[1] += group.failed
+            total[2] += group.broken
+            latest.setdefault(key, group)
+    n = len(runs)
+    return {key: latest[key]._replace(count=round(c / n, 2), failed=round(f / n, 2), broken=round(b / n, 2))
+            for key, (c, f, b) in sums.items()}
+
+
+def _change(key: str, base: Optional[GroupCounts], head: Optional[GroupCounts]) -> Dict[str, Any]:
+    shown = head or base
+    base_count = base.count if base else 0
+    head_count = head.count if head else 0
+    return {"fingerprint_hash": key, "id": head.id if head else None, "base_id": base.id if base else None,
+            "title": shown.title, "where": shown.where, "base_count": base_count, "count": head_count,
+            "change": round(head_count - base_count, 2)}
+
+
+def diff_group_counts(base: Dict[str, GroupCounts], head: Dict[str, GroupCounts],
+                      min_change: float = DEFAULT_MIN_CHANGE, min_ratio: float = DEFAULT_MIN_RATIO,
+                      limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Groups of `head` that are new (not in `base`), resolved (only in `base`), grown or
+    shrunk, each list ordered by the size of the change and cut to `limit` entries
+    (`counts` always has the full numbers). One pass over each side: O(groups).
+    """
+    changes: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in DIFF_KINDS}
+    unchanged = 0
+    for key, group in head.items():
+        old = base.get(key)
+        if old is None or not old.count:
+            changes['new'].append(_change(key, old, group))
+            continue
+        delta = group.count - old.count
+        if abs(delta) >= min_change and abs(delta) >= min_ratio * old.count:
+            changes['grown' if delta > 0 else 'shrunk'].append(_change(key, old, group))
+        else:
+            unchanged += 1
+    for key, old in base.items():
+        if key not in head and old.count:
+            changes['resolved'].append(_change(key, old, None))
+
+    changes['new'].sort(key=lambda c: -c['count'])
+    changes['resolved'].sort(key=lambda c: -c['base_count'])
+    changes['grown'].sort(key=lambda c: -c['change'])
+    changes['shrunk'].sort(key=lambda c: c['change'])
+    result: Dict[str, Any] = {
+        "base_failures": round(sum(g.count for g in base.values()), 2),
+        "failures": sum(g.count for g in head.values()),
+        "base_groups": len(base),
+        "groups": len(head),
+        "counts": {**{kind: len(changes[kind]) for kind in DIFF_KINDS}, "unchanged": unchanged},
+    }
+    for kind in DIFF_KINDS:
+        result[kind] = changes[kind][:limit] if limit is not None else changes[kind]
+    return result
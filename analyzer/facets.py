@@ -0,0 +1,98 @@
+from collections import Counter
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+DEFAULT_FACET_LABELS = ('epic', 'feature', 'suite', 'owner', 'severity', 'host')
+
+class FacetIndex:
+    """
+    Per-group label value counts for a configurable set of label names (facets),
+    built incrementally while failures are grouped, so reporting never has to walk
+    the labels of every item again.
+    """
+
+    def __init__(self, facet_names: Sequence[str] = DEFAULT_FACET_LABELS):
+        self.facet_names = tuple(facet_names)
+        self._wanted = frozenset(self.facet_names)
+        # Plain dicts, created only for facets a group actually has: partial aggregates
+        # with tens of thousands of groups are merged through add_counts()
+        self._groups: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._missing: Dict[str, Dict[str, int]] = {}
+
+    def add(self, group_key: str, labels: Iterable[Tuple[str, str]]) -> None:
+        """Counts the (name, value) label pairs of one failure record."""
+        facets = self._groups.get(group_key)
+        if facets is None:
+            facets = self._groups[group_key] = {}
+            self._missing[group_key] = {}
+        seen = set()
+        for name, value in labels:
+            if name in self._wanted:
+                counts = facets.get(name)
+                if counts is None:
+                    facets[name] = {value: 1}
+                else:
+                    counts[value] = counts.get(value, 0) + 1
+                seen.add(name)
+        if len(seen) < len(self.facet_names):
+            missing = self._missing[group_key]
+            for name in self.facet_names:
+                if name not in seen:
+                    missing[name] = missing.get(name, 0) + 1
+
+    def merge_groups(self, target: str, source: str) -> None:
+        """Folds the counts of group `source` into group `target` (e.g. after clustering)."""
+        facets = self._groups.pop(source, None)
+        missing = self._missing.pop(source, None)
+        if facets is None:
+            return
+        if target not in self._groups:
+            self._groups[target], self._missing[target] = facets, missing
+            return
+        self.add_counts(target, facets, missing)
+
+    def add_counts(self, group_key: str, counts: Dict[str, Dict[str, int]], missing: Dict[str, int]) -> None:
+        """Adds precomputed value counts and missing counts to a group (e.g. from a partial aggregate)."""
+        facets = self._groups.get(group_key)
+        if facets is None:
+            facets = self._groups[group_key] = {}
+            self._missing[group_key] = {}
+        for name, values in counts.items():
+            if name in self._wanted:
+                target = facets.get(name)
+                if target is None:
+                    facets[name] = dict(values)
+                else:
+                    for value, n in values.items():
+                        target[value] = target.get(value, 0) + n
+        target = self._missing[group_key]
+        for name, n in missing.items():
+            if name in self._wanted:
+                target[name] = target.get(name, 0) + n
+
+    def group_missing(self, group_key: str) -> Dict[str, int]:
+        """Number of failures of one group without any value for each facet (facets with none omitted)."""
+        return dict(self._missing.get(group_key, {}))
+
+    def group_counts(self, group_key: str) -> Dict[str, Dict[str, int]]:
+        """Value counts per facet for one group, most frequent first."""
+        facets = self._groups.get(group_key, {})
+        return {name: _most_common(facets[name]) if name in facets else {} for name in self.facet_names}
+
+    def totals(self, group_keys: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, int]]:
+        """Value counts per facet summed over the given groups (all groups by default)."""
+        totals = {name: Counter() for name in self.facet_names}
+        for key in self._groups if group_keys is None else group_keys:
+            for name, counts in self._groups.get(key, {}).items():
+                totals[name].update(counts)
+        return {name: dict(counts.most_common()) for name, counts in totals.items()}
+
+    def missing_totals(self, group_keys: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Number of failures without any value for each facet, summed over the given groups."""
+        totals = Counter()
+        for key in self._missing if group_keys is None else group_keys:
+            totals.update(self._missing.get(key, {}))
+        return {name: totals.get(name, 0) for name in self.facet_names}
+
+
+def _most_common(counts: Dict[str, int]) -> Dict[str, int]:
+    return dict(sorted(counts.items(), key=lambda kv: kv[1], reverse=True))
@@ -1,38 +1,258 @@
+import hashlib
 import re
 import os
-from typing import Dict, Any
+import time
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
 
 _WHITESPACE_RE = re.compile(r"\s+")
+_CUSTOM_MESSAGE_RE = re.compile(r"^\s*Custom message\s*:", re.IGNORECASE)
+_CODE_LOCATION_RE = re.compile(r'at .*?((?:[/\\A-Za-z0-9_-]+\.)+spec\.(?:ts|js):\d+:\d+)')
+
+_FLAG_NAMES = {"IGNORECASE": re.IGNORECASE, "DOTALL": re.DOTALL, "MULTILINE": re.MULTILINE}
+_MIN_LITERAL_LEN = 3
+# Escapes followed by a fixed number of argument characters (\xhh, \uhhhh, \Uhhhhhhhh)
+_ESCAPE_ARG_LEN = {'x': 2, 'u': 4, 'U': 8}
+_MAX_TRACE_MEMO = 1024  # traces can be up to 20KB each
 
 def _flatten_whitespace(s: str) -> str:
     """Collapse any whitespace (including newlines) to a single space."""
     return _WHITESPACE_RE.sub(" ", s or "").strip()
 
+class Rule(NamedTuple):
+    name: str
+    pattern: "re.Pattern"
+    replacement: str
+    literal: str  # lowercase substring every match must contain ('' = always a candidate)
+
+def _required_literal(source: str) -> str:
+    """
+    Extracts the longest literal substring that every match of a regex must contain.
+    Only top-level literal runs are considered; anything inside groups, classes or
+    optional quantifiers is skipped, and top-level alternation disables the prefilter.
+    Escapes other than escaped punctuation (\\d, \\x41, \\N{...}, \\1, ...) end a run.
+    """
+    runs, current = [], []
+    depth, i, n = 0, 0, len(source)
+    while i < n:
+        c, lit, start = source[i], None, i
+        if c == '\\':
+            nxt = source[i + 1] if i + 1 < n else ''
+            i += 2
+            if nxt in _ESCAPE_ARG_LEN:
+                i += _ESCAPE_ARG_LEN[nxt]
+            elif nxt == 'N' and i < n and source[i] == '{':
+                close = source.find('}', i)
+                i = close + 1 if close != -1 else n
+            elif nxt.isdigit():
+                # Octal escape (\0, \0NN, \NNN) or group reference (\N, \NN)
+                while i < n and source[i].isdigit() and i - start < 4:
+                    i += 1
+            elif depth == 0 and nxt and not nxt.isalnum():
+                lit = nxt
+        elif c == '[':
+            j = i + 1
+            if j < n and source[j] == '^':
+                j += 1
+            if j < n and source[j] == ']':
+                j += 1
+            while j < n and source[j] != ']':
+                j += 2 if source[j] == '\\' else 1
+            i = j + 1
+        elif c == '(':
+            depth += 1
+            i += 1
+        elif c == ')':
+            depth -= 1
+            i += 1
+        elif c == '|':
+            if depth == 0:
+                return ''
+            i += 1
+        elif c in '*?+{':
+            # The quantified atom is optional unless the quantifier is '+'
+            if c != '+' and current:
+                current.pop()
+            if c == '{':
+                close = source.find('}', i)
+                i = close + 1 if close != -1 else i + 1
+            else:
+                i += 1
+            if i < n and source[i] in '?+':
+                i += 1
+        elif c in '.^$':
+            i += 1
+        else:
+            lit = c if depth == 0 else None
+            i += 1
+
+        if lit is None:
+            runs.append(''.join(current))
+            current = []
+        else:
+            current.append(lit)
+    runs.append(''.join(current))
+
+    best = max(runs, key=len)
+    return best.lower() if len(best) >= _MIN_LITERAL_LEN else ''
+
+def _trie_regex(literals: Iterable[str]) -> str:
+    """Builds a trie-shaped regex so a single scan finds the longest literal at each position."""
+    trie: Dict[str, Any] = {}
+    for lit in literals:
+        node = trie
+        for ch in lit:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def _build(node: Dict[str, Any]) -> str:
+        terminal = '' in node
+        branches = [re.escape(ch) + _build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            return '(?:' + body + ')?'
+        return body
+
+    return _build(trie)
+
 class Fingerprinter:
-    def __init__(self, **kwargs):
-        self.specific_patterns = [
-            (re.compile(r"waiting for selector `(.*?)` failed", re.IGNORECASE), r"Timeout for selector: \1"),
-            (re.compile(r"Custom message:\s*Expected the status code to be (\d+), but found (\d+)", re.IGNORECASE | re.DOTALL), r"Assertion: Expected status code \1 but received \2"),
-            (re.compile(r"Custom message:\s*(export didn't end with status SUCCEEDED, but ended with status IN_PROGRESS)", re.IGNORECASE | re.DOTALL), r"Assertion: \1"),
-            (re.compile(r"Custom message:\s*(expected toggle icon to be not displayed)", re.IGNORECASE | re.DOTALL), r"Assertion: \1"),
-            (re.compile(r"Custom message:\s*(checkbox is not checked:.*)", re.IGNORECASE | re.DOTALL), r"Assertion: Checkbox not checked"),
-            (re.compile(r"URL: (.*)", re.IGNORECASE), r"Navigation error on URL: \1"),
-            (re.compile(r"Missing test issue id for Xray report", re.IGNORECASE), r"Config error: Missing Xray issue ID"),
-            (re.compile(r"NO_ENTITY_FOUND_ERROR", re.IGNORECASE), r"Backend error: NO_ENTITY_FOUND_ERROR"),
-            (re.compile(r"Failed to load resource: (net::\w+)", re.IGNORECASE), r"Network error: \1"),
-            # Shorten very long CSP message
-            (re.compile(r"Refused to execute inline (?:event handler|script).*?Content Security Policy", re.IGNORECASE | re.DOTALL),
-             "CSP Violation: Refused to execute inline script"),
-        ]
-
-        self.generic_patterns = [
-            (re.compile(r"[a-f0-9]{8}-?[a-f0-9]{4}-?[a-f0-9]{4}-?[a-f0-9]{4}-?[a-f0-9]{12}", re.I), "<UUID>"),
-            (re.compile(r"\b\d{5,}\b"), "<LONG_NUM>"),
-            (re.compile(r"status of (\d{3})"), r"status of <STATUS_CODE>"),
-        ]
+    # Built-in rules: (name, pattern, flags, replacement)
+    DEFAULT_SPECIFIC_RULES = [
+        ("selector_timeout", r"waiting for selector `(.*?)` failed", re.IGNORECASE, r"Timeout for selector: \1"),
+        ("status_code_assertion", r"Custom message:\s*Expected the status code to be (\d+), but found (\d+)", re.IGNORECASE | re.DOTALL, r"Assertion: Expected status code \1 but received \2"),
+        ("export_in_progress", r"Custom message:\s*(export didn't end with status SUCCEEDED, but ended with status IN_PROGRESS)", re.IGNORECASE | re.DOTALL, r"Assertion: \1"),
+        ("toggle_icon_displayed", r"Custom message:\s*(expected toggle icon to be not displayed)", re.IGNORECASE | re.DOTALL, r"Assertion: \1"),
+        ("checkbox_not_checked", r"Custom message:\s*(checkbox is not checked:.*)", re.IGNORECASE | re.DOTALL, r"Assertion: Checkbox not checked"),
+        ("navigation_url", r"URL: (.*)", re.IGNORECASE, r"Navigation error on URL: \1"),
+        ("missing_xray_issue", r"Missing test issue id for Xray report", re.IGNORECASE, r"Config error: Missing Xray issue ID"),
+        ("no_entity_found", r"NO_ENTITY_FOUND_ERROR", re.IGNORECASE, r"Backend error: NO_ENTITY_FOUND_ERROR"),
+        ("network_error", r"Failed to load resource: (net::\w+)", re.IGNORECASE, r"Network error: \1"),
+        # Shorten very long CSP message
+        ("csp_violation", r"Refused to execute inline (?:event handler|script).*?Content Security Policy", re.IGNORECASE | re.DOTALL,
+         "CSP Violation: Refused to execute inline script"),
+    ]
+
+    DEFAULT_GENERIC_RULES = [
+        ("uuid", r"[a-f0-9]{8}-?[a-f0-9]{4}-?[a-f0-9]{4}-?[a-f0-9]{4}-?[a-f0-9]{12}", re.I, "<UUID>"),
+        ("long_number", r"\b\d{5,}\b", 0, "<LONG_NUM>"),
+        ("status_code", r"status of (\d{3})", 0, r"status of <STATUS_CODE>"),
+    ]
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None, collect_stats: bool = False,
+                 cache_size: int = 8192, **kwargs):
+        """
+        `rules` are user rules (e.g. `fingerprint_rules` from config.yaml), each a dict with
+        `pattern`, `replacement` and optional `name`, `flags`, `kind` ('specific' | 'generic')
+        and `literal`. User rules are evaluated before the built-in ones.
+        """
+        user_specific, user_generic = self._parse_user_rules(rules or [])
+        self.specific_rules: List[Rule] = user_specific + [self._make_rule(*r) for r in self.DEFAULT_SPECIFIC_RULES]
+        self.generic_rules: List[Rule] = user_generic + [self._make_rule(*r) for r in self.DEFAULT_GENERIC_RULES]
+        self.collect_stats = collect_stats
+        self.cache_size = cache_size
+        self._build_prefilter()
+        self._init_runtime_state()
 
     MAX_TITLE_LEN = 160  # display limit only
 
+    # --- Rule setup ---
+
+    @staticmethod
+    def _make_rule(name: str, source: str, flags: int, replacement: str, literal: Optional[str] = None) -> Rule:
+        literal = _required_literal(source) if literal is None else literal.lower()
+        return Rule(name, re.compile(source, flags), replacement, literal)
+
+    def _parse_user_rules(self, rules: List[Dict[str, Any]]) -> Tuple[List[Rule], List[Rule]]:
+        specific, generic = [], []
+        for i, spec in enumerate(rules, 1):
+            name = str(spec.get("name") or f"user_rule_{i}")
+            try:
+                flags = 0
+                for flag in spec.get("flags") or []:
+                    flags |= _FLAG_NAMES[str(flag).upper()]
+                rule = self._make_rule(name, spec["pattern"], flags, str(spec.get("replacement", "")), spec.get("literal"))
+            except (KeyError, re.error) as e:
+                print(f"⚠️ WARNING: Skipping invalid fingerprint rule '{name}': {e}")
+                continue
+            (generic if spec.get("kind") == "generic" else specific).append(rule)
+        return specific, generic
+
+    def _build_prefilter(self) -> None:
+        """Precomputes, for every literal the scanner can report, the specific rules it enables."""
+        literals = sorted({r.literal for r in self.specific_rules if r.literal})
+        self._all_rules = frozenset(range(len(self.specific_rules)))
+        self._always_candidates = frozenset(i for i, r in enumerate(self.specific_rules) if not r.literal)
+        self._prefilter = re.compile('(?=(' + _trie_regex(literals) + '))', re.IGNORECASE) if literals else None
+        # The scanner reports the longest literal starting at each position; every literal
+        # contained in it is present as well.
+        self._rules_for_literal: Dict[str, frozenset] = {
+            found: frozenset(i for i, r in enumerate(self.specific_rules) if r.literal and r.literal in found)
+            for found in literals
+        }
+
+    def _init_runtime_state(self) -> None:
+        self._message_key_memo = lru_cache(maxsize=self.cache_size)(self._compute_message_key)
+        self._code_location_memo = lru_cache(maxsize=min(self.cache_size, _MAX_TRACE_MEMO))(self._compute_code_location)
+        self.reset_stats()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Memo wrappers and stats are per process; rebuild them after unpickling in workers
+        state = self.__dict__.copy()
+        for key in ("_message_key_memo", "_code_location_memo", "_rule_stats"):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._init_runtime_state()
+
+    def rules_signature(self) -> str:
+        """Stable hash of all rules, used to invalidate data derived from fingerprints."""
+        h = hashlib.sha1()
+        for rule in self.specific_rules + [None] + self.generic_rules:
+            if rule is None:
+                h.update(b"--generic--\n")
+                continue
+            h.update(f"{rule.pattern.pattern}\0{rule.pattern.flags}\0{rule.replacement}\0{rule.literal}\n"
+                     .encode("utf-8"))
+        return h.hexdigest()
+
+    # --- Stats ---
+
+    def reset_stats(self) -> None:
+        self._rule_stats: Dict[str, List[float]] = {}  # name -> [hits, evaluations, seconds]
+
+    def _record(self, name: str, hit: bool, seconds: float = 0.0, evaluated: bool = True) -> None:
+        entry = self._rule_stats.setdefault(name, [0, 0, 0.0])
+        entry[0] += hit
+        entry[1] += evaluated
+        entry[2] += seconds
+
+    def rule_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-rule hit counts, regex evaluations and time spent (only when collect_stats is on)."""
+        return {
+            name: {"hits": int(hits), "evaluations": int(evals), "seconds": round(secs, 6)}
+            for name, (hits, evals, secs) in self._rule_stats.items()
+        }
+
+    def take_stats(self) -> Dict[str, List[float]]:
+        """Returns the raw counters collected so far and resets them."""
+        stats = self._rule_stats
+        self.reset_stats()
+        return stats
+
+    def merge_stats(self, raw: Dict[str, List[float]]) -> None:
+        """Adds raw counters from another Fingerprinter (e.g. an ingestion worker)."""
+        for name, (hits, evals, secs) in raw.items():
+            entry = self._rule_stats.setdefault(name, [0, 0, 0.0])
+            entry[0] += hits
+            entry[1] += evals
+            entry[2] += secs
+
+    # --- Fingerprinting ---
+
     @staticmethod
     def _shorten(s: str, n: int = 160) -> str:
         s = s.strip()
@@ -45,46 +265,91 @@ class Fingerprinter:
                 return _WHITESPACE_RE.sub(" ", ln.strip())
         return ""
 
-    def _create_message_key(self, failure: Dict) -> str:
-        """Build a concise, meaningful 'What' string for the fingerprint/title."""
-        raw = failure.get("message") or ""
+    def _candidate_rules(self, base: str) -> List[int]:
+        """Indices of specific rules whose required literal occurs in `base`, in rule order."""
+        if self._prefilter is None:
+            return sorted(self._always_candidates)
+        candidates = set(self._always_candidates)
+        for m in self._prefilter.finditer(base):
+            # Unknown spellings (exotic case folding) conservatively enable every rule
+            candidates.update(self._rules_for_literal.get(m.group(1).lower(), self._all_rules))
+        return sorted(candidates)
 
+    def _compute_message_key(self, raw: str, test_name: str) -> Tuple[str, Optional[str]]:
+        """Returns (message key, name of the specific rule that produced it)."""
         # Flatten only for "Custom message:", otherwise take first non-empty line
-        if re.match(r"^\s*Custom message\s*:", raw, re.IGNORECASE):
+        if _CUSTOM_MESSAGE_RE.match(raw):
             base = _flatten_whitespace(raw)
         else:
             base = self._first_non_empty_line(raw)
 
         if not base:
-            return f"(No message found in: {failure.get('name', 'Unknown test')})"
+            return f"(No message found in: {test_name})", None
 
         # Specific shortening on the matched segment only
-        for pattern, replacement in self.specific_patterns:
-            m = pattern.search(base)
+        for idx in self._candidate_rules(base):
+            rule = self.specific_rules[idx]
+            if self.collect_stats:
+                start = time.perf_counter()
+                m = rule.pattern.search(base)
+                self._record(rule.name, False, time.perf_counter() - start)
+            else:
+                m = rule.pattern.search(base)
             if m:
-                short = pattern.sub(replacement, m.group(0))
-                return self._shorten(short)
+                short = rule.pattern.sub(rule.replacement, m.group(0))
+                return self._shorten(short), rule.name
 
         # Generic fallback
         key = base
 
         if key.lower().startswith("unhandled error") or not key:
-            return self._shorten(f"Unhandled Error in Test: {failure.get('name', 'Unknown test')}")
+            return self._shorten(f"Unhandled Error in Test: {test_name}"), None
 
-        for pattern, replacement in self.generic_patterns:
-            key = pattern.sub(replacement, key)
+        lowered = key.lower()
+        for rule in self.generic_rules:
+            if rule.literal and rule.literal not in lowered:
+                continue
+            if self.collect_stats:
+                start = time.perf_counter()
+                new_key = rule.pattern.sub(rule.replacement, key)
+                self._record(rule.name, new_key != key, time.perf_counter() - start)
+            else:
+                new_key = rule.pattern.sub(rule.replacement, key)
+            if new_key != key:
+                key, lowered = new_key, new_key.lower()
 
-        return self._shorten(key)
+        return self._shorten(key), None
+
+    def _create_message_key(self, failure: Dict) -> str:
+        """Build a concise, meaningful 'What' string for the fingerprint/title."""
+        raw = failure.get("message") or ""
+        key, rule_name = self._message_key_memo(raw, failure.get('name', 'Unknown test'))
+        if rule_name is not None and self.collect_stats:
+            self._record(rule_name, True, evaluated=False)
+        return key
+
+    @staticmethod
+    def _compute_code_location(trace: str) -> str:
+        match = _CODE_LOCATION_RE.search(trace)
+        if match:
+            return os.path.basename(match.group(1))
+        return "(No test file location in trace)"
 
     def _get_code_location(self, trace: str) -> str:
         if not trace:
             return "(No stack trace)"
-        match = re.search(r'at .*?((?:[/\\A-Za-z0-9_-]+\.)+spec\.(?:ts|js):\d+:\d+)', trace)
-        if match:
-            return os.path.basename(match.group(1))
+        return self._code_location_memo(trace)
+
+    def code_location_from_lines(self, lines: Iterable[str]) -> str:
+        """Finds the code location in a trace read line by line, stopping at the first match."""
+        for line in lines:
+            match = _CODE_LOCATION_RE.search(line)
+            if match:
+                return os.path.basename(match.group(1))
         return "(No test file location in trace)"
 
     def create_fingerprint(self, failure: Dict[str, Any]) -> str:
         message_key = self._create_message_key(failure)
-        code_location = self._get_code_location(failure.get("trace", ""))
+        # Precomputed when the trace lives in an attachment that was not loaded
+        code_location = failure.get("code_location") or self._get_code_location(failure.get("trace", ""))
         return f"{message_key}|{code_location}"
@@ -1,62 +1,187 @@
 import os
 import json
 import re
-from concurrent.futures import ProcessPoolExecutor
-from typing import List, Dict, Any, Optional
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, Iterable, Iterator, NamedTuple, Optional, Tuple
 
-def _safe_read_attachment(path: str) -> str:
-    """Reads attachment content, ignoring errors."""
+from .cache import IngestionCache
+from .facets import DEFAULT_FACET_LABELS
+from .fingerprinter import Fingerprinter
+from .profiling import Profiler
+from .records import EXEMPLAR_FIELDS, FailureRecord, LabelSetTable
+
+try:  # Optional faster JSON backend
+    import orjson as _fast_json
+except ImportError:
+    _fast_json = None
+
+DEFAULT_CHUNK_SIZE = 64  # result files per worker task
+
+# A result can only be relevant if some node in it is failed/broken. Checking the raw
+# bytes for such a status lets passed/skipped/unknown results skip JSON decoding entirely.
+_FAILED_STATUS_RE = re.compile(rb'"status"\s*:\s*"(?:failed|broken)"')
+
+def _json_loads(raw: bytes) -> Any:
+    """Decodes JSON with orjson when installed, falling back to the stdlib."""
+    if _fast_json is not None:
+        return _fast_json.loads(raw)
+    return json.loads(raw)
+
+ATTACHMENT_EXCERPT_BYTES = 20_000  # upper bound for any attachment read
+_ATTACHMENT_KEYWORDS = ('trace', 'stack', 'error', 'console')
+
+# Per-process attachment I/O counters; workers ship them back with every chunk
+_attachment_counters: Counter = Counter()
+
+def _iter_attachment_lines(path: str, limit: int = ATTACHMENT_EXCERPT_BYTES) -> Iterator[str]:
+    """Lazily yields decoded lines from the first `limit` bytes of an attachment, ignoring errors."""
     try:
-        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read(20_000) # Read up to 20KB
+        with open(path, 'rb') as f:
+            remaining = limit
+            _attachment_counters['attachment_reads'] += 1
+            while remaining > 0:
+                line = f.readline(remaining)
+                if not line:
+                    return
+                remaining -= len(line)
+                _attachment_counters['attachment_bytes_read'] += len(line)
+                yield line.decode('utf-8', errors='ignore')
     except (IOError, OSError):
-        return ""
+        return
+
+def _read_attachment_first_line(path: str) -> Optional[str]:
+    """Returns the first line of an attachment, or None if it is empty or unreadable."""
+    for line in _iter_attachment_lines(path):
+        return line.rstrip('\n')
+    return None
+
+def load_attachment_excerpt(path: str, counters: Optional[Counter] = None) -> str:
+    """Reads the trace excerpt (up to 20KB) of an attachment, ignoring errors."""
+    before = _attachment_counters['attachment_bytes_read']
+    excerpt = ''.join(_iter_attachment_lines(path))
+    if counters is not None:
+        counters['attachment_reads'] += 1
+        counters['attachment_bytes_read'] += _attachment_counters['attachment_bytes_read'] - before
+    return excerpt
 
-def _collect_all_failures_recursive(node: Dict, results_dir: str) -> List[Dict[str, Any]]:
+def take_attachment_counters() -> Dict[str, int]:
+    """Returns the attachment counters collected in this process and resets them."""
+    counters = dict(_attachment_counters)
+    _attachment_counters.clear()
+    return counters
+
+def _failure_from_node(node: Dict, results_dir: str) -> Optional[Dict[str, Any]]:
+    """Returns the failure recorded on a single step node, or None if it is not a meaningful failure."""
+    if node.get("status") not in ["failed", "broken"]:
+        return None
+
+    details = node.get("statusDetails", {})
+    message = details.get("message", "")
+    trace = details.get("trace", "")
+    trace_attachment = None
+    status = node.get("status")
+
+    # Enhance with attachment data if details are sparse. Only the first line is read
+    # here; the trace excerpt is loaded later, and only for group exemplars.
+    if not trace and 'attachments' in node:
+        for att in node.get('attachments', []):
+            att_name = att.get('name', '').lower()
+            if any(kw in att_name for kw in _ATTACHMENT_KEYWORDS):
+                att_path = os.path.join(results_dir, att['source'])
+                first_line = _read_attachment_first_line(att_path)
+                if first_line is not None:
+                    trace_attachment = att_path
+                    if not message:
+                        message = first_line
+                break
+
+    # A "meaningful" failure must have some content
+    if not (message or trace or trace_attachment):
+        return None
+    return {
+        "step_name": node.get("name", ""),
+        "message": message,
+        "trace": trace,
+        "trace_attachment": trace_attachment,
+        "status": status
+    }
+
+def _collect_all_failures(root: Dict, results_dir: str, collapse_propagated: bool = False) -> List[Dict[str, Any]]:
     """
-    Recursively traverses the entire step tree and collects ALL meaningful failure nodes.
-    This is the core logic to capture every single failed/broken step.
+    Traverses the entire step tree iteratively (safe at any depth) and collects ALL
+    meaningful failure nodes in pre-order, each with the path of step names leading to it.
+
+    Allure usually copies a step's statusDetails up to every failed ancestor. With
+    `collapse_propagated`, a failure whose message and trace are identical to one of
+    its descendants' is dropped, so only the deepest occurrence is kept.
     """
-    all_failures = []
+    names: List[str] = []
+    parents: List[int] = []
+    found: List[Tuple[int, Dict[str, Any]]] = []  # (node id, failure) in pre-order
 
-    # 1. Check if the current node itself is a meaningful failure
-    if node.get("status") in ["failed", "broken"]:
-        details = node.get("statusDetails", {})
-        message = details.get("message", "")
-        trace = details.get("trace", "")
-        status = node.get("status")
-
-        # Enhance with attachment data if details are sparse
-        if not trace and 'attachments' in node:
-            for att in node.get('attachments', []):
-                att_name = att.get('name', '').lower()
-                if any(kw in att_name for kw in ['trace', 'stack', 'error', 'console']):
-                    trace = _safe_read_attachment(os.path.join(results_dir, att['source']))
-                    if not message:
-                        message = trace.split('\n')[0]
-                    break 
-
-        # A "meaningful" failure must have some content
-        if message or trace:
-            all_failures.append({
-                "step_name": node.get("name", ""),
-                "message": message,
-                "trace": trace,
-                "status": status
-            })
-
-    # 2. ALWAYS traverse deeper to find more failures in sub-steps
-    for step in node.get("steps", []):
-        all_failures.extend(_collect_all_failures_recursive(step, results_dir))
-        
+    stack = [(root, -1)]
+    while stack:
+        node, parent_id = stack.pop()
+        node_id = len(names)
+        names.append(node.get("name", ""))
+        parents.append(parent_id)
+
+        failure = _failure_from_node(node, results_dir)
+        if failure is not None:
+            found.append((node_id, failure))
+
+        # Reversed so children are visited in document order
+        for step in reversed(node.get("steps") or []):
+            stack.append((step, node_id))
+
+    if collapse_propagated:
+        # Descendants come after their ancestors in pre-order, so walking backwards sees
+        # the deepest failures first. covered[sig] holds every ancestor of a kept failure.
+        covered: Dict[Tuple[str, str], set] = {}
+        kept = []
+        for node_id, failure in reversed(found):
+            sig = (failure["message"], failure["trace"], failure.get("trace_attachment"))
+            ancestors = covered.setdefault(sig, set())
+            if node_id in ancestors:
+                continue
+            kept.append((node_id, failure))
+            parent = parents[node_id]
+            while parent != -1 and parent not in ancestors:
+                ancestors.add(parent)
+                parent = parents[parent]
+        found = kept[::-1]
+
+    all_failures = []
+    for node_id, failure in found:
+        path = []
+        parent = node_id
+        while parent > 0:  # the root (the test itself) is not part of the step path
+            path.append(names[parent])
+            parent = parents[parent]
+        failure["step_path"] = path[::-1]
+        all_failures.append(failure)
     return all_failures
 
-def _process_single_file(path: str) -> List[Dict]:
+def _process_single_file(path: str, collapse_propagated: bool = False) -> List[Dict]:
     """Processes one Allure result file and returns a LIST of all failures found within it."""
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except (IOError, json.JSONDecodeError):
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except (IOError, OSError):
+        return []
+
+    # Fast reject: nothing failed or broken anywhere in the file
+    if not _FAILED_STATUS_RE.search(raw):
+        return []
+
+    try:
+        data = _json_loads(raw)
+    except ValueError:  # json.JSONDecodeError and orjson.JSONDecodeError both subclass it
+        return []
+    if not isinstance(data, dict):
         return []
 
     if data.get("status") not in ["failed", "broken"]:
@@ -65,7 +190,7 @@ def _process_single_file(path: str) -> List[Dict]:
     results_dir = os.path.dirname(path)
     
     # This now returns a list of all failures found in the steps
-    failures_from_steps = _collect_all_failures_recursive(data, results_dir)
+    failures_from_steps = _collect_all_failures(data, results_dir, collapse_propagated)
     
     # If no specific failures were found inside steps, create a single fallback failure
     if not failures_from_steps:
@@ -74,7 +199,9 @@ def _process_single_file(path: str) -> List[Dict]:
             "step_name": "Top Level Failure",
             "message": top_level_details.get("message", "Test failed without specific step details."),
             "trace": top_level_details.get("trace", ""),
-            "status": data.get("status")
+            "trace_attachment": None,
+            "status": data.get("status"),
+            "step_path": []
         }
         failures_from_steps.append(fallback_failure)
 
@@ -88,31 +215,254 @@ def _process_single_file(path: str) -> List[Dict]:
             "_source": os.path.basename(path),
             "status": failure_detail.get("status"),
             "failing_step_name": failure_detail.get("step_name"),
+            "step_path": failure_detail.get("step_path", []),
             "message": failure_detail.get("message"),
-            "trace": failure_detail.get("trace")
+            "trace": failure_detail.get("trace"),
+            "trace_attachment": failure_detail.get("trace_attachment")
         })
     
     return final_failures
 
-def collect_failures_from_allure(results_dir: str) -> List[Dict]:
-    """Collects all individual failure instances from all result files."""
-    if not os.path.isdir(results_dir):
-        print(f"❌ Error: Directory not found at '{results_dir}'")
+# Bump whenever the shape or content of the records produced by ingestion workers changes,
+# so persisted ingestion caches are invalidated.
+INGESTION_CACHE_VERSION = 6
+
+# A result file as seen by the scanner: (path, size, mtime_ns)
+FileEntry = Tuple[str, int, int]
+
+class IngestionOptions(NamedTuple):
+    """Settings that change the records produced by ingestion workers."""
+    # Drop failures copied up the step tree (see _collect_all_failures)
+    collapse_propagated: bool = False
+    # Labels carried on every compact record; all other labels are dropped in the worker
+    label_names: Tuple[str, ...] = DEFAULT_FACET_LABELS
+
+# Set in each worker process by _init_worker
+_worker_fingerprinter: Optional[Fingerprinter] = None
+_worker_options = IngestionOptions()
+_worker_profile = False
+# Identical label sets of a worker's records share one tuple (also in the pickled chunk results)
+_worker_label_sets = LabelSetTable()
+
+def ingestion_cache_signature(fingerprinter: Fingerprinter, options: Optional[IngestionOptions] = None) -> str:
+    """Signature under which cached ingestion results stay valid."""
+    options = options or IngestionOptions()
+    mode = "collapsed" if options.collapse_propagated else "all-steps"
+    labels = ",".join(sorted(options.label_names))
+    return f"ingestion-v{INGESTION_CACHE_VERSION}:{mode}:{labels}:{fingerprinter.rules_signature()}"
+
+def _init_worker(fingerprinter: Fingerprinter, options: IngestionOptions, profile: bool = False) -> None:
+    global _worker_fingerprinter, _worker_options, _worker_profile
+    _worker_fingerprinter = fingerprinter
+    _worker_options = options
+    _worker_profile = profile
+
+def _compact_failures(failures: List[Dict], fingerprinter: Fingerprinter,
+                      label_names: Tuple[str, ...] = DEFAULT_FACET_LABELS) -> List[FailureRecord]:
+    """
+    Fingerprints the failures of one file and reduces them to compact FailureRecords.
+    Message, trace and test names are only kept (as the record's exemplar) on the
+    first record of each fingerprint in the file, so the records of every file (which
+    are cached per file) can supply their group's example on their own.
+    """
+    if not failures:
         return []
 
-    all_files = [os.path.join(results_dir, f) for f in os.listdir(results_dir) if f.endswith('-result.json')]
-    
-    if not all_files:
+    exemplar_keys = set()
+
+    labels = _worker_label_sets.from_allure(failures[0].get('labels'), label_names)
+    records = []
+    for failure in failures:
+        if not failure.get("trace") and failure.get("trace_attachment"):
+            # Scan the attachment line by line only until the code location is found
+            failure["code_location"] = fingerprinter.code_location_from_lines(
+                _iter_attachment_lines(failure["trace_attachment"]))
+        fingerprint = sys.intern(fingerprinter.create_fingerprint(failure))
+        exemplar = None
+        if fingerprint not in exemplar_keys:
+            exemplar_keys.add(fingerprint)
+            exemplar = {field: failure.get(field) for field in EXEMPLAR_FIELDS}
+            exemplar['name'] = sys.intern(exemplar['name'] or '')
+            exemplar['fullName'] = sys.intern(exemplar['fullName'] or '')
+        records.append(FailureRecord(fingerprint, sys.intern(failure.get("status") or ""), labels,
+                                     failure.get("_source"), exemplar))
+    return records
+
+def _process_file_chunk_profiled(entries: List[FileEntry], fingerprinter: Fingerprinter,
+                                 options: IngestionOptions) -> Tuple[List[Tuple[FileEntry, List[FailureRecord]]], Dict[str, Any]]:
+    """_process_file_chunk's loop, timing JSON parsing and fingerprinting (incl. attachment scans) separately."""
+    started, cpu = time.perf_counter(), time.process_time()
+    parse_seconds = fingerprint_seconds = 0.0
+    failures = 0
+    results = []
+    for entry in entries:
+        t0 = time.perf_counter()
+        parsed = _process_single_file(entry[0], options.collapse_propagated)
+        t1 = time.perf_counter()
+        records = _compact_failures(parsed, fingerprinter, options.label_names)
+        parse_seconds += t1 - t0
+        fingerprint_seconds += time.perf_counter() - t1
+        failures += len(records)
+        results.append((entry, records))
+    stats = {"pid": os.getpid(), "files": len(entries), "bytes": sum(entry[1] for entry in entries),
+             "failures": failures, "seconds": time.perf_counter() - started,
+             "cpu_seconds": time.process_time() - cpu,
+             "parse_seconds": parse_seconds, "fingerprint_seconds": fingerprint_seconds}
+    return results, stats
+
+def _process_file_chunk(entries: List[FileEntry]) -> Tuple[List[Tuple[FileEntry, List[FailureRecord]]], Dict[str, List[float]],
+                                                           Dict[str, int], Optional[Dict[str, Any]]]:
+    """
+    Processes a batch of result files in one worker task. Returns (entry, records) pairs
+    plus the fingerprint rule and attachment I/O counters collected while processing the batch,
+    and the chunk's timings when the pool was started with profiling (else None).
+    """
+    fingerprinter = _worker_fingerprinter or Fingerprinter()
+    options = _worker_options
+    chunk_stats = None
+    if _worker_profile:
+        results, chunk_stats = _process_file_chunk_profiled(entries, fingerprinter, options)
+    else:
+        results = [
+            (entry, _compact_failures(_process_single_file(entry[0], options.collapse_propagated),
+                                      fingerprinter, options.label_names))
+            for entry in entries
+        ]
+    return results, fingerprinter.take_stats(), take_attachment_counters(), chunk_stats
+
+def _iter_result_files(results_dir: str) -> Iterator[FileEntry]:
+    """Lazily yields all '*-result.json' files using os.scandir (stat comes from the scan)."""
+    with os.scandir(os.path.abspath(results_dir)) as it:
+        for entry in it:
+            if entry.name.endswith('-result.json') and entry.is_file():
+                st = entry.stat()
+                yield (entry.path, st.st_size, st.st_mtime_ns)
+
+def _iter_work(entries: Iterator[FileEntry], chunk_size: int,
+               cache: Optional[IngestionCache]) -> Iterator[Tuple[str, Any]]:
+    """
+    Splits scanned files into cache hits ('cached', records) and chunks of
+    files that still need parsing ('chunk', entries).
+    """
+    chunk = []
+    for entry in entries:
+        cached = cache.get(*entry) if cache is not None else None
+        if cached is not None:
+            if cached:
+                yield ('cached', cached)
+            continue
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            yield ('chunk', chunk)
+            chunk = []
+    if chunk:
+        yield ('chunk', chunk)
+
+def start_worker_pool(max_workers: int, fingerprinter: Fingerprinter,
+                      options: Optional[IngestionOptions] = None, profile: bool = False) -> ProcessPoolExecutor:
+    """A process pool whose workers fingerprint with `fingerprinter` and `options` (and time chunks if `profile`)."""
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                               initargs=(fingerprinter, options or IngestionOptions(), profile))
+
+def _run_work(executor: ProcessPoolExecutor, work: Iterator[Tuple[str, Any]], max_in_flight: int,
+              fingerprinter: Fingerprinter, cache: Optional[IngestionCache],
+              counters: Optional[Counter], profiler: Optional[Profiler] = None) -> Iterator[FailureRecord]:
+    """Yields the records of cache hits and parsed chunks, with at most `max_in_flight` chunks submitted."""
+    profiler = profiler or Profiler()
+    pending = set()
+    exhausted = False
+    while True:
+        # Keep the pool busy without materializing the whole file list
+        while not exhausted and len(pending) < max_in_flight:
+            item = next(work, None)
+            if item is None:
+                exhausted = True
+                break
+            kind, payload = item
+            if kind == 'cached':
+                profiler.count('files_from_cache')
+                yield from payload
+            else:
+                pending.add(executor.submit(_process_file_chunk, payload))
+        if not pending:
+            break
+
+        # Time the main process spends blocked on workers (the rest of ingestion is scanning and grouping)
+        with profiler.stage('ingest.wait_for_workers'):
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            # Each chunk returns a LIST of compact records per file
+            results, rule_stats, io_counters, chunk_stats = future.result()
+            fingerprinter.merge_stats(rule_stats)
+            if counters is not None:
+                counters.update(io_counters)
+            if chunk_stats is not None:
+                profiler.add_worker_chunk(chunk_stats)
+            for entry, records_in_file in results:
+                if cache is not None:
+                    cache.put(*entry, records_in_file)
+                yield from records_in_file
+
+def iter_failures_from_files(entries: Iterable[FileEntry], executor: ProcessPoolExecutor,
+                             fingerprinter: Fingerprinter,
+                             chunk_size: int = DEFAULT_CHUNK_SIZE,
+                             cache: Optional[IngestionCache] = None,
+                             counters: Optional[Counter] = None,
+                             max_in_flight: int = 4,
+                             profiler: Optional[Profiler] = None) -> Iterator[FailureRecord]:
+    """
+    Streams the compact records of the given result files through an existing
+    worker pool (see start_worker_pool), for callers that ingest files in batches.
+    """
+    work = _iter_work(iter(entries), max(1, chunk_size), cache)
+    yield from _run_work(executor, work, max_in_flight, fingerprinter, cache, counters, profiler)
+
+def iter_failures_from_allure(results_dir: str,
+                              chunk_size: int = DEFAULT_CHUNK_SIZE,
+                              max_workers: Optional[int] = None,
+                              cache: Optional[IngestionCache] = None,
+                              fingerprinter: Optional[Fingerprinter] = None,
+                              options: Optional[IngestionOptions] = None,
+                              counters: Optional[Counter] = None,
+                              profiler: Optional[Profiler] = None) -> Iterator[FailureRecord]:
+    """
+    Streams compact, already fingerprinted failure records from all result files, in completion order.
+    Files are dispatched to the worker pool in chunks and only a bounded number of
+    chunks is in flight at any time, so memory does not grow with the directory size.
+    With a cache, unchanged files are served from it and only new or modified files are parsed.
+    `options` controls step collapsing and which labels are kept (see IngestionOptions).
+    `counters` receives per-run attachment I/O counters (attachment_reads, attachment_bytes_read).
+    An enabled `profiler` receives per-worker chunk timings and the time spent waiting for workers.
+    Raises FileNotFoundError if `results_dir` is not a directory.
+    """
+    if not os.path.isdir(results_dir):
+        raise FileNotFoundError(f"Directory not found at '{results_dir}'")
+
+    max_workers = max_workers or os.cpu_count() or 1
+    fingerprinter = fingerprinter or Fingerprinter()
+    options = options or IngestionOptions()
+    max_in_flight = max_workers * 2
+    seen_paths = set()
+
+    def _scan() -> Iterator[FileEntry]:
+        for entry in _iter_result_files(results_dir):
+            seen_paths.add(entry[0])
+            yield entry
+
+    if cache is not None:
+        cache.load_directory(results_dir)
+    work = _iter_work(_scan(), max(1, chunk_size), cache)
+
+    profiling = profiler is not None and profiler.enabled
+    with start_worker_pool(max_workers, fingerprinter, options, profile=profiling) as executor:
+        yield from _run_work(executor, work, max_in_flight, fingerprinter, cache, counters, profiler)
+
+    if cache is not None:
+        cache.prune(seen_paths)
+
+    if not seen_paths:
         print(f"🟡 Warning: No '*-result.json' files found.")
-        return []
 
-    all_failures_flat_list = []
-    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
-        future_to_file = {executor.submit(_process_single_file, file_path): file_path for file_path in all_files}
-        for future in future_to_file:
-            # Each future returns a LIST of failures for one file
-            failures_in_file = future.result()
-            if failures_in_file:
-                all_failures_flat_list.extend(failures_in_file)
-    
-    return all_failures_flat_list
\ No newline at end of file
+def collect_failures_from_allure(results_dir: str, **kwargs) -> List[FailureRecord]:
+    """Collects the compact records of all individual failure instances from all result files."""
+    return list(iter_failures_from_allure(results_dir, **kwargs))
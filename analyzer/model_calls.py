@@ -0,0 +1,95 @@
+"""
+Bounded execution of slow model (LLM) calls for the web server.
+
+Calls run on a small thread pool, so at most `max_concurrent` are in flight and
+at most `max_queued` more wait; beyond that callers get ModelBusyError right
+away instead of piling up request threads. Calls submitted with the same key
+while one is still running share its result.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class ModelBusyError(RuntimeError):
+    """Raised when the model call queue is full."""
+
+
+class ModelCallExecutor:
+    """Bounded, coalescing executor for model calls."""
+
+    def __init__(self, max_concurrent: int = 4, max_queued: int = 32):
+        self.max_concurrent = max(int(max_concurrent), 1)
+        self.max_queued = max(int(max_queued), 0)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='model-call')
+        self._inflight: Dict[Hashable, Future] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def submit(self, key: Optional[Hashable], fn: Callable[..., Any], *args: Any) -> Future:
+        """
+        Schedules fn(*args) and returns its future. With a key, a call with the same
+        key that is still queued or running is shared instead of starting another.
+        """
+        with self._lock:
+            if key is not None:
+                running = self._inflight.get(key)
+                if running is not None:
+                    self.coalesced += 1
+                    return running
+            if self._pending >= self.max_concurrent + self.max_queued:
+                self.rejected += 1
+                raise ModelBusyError(f"{self._pending} model calls are already running or queued")
+            self._pending += 1
+            self.calls += 1
+            future = self._pool.submit(fn, *args)
+            if key is not None:
+                self._inflight[key] = future
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return future
+
+    def _finished(self, key: Optional[Hashable], future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if key is not None and self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def run(self, key: Optional[Hashable], fn: Callable[..., Any], *args: Any,
+            timeout: Optional[float] = None) -> Any:
+        """Submits the call and waits for its result (concurrent.futures.TimeoutError after `timeout`)."""
+        return self.submit(key, fn, *args).result(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"pending": self._pending, "max_concurrent": self.max_concurrent, "max_queued": self.max_queued,
+                    "calls": self.calls, "coalesced": self.coalesced, "rejected": self.rejected}
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class FakeModelClient:
+    """
+    Stand-in for genai.Client for local load tests: `models.generate_content` sleeps
+    for `latency` seconds and answers with a canned text naming the call number.
+    """
+
+    def __init__(self, latency: float = 1.0):
+        self.latency = latency
+        self.models = self
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> Any:
+        with self._lock:
+            self.calls += 1
+            number = self.calls
+        time.sleep(self.latency)
+        text = f"(fake model, call {number}) Nothing to report: this answer was not generated by {model}."
+        content = SimpleNamespace(role='model', parts=[SimpleNamespace(text=text)])
+        return SimpleNamespace(candidates=[SimpleNamespace(content=content)], text=text)
@@ -0,0 +1,137 @@
+"""
+Lightweight instrumentation of an analysis run: wall and CPU time per stage,
+counters, per-worker ingestion throughput, fingerprint rule stats and peak memory.
+
+A disabled Profiler hands out one shared no-op context manager and ignores
+counters, so instrumented code costs next to nothing when profiling is off.
+"""
+import contextlib
+import cProfile
+import sys
+import time
+from collections import Counter
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+try:  # Not available on Windows; peak memory is then not reported
+    import resource
+except ImportError:
+    resource = None
+
+_NOOP = contextlib.nullcontext()
+
+# Per-chunk worker stats that are summed per worker process
+WORKER_FIELDS = ('chunks', 'files', 'bytes', 'failures', 'seconds', 'cpu_seconds',
+                 'parse_seconds', 'fingerprint_seconds')
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """Peak resident memory of this process (or of its finished child processes) in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Profiler:
+    """
+    Collects per-stage timings of one run. `cprofile_path` additionally runs
+    cProfile on this process between start() and stop() and dumps pstats there
+    (ingestion workers are separate processes and are not included).
+    """
+
+    def __init__(self, enabled: bool = False, cprofile_path: Optional[str] = None):
+        self.enabled = enabled or bool(cprofile_path)
+        self.cprofile_path = cprofile_path
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Counter = Counter()
+        self.workers: Dict[int, Counter] = {}
+        # Fingerprinter.rule_stats() of the run, set by the caller once ingestion is done
+        self.rule_stats: Dict[str, Dict[str, float]] = {}
+        self._open: Dict[str, List[float]] = {}
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        if self.cprofile_path and self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self) -> Optional[str]:
+        """Stops cProfile and writes its stats; returns the stats file, if any."""
+        if self._cprofile is None:
+            return None
+        self._cprofile.disable()
+        self._cprofile.dump_stats(self.cprofile_path)
+        self._cprofile = None
+        return self.cprofile_path
+
+    def stage(self, name: str) -> ContextManager[None]:
+        """Context manager adding the wall and CPU time of its block to stage `name`."""
+        if not self.enabled:
+            return _NOOP
+        return self._measure(name)
+
+    @contextlib.contextmanager
+    def _measure(self, name: str) -> Iterator[None]:
+        self._open[name] = [time.perf_counter(), time.process_time()]
+        try:
+            yield
+        finally:
+            wall, cpu = self._open.pop(name)
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "cpu_seconds": 0.0, "calls": 0})
+            entry["seconds"] += time.perf_counter() - wall
+            entry["cpu_seconds"] += time.process_time() - cpu
+            entry["calls"] += 1
+
+    def count(self, name: str, value: float = 1) -> None:
+        if self.enabled:
+            self.counters[name] += value
+
+    def add_worker_chunk(self, stats: Dict[str, Any]) -> None:
+        """Adds the stats of one ingestion chunk (see ingestion._process_file_chunk) to its worker."""
+        worker = self.workers.setdefault(stats['pid'], Counter())
+        worker['chunks'] += 1
+        worker.update({field: stats[field] for field in WORKER_FIELDS if field in stats})
+
+    def _worker_summaries(self) -> List[Dict[str, Any]]:
+        summaries = []
+        for pid, worker in sorted(self.workers.items()):
+            busy = worker['seconds'] or 1e-9
+            summary: Dict[str, Any] = {"pid": pid}
+            summary.update({field: round(worker[field], 3) for field in WORKER_FIELDS})
+            summary["files_per_s"] = round(worker['files'] / busy, 1)
+            summary["mb_per_s"] = round(worker['bytes'] / busy / 1e6, 2)
+            summaries.append(summary)
+        return summaries
+
+    def metadata(self) -> Dict[str, Any]:
+        """The profile as stored in the report's metadata. Stages still running report their time so far."""
+        now, cpu_now = time.perf_counter(), time.process_time()
+        stages = {name: {"seconds": round(s["seconds"], 3), "cpu_seconds": round(s["cpu_seconds"], 3),
+                         "calls": s["calls"]} for name, s in self.stages.items()}
+        for name, (wall, cpu) in self._open.items():
+            stages[name] = {"seconds": round(now - wall, 3), "cpu_seconds": round(cpu_now - cpu, 3),
+                            "in_progress": True}
+        workers = self._worker_summaries()
+        totals = {field: round(sum(w[field] for w in workers), 3) for field in ('files', 'bytes', 'failures')}
+        return {
+            "stages": stages,
+            "counters": dict(self.counters),
+            "ingestion": {**totals, "workers": workers},
+            "rule_stats": {name: {k: round(v, 6) for k, v in s.items()}
+                           for name, s in sorted(self.rule_stats.items(), key=lambda kv: -kv[1]['seconds'])},
+            "peak_rss_mb": peak_rss_mb(),
+            "workers_peak_rss_mb": peak_rss_mb(children=True),
+        }
+
+    def print_summary(self) -> None:
+        """Prints the stage table and per-worker throughput."""
+        profile = self.metadata()
+        print("Profile (wall / CPU of this process):")
+        for name, s in profile["stages"].items():
+            print(f"  {name:<28} {s['seconds']:>9.3f} s {s['cpu_seconds']:>9.3f} s")
+        for w in profile["ingestion"]["workers"]:
+            print(f"  worker {w['pid']:<8} {w['files']:>7.0f} files {w['bytes'] / 1e6:>8.1f} MB "
+                  f"{w['files_per_s']:>8.1f} files/s  parse {w['parse_seconds']:.2f} s  "
+                  f"fingerprint {w['fingerprint_seconds']:.2f} s")
+        print(f"  peak memory: {profile['peak_rss_mb']} MB (main), {profile['workers_peak_rss_mb']} MB (workers)")
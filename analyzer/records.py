@@ -0,0 +1,81 @@
+"""
+Compact failure records as produced by ingestion workers.
+
+A run can yield hundreds of thousands of records, so they are slotted objects
+rather than dicts. Strings that repeat across records (fingerprints, statuses,
+label names and values) are interned, and identical label sets share one tuple
+(see LabelSetTable). Only the first record of each fingerprint in a result file
+carries an exemplar (message, trace, test and step names); the others are just a
+fingerprint, a status, a label set and a source file name.
+"""
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Fields of a record's exemplar
+EXEMPLAR_FIELDS = ('name', 'fullName', 'failing_step_name', 'step_path', 'message', 'trace', 'trace_attachment')
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class FailureRecord:
+    """One failure instance (a failed or broken step) of one result file."""
+    __slots__ = ('fingerprint', 'status', 'labels', 'source', 'exemplar')
+
+    def __init__(self, fingerprint: str, status: str, labels: LabelSet, source: Optional[str],
+                 exemplar: Optional[Dict[str, Any]] = None):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.labels = labels
+        self.source = source
+        self.exemplar = exemplar
+
+    def __reduce__(self):
+        # Positional state pickles smaller than the default slot dict
+        return (FailureRecord, (self.fingerprint, self.status, self.labels, self.source, self.exemplar))
+
+    def __repr__(self) -> str:
+        return f"FailureRecord({self.fingerprint!r}, {self.status!r}, source={self.source!r})"
+
+    def to_row(self) -> List[Any]:
+        """JSON-serializable form (see from_row)."""
+        return [self.fingerprint, self.status, self.labels, self.source, self.exemplar]
+
+    @classmethod
+    def from_row(cls, row: List[Any], label_sets: Optional['LabelSetTable'] = None) -> 'FailureRecord':
+        fingerprint, status, labels, source, exemplar = row
+        labels = tuple((name, value) for name, value in labels)
+        return cls(sys.intern(fingerprint), sys.intern(status or ''),
+                   label_sets.intern(labels) if label_sets is not None else labels, source, exemplar)
+
+
+class LabelSetTable:
+    """
+    Shares one tuple among all records with the same label set. Most results of a
+    run carry one of few label combinations, so this stores each only once.
+    """
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._sets: Dict[LabelSet, LabelSet] = {}
+
+    def intern(self, labels: LabelSet) -> LabelSet:
+        shared = self._sets.get(labels)
+        if shared is not None:
+            return shared
+        if len(self._sets) >= self.max_size:
+            # Long-running processes (watch mode) must not grow without bound
+            self._sets.clear()
+        shared = tuple((sys.intern(name), sys.intern(value)) for name, value in labels)
+        self._sets[shared] = shared
+        return shared
+
+    def from_allure(self, labels: Iterable[Dict[str, Any]], names: Tuple[str, ...]) -> LabelSet:
+        """The (name, value) pairs of the Allure labels named in `names`, as a shared label set."""
+        return self.intern(tuple(
+            (label['name'], str(label['value']))
+            for label in labels or ()
+            if label.get('name') in names and 'value' in label
+        ))
+
+    def __len__(self) -> int:
+        return len(self._sets)
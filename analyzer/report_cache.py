@@ -0,0 +1,141 @@
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Parsed JSON takes several times its file size in memory; entries are charged this much
+_PARSED_SIZE_FACTOR = 4
+
+
+class CachedFile(NamedTuple):
+    """One cached representation of a file plus the validators it was built from."""
+    value: Any
+    etag: str
+    mtime: float
+    size: int
+
+
+class ReportCache:
+    """
+    Thread-safe in-process cache for report files, bounded by an approximate byte
+    budget and evicted least-recently-used first. Every lookup stats the file and
+    rebuilds the entry when its size or mtime changed, so rewritten reports are
+    never served stale.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, gzip_level: int = 6):
+        self.max_bytes = max_bytes
+        self.gzip_level = gzip_level
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[CachedFile, Tuple[int, int], int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._listings: Dict[str, Tuple[int, List[str]]] = {}
+
+    def _get(self, path: str, kind: str, build: Callable[[os.stat_result], Tuple[Any, int]]) -> CachedFile:
+        st = os.stat(path)
+        key = (path, kind)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[1] == (st.st_mtime_ns, st.st_size):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+
+        # Built outside the lock; two threads may build the same entry once, which is harmless
+        value, cost = build(st)
+        etag = f"{st.st_mtime_ns:x}-{st.st_size:x}" + ('' if kind == 'raw' else f"-{kind}")
+        entry = CachedFile(value, etag, st.st_mtime, st.st_size)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if cost <= self.max_bytes:
+                self._entries[key] = (entry, (st.st_mtime_ns, st.st_size), cost)
+                self._bytes += cost
+                while self._bytes > self.max_bytes:
+                    _, (_, _, evicted_cost) = self._entries.popitem(last=False)
+                    self._bytes -= evicted_cost
+        return entry
+
+    def parsed(self, path: str) -> CachedFile:
+        """The decoded JSON content of `path`."""
+        def build(st: os.stat_result) -> Tuple[Any, int]:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            return (json.loads(content) if content else None), len(content) * _PARSED_SIZE_FACTOR
+        return self._get(path, 'json', build)
+
+    def raw(self, path: str) -> CachedFile:
+        """The file content as bytes."""
+        def build(st: os.stat_result) -> Tuple[bytes, int]:
+            with open(path, 'rb') as f:
+                data = f.read()
+            return data, len(data)
+        return self._get(path, 'raw', build)
+
+    def encoded(self, path: str, encoding: str) -> Optional[CachedFile]:
+        """
+        The file compressed with `encoding` ('gzip' or 'zstd'). A precompressed sidecar
+        (path + '.gz' / '.zst') written after the file is used when present; gzip is
+        otherwise compressed once here. Returns None when no such encoding is available.
+        """
+        suffix = {'gzip': '.gz', 'zstd': '.zst'}.get(encoding)
+        if suffix is None:
+            return None
+
+        def build(st: os.stat_result) -> Tuple[Optional[bytes], int]:
+            sidecar = path + suffix
+            try:
+                if os.stat(sidecar).st_mtime_ns >= st.st_mtime_ns:
+                    with open(sidecar, 'rb') as f:
+                        data = f.read()
+                    return data, len(data)
+            except OSError:
+                pass
+            if encoding != 'gzip':
+                return None, 0
+            with open(path, 'rb') as f:
+                data = gzip.compress(f.read(), compresslevel=self.gzip_level)
+            return data, len(data)
+
+        entry = self._get(path, encoding, build)
+        return entry if entry.value is not None else None
+
+    def derived(self, path: str, kind: str, build: Callable[[Any], Any], cost_factor: int = 1,
+                cost: Optional[Callable[[Any], int]] = None) -> CachedFile:
+        """
+        A structure built from the parsed JSON of `path` (e.g. a search index), rebuilt
+        when the file changes. It is charged `cost(value)` bytes when given (for small
+        results), otherwise the file size times `cost_factor`.
+        """
+        parsed = self.parsed(path)
+
+        def _build(st: os.stat_result) -> Tuple[Any, int]:
+            value = build(parsed.value)
+            return value, (cost(value) if cost is not None else st.st_size * cost_factor)
+        return self._get(path, kind, _build)
+
+    def listing(self, directory: str, accept: Callable[[os.DirEntry], bool], reverse: bool = True) -> List[str]:
+        """Sorted names of the entries in `directory` passing `accept`, re-read only when the directory's mtime changes."""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            cached = self._listings.get(directory)
+            if cached is not None and cached[0] == mtime_ns:
+                return list(cached[1])
+        names = sorted((e.name for e in os.scandir(directory) if accept(e)), reverse=reverse)
+        with self._lock:
+            self._listings[directory] = (mtime_ns, names)
+        return list(names)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
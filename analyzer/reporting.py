@@ -1,11 +1,88 @@
 from collections import Counter
+import gzip
+import io
 import json
 import os
-from typing import Dict, List, Tuple
+from typing import Any, Dict, IO, List, Optional, Sequence, Tuple, Union
+
+from .aggregate import GroupAggregate
+from .diff import fingerprint_hash
+from .facets import FacetIndex
+from .ingestion import load_attachment_excerpt
+from .profiling import Profiler
+from .records import FailureRecord
+from .trend_store import TrendStore
 import datetime as dt
 
+try:  # Optional zstd support for the compressed sidecar
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TRACES_SUFFIX = '.traces.jsonl'
+
+
+def _compact(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def _open_sidecar(json_path: str, compression: str) -> Tuple[Optional[IO[str]], Optional[str]]:
+    """Opens a compressed copy of the report next to it ('gzip' or 'zstd')."""
+    compression = (compression or 'none').lower()
+    if compression == 'zstd':
+        if zstandard is not None:
+            path = json_path + '.zst'
+            raw = zstandard.ZstdCompressor(level=3).stream_writer(open(path, 'wb'), closefd=True)
+            return io.TextIOWrapper(raw, encoding='utf-8'), path
+        print("🟡 Warning: 'zstandard' is not installed, writing a gzip sidecar instead.")
+        compression = 'gzip'
+    if compression == 'gzip':
+        path = json_path + '.gz'
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6), path
+    return None, None
+
+
+def _group_summary(items: Union[List[FailureRecord], GroupAggregate]) -> Tuple[int, int, int, Dict]:
+    """(count, failed, broken, example fields) of a group given as records or as a GroupAggregate."""
+    if isinstance(items, GroupAggregate):
+        return items.count, items.failed, items.broken, items.exemplar or {}
+    ctr = Counter(item.status.lower() for item in items)
+    # Only exemplar candidates carry message/trace text
+    example = next((item.exemplar for item in items if item.exemplar is not None), {})
+    return len(items), int(ctr.get('failed', 0)), int(ctr.get('broken', 0)), example
+
+
+class _ReportWriter:
+    """Writes the report JSON incrementally to the plain file and an optional compressed sidecar."""
+
+    def __init__(self, json_path: str, compression: str):
+        self._plain = open(json_path, 'w', encoding='utf-8')
+        self._sidecar, self.sidecar_path = _open_sidecar(json_path, compression)
 
-def generate_report_json(sorted_groups: List[Tuple[str, List[Dict]]], config: Dict) -> str:
+    def write(self, text: str) -> None:
+        self._plain.write(text)
+        if self._sidecar is not None:
+            self._sidecar.write(text)
+
+    def close(self) -> None:
+        self._plain.close()
+        if self._sidecar is not None:
+            self._sidecar.close()
+
+
+def generate_report_json(sorted_groups: Sequence[Tuple[str, Union[List[FailureRecord], GroupAggregate]]], config: Dict,
+                         group_members: Optional[Dict[str, List[str]]] = None,
+                         counters: Optional[Counter] = None,
+                         facet_index: Optional[FacetIndex] = None,
+                         profiler: Optional[Profiler] = None) -> str:
+    """
+    Streams the report to reports_history/<timestamp>/ one group at a time in compact JSON.
+    Example traces go to a separate '<report>.traces.jsonl' file; each group's example
+    carries a `trace_ref` (byte offset and length) so clients can fetch one trace on demand.
+    Groups are given as their failure records or as merged GroupAggregates (map/reduce);
+    the latter need the aggregate's `facet_index`. An enabled `profiler`'s stages and
+    counters so far are stored in the metadata's `profile`.
+    """
     # Get the base report file name from config
     output_report_file = config.get('output_report_file', 'failure_analysis_report.html')
     base_json_name = os.path.splitext(output_report_file)[0] + '.json'
@@ -15,67 +92,99 @@ def generate_report_json(sorted_groups: List[Tuple[str, List[Dict]]], config: Di
     history_base_dir = 'reports_history'
     report_dir = os.path.join(history_base_dir, timestamp)
     os.makedirs(report_dir, exist_ok=True)
-    
+
     # The final path for the JSON file inside the new directory
     json_path = os.path.join(report_dir, base_json_name)
+    traces_path = os.path.splitext(json_path)[0] + TRACES_SUFFIX
+
+    summaries = [_group_summary(items) for _, items in sorted_groups]
+    total_failures = sum(summary[0] for summary in summaries)
+
+    if facet_index is None:
+        # Callers that did not build the index while grouping get it in one pass here
+        facet_index = FacetIndex()
+        for fingerprint, items in sorted_groups:
+            for item in items:
+                facet_index.add(fingerprint, item.labels)
+    reported_keys = [fingerprint for fingerprint, _ in sorted_groups]
 
-    total_failures = sum(len(group) for _, group in sorted_groups)
-
-    report_data = {
-        "metadata": {
-            "generation_date": dt.datetime.now().isoformat(),
-            "total_failures": total_failures,
-            "unique_groups": len(sorted_groups),
-        },
-        "groups": []
-    }
-
-    # ... (the rest of the function remains exactly the same)
-    for i, (fingerprint, items) in enumerate(sorted_groups, 1):
-        # ... (all the logic for building group_obj)
-        norm_message, code_loc = fingerprint.split('|', 1) if '|' in fingerprint else (fingerprint, '')
-        example = items[0]
-        epics = sorted(list({
-            label['value']
-            for item in items
-            for label in item.get('labels', [])
-            if label.get('name') == 'epic' and 'value' in label
-        }))
-        features = sorted(list({
-            label['value']
-            for item in items
-            for label in item.get('labels', [])
-            if label.get('name') == 'feature' and 'value' in label
-        }))
-        ctr = Counter((item.get('status') or '').lower() for item in items)
-        failed_count = int(ctr.get('failed', 0))
-        broken_count = int(ctr.get('broken', 0))
-        group_size = len(items)
-        percentage = (group_size / total_failures * 100.0) if total_failures > 0 else 0.0
-        group_obj = {
-            "id": i,
-            "title": norm_message,
-            "count": group_size,
-            "failure_count": group_size,
-            "percentage": round(percentage, 2),
-            "status_counts": {
-                "failed": failed_count,
-                "broken": broken_count,
-            },
-            "fingerprint_what": norm_message,
-            "fingerprint_where": code_loc,
-            "epics": epics,
-            "features": features,
-            "example": {
-                "test_name": example.get('fullName') or example.get('name'),
-                "message": example.get('message', '(No message)'),
-                "trace": example.get('trace', '(No trace)'),
+    writer = _ReportWriter(json_path, config.get('report_compression', 'none'))
+    traces_offset = 0
+    trend_rows = []
+    try:
+        with open(traces_path, 'wb') as traces_file:
+            writer.write('{"groups":[')
+            for i, ((fingerprint, _), (group_size, failed_count, broken_count, example)) in enumerate(
+                    zip(sorted_groups, summaries), 1):
+                norm_message, code_loc = fingerprint.split('|', 1) if '|' in fingerprint else (fingerprint, '')
+                trace = example.get('trace')
+                if not trace and example.get('trace_attachment'):
+                    # Attachment traces are loaded lazily, only for the records shown as examples
+                    trace = load_attachment_excerpt(example['trace_attachment'], counters)
+
+                line = (_compact({"id": i, "trace": trace if trace is not None else '(No trace)'}) + '\n').encode('utf-8')
+                traces_file.write(line)
+                trace_ref = {"offset": traces_offset, "length": len(line)}
+                traces_offset += len(line)
+
+                facets = facet_index.group_counts(fingerprint)
+                epics = sorted(facets.get('epic', {}))
+                features = sorted(facets.get('feature', {}))
+                percentage = (group_size / total_failures * 100.0) if total_failures > 0 else 0.0
+                group_obj = {
+                    "id": i,
+                    "title": norm_message,
+                    "count": group_size,
+                    "failure_count": group_size,
+                    "percentage": round(percentage, 2),
+                    "status_counts": {
+                        "failed": failed_count,
+                        "broken": broken_count,
+                    },
+                    "fingerprint_what": norm_message,
+                    "fingerprint_where": code_loc,
+                    "fingerprint_hash": fingerprint_hash(fingerprint),
+                    "epics": epics,
+                    "features": features,
+                    "facets": facets,
+                    "example": {
+                        "test_name": example.get('fullName') or example.get('name'),
+                        "step_path": example.get('step_path') or [],
+                        "message": example.get('message', '(No message)'),
+                        "trace_ref": trace_ref,
+                    }
+                }
+                if group_members and fingerprint in group_members:
+                    # Near-duplicate fingerprints merged into this group by the clustering stage
+                    group_obj["member_fingerprints"] = group_members[fingerprint]
+                writer.write((',' if i > 1 else '') + _compact(group_obj))
+                trend_rows.append((fingerprint, group_size, failed_count, broken_count, facets))
+
+            # Metadata goes last so it can include counters gathered while writing groups
+            metadata = {
+                "generation_date": dt.datetime.now().isoformat(),
+                "total_failures": total_failures,
+                "unique_groups": len(sorted_groups),
+                "facet_totals": facet_index.totals(reported_keys),
+                "facet_missing": facet_index.missing_totals(reported_keys),
+                "traces_file": os.path.basename(traces_path),
             }
-        }
-        report_data["groups"].append(group_obj)
+            if counters:
+                metadata["ingestion_counters"] = dict(counters)
+            if profiler is not None and profiler.enabled:
+                metadata["profile"] = profiler.metadata()
+            writer.write('],"metadata":' + _compact(metadata) + '}')
+    finally:
+        writer.close()
 
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(report_data, f, indent=2, ensure_ascii=False)
     print(f"✅ Report data successfully generated at: {json_path}")
-    
-    return json_path
\ No newline at end of file
+    if writer.sidecar_path:
+        print(f"   Compressed copy: {writer.sidecar_path}")
+
+    trend_store_file = config.get('trend_store_file')
+    if trend_store_file:
+        # Per-group aggregates go to the trend index so history queries never re-read full reports
+        with TrendStore(trend_store_file) as store:
+            store.add_run(timestamp, total_failures, trend_rows)
+
+    return json_path
@@ -0,0 +1,147 @@
+"""
+Inverted index over the groups of one report, so the UI can page, sort and
+filter 20k+ groups on the server instead of rendering and scanning all of them.
+
+Text search matches word prefixes over titles, example messages, test names,
+code locations and facet values (every query word must match). Facet and
+status filters are exact. All filtering is done with boolean masks over the
+group positions and sorting with precomputed orders.
+"""
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+_WORD_RE = re.compile(r'\w+')
+
+SORT_KEYS = ('count', 'failed', 'broken', 'id', 'title')
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _group_facets(group: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Facet value counts of a group; reports written before facets existed only have epics/features."""
+    facets = group.get('facets')
+    if facets is not None:
+        return facets
+    return {
+        'epic': {name: 1 for name in group.get('epics') or []},
+        'feature': {name: 1 for name in group.get('features') or []},
+    }
+
+
+class GroupIndex:
+    """Word and facet postings plus sort orders for the `groups` list of a report."""
+
+    def __init__(self, groups: List[Dict[str, Any]]):
+        self.groups = groups
+        n = len(groups)
+        words: Dict[str, List[int]] = {}
+        facet_postings: Dict[str, Dict[str, List[int]]] = {}
+        for pos, group in enumerate(groups):
+            example = group.get('example') or {}
+            text = ' '.join(str(part) for part in (
+                group.get('title'), group.get('fingerprint_where'), example.get('message'), example.get('test_name'),
+            ) if part)
+            facets = _group_facets(group)
+            values = [value for counts in facets.values() for value in counts]
+            for word in set(_words(text + ' ' + ' '.join(values))):
+                words.setdefault(word, []).append(pos)
+            for name, counts in facets.items():
+                postings = facet_postings.setdefault(name, {})
+                for value in counts:
+                    postings.setdefault(value, []).append(pos)
+
+        self._vocabulary = sorted(words)
+        self._postings = {word: np.array(p, dtype=np.int32) for word, p in words.items()}
+        self._facets = {name: {value: np.array(p, dtype=np.int32) for value, p in values.items()}
+                        for name, values in facet_postings.items()}
+
+        status = [group.get('status_counts') or {} for group in groups]
+        self._failed = np.fromiter((s.get('failed', 0) for s in status), dtype=np.int64, count=n)
+        self._broken = np.fromiter((s.get('broken', 0) for s in status), dtype=np.int64, count=n)
+        self._counts = np.fromiter((g.get('count', 0) for g in groups), dtype=np.int64, count=n)
+        ids = np.fromiter((g.get('id', i + 1) for i, g in enumerate(groups)), dtype=np.int64, count=n)
+        self._id_positions = {group_id: pos for pos, group_id in enumerate(ids.tolist())}
+        self._sort_values = {'count': self._counts, 'failed': self._failed, 'broken': self._broken, 'id': ids}
+        self._orders: Dict[tuple, np.ndarray] = {}
+
+    @property
+    def facet_names(self) -> List[str]:
+        return list(self._facets)
+
+    def _prefix_mask(self, prefix: str) -> np.ndarray:
+        """Groups containing any word that starts with `prefix`."""
+        mask = np.zeros(len(self.groups), dtype=bool)
+        i = bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            mask[self._postings[self._vocabulary[i]]] = True
+            i += 1
+        return mask
+
+    def _order(self, sort: str, descending: bool) -> np.ndarray:
+        """All positions sorted by `sort`; equal keys keep report order. Built on first use."""
+        order = self._orders.get((sort, descending))
+        if order is None:
+            if sort == 'title':
+                titles = [(g.get('title') or '').lower() for g in self.groups]
+                order = np.array(sorted(range(len(titles)), key=titles.__getitem__, reverse=descending), dtype=np.int64)
+            else:
+                values = self._sort_values[sort]
+                order = np.argsort(-values if descending else values, kind='stable')
+            self._orders[(sort, descending)] = order
+        return order
+
+    def search(self, text: Optional[str] = None, status: Optional[str] = None,
+               facets: Optional[Dict[str, str]] = None, sort: str = 'count',
+               descending: bool = True) -> np.ndarray:
+        """Positions of the matching groups in the requested order."""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"unknown sort key '{sort}', expected one of {', '.join(SORT_KEYS)}")
+        mask = np.ones(len(self.groups), dtype=bool)
+        for word in _words(text or ''):
+            mask &= self._prefix_mask(word)
+        if status == 'failed':
+            mask &= self._failed > 0
+        elif status == 'broken':
+            mask &= self._broken > 0
+        for name, value in (facets or {}).items():
+            facet_mask = np.zeros(len(self.groups), dtype=bool)
+            postings = self._facets.get(name, {}).get(value)
+            if postings is not None:
+                facet_mask[postings] = True
+            mask &= facet_mask
+
+        order = self._order(sort, descending)
+        return order[mask[order]]
+
+    def page(self, positions: np.ndarray, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """The groups at positions[offset:offset + limit]."""
+        return [self.groups[pos] for pos in positions[offset:offset + limit].tolist()]
+
+    def group_by_id(self, group_id: int) -> Optional[Dict[str, Any]]:
+        pos = self._id_positions.get(group_id)
+        return self.groups[pos] if pos is not None else None
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals the dashboard needs without loading the groups: status counts and facet value counts."""
+        facet_totals: Dict[str, Dict[str, int]] = {}
+        facet_missing: Dict[str, int] = {}
+        for name, values in self._facets.items():
+            covered = np.zeros(len(self.groups), dtype=bool)
+            totals = {}
+            for value, postings in values.items():
+                totals[value] = int(self._counts[postings].sum())
+                covered[postings] = True
+            facet_totals[name] = dict(sorted(totals.items(), key=lambda kv: kv[1], reverse=True))
+            facet_missing[name] = int(self._counts[~covered].sum())
+        return {
+            "groups": len(self.groups),
+            "status_totals": {"failed": int(self._failed.sum()), "broken": int(self._broken.sum())},
+            # Summed group counts per facet value, for reports without precomputed facet totals
+            "group_facet_totals": facet_totals,
+            "group_facet_missing": facet_missing,
+        }
@@ -0,0 +1,189 @@
+"""
+Vectorized trend analytics over the report history.
+
+The trend store is turned into a fingerprint x run count matrix (runs in
+chronological order) and every metric is computed with NumPy over whole row
+blocks: flakiness (how often a failure flips between present and absent once it
+has appeared), regression onset (the latest run in which it appeared after at
+least `clean_runs` clean runs), new failures, trailing moving averages and
+spikes (counts far above the trailing window).
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .trend_store import TrendStore
+
+_BLOCK_ROWS = 256  # fingerprints per block; keeps the temporaries cache-sized
+
+
+def count_matrix(store: TrendStore, first_day: date) -> Tuple[List[str], List[str], np.ndarray]:
+    """(runs oldest first, fingerprints, int32 count matrix of shape fingerprints x runs)."""
+    run_counts = store.run_counts_since(first_day)
+    runs = [ts for ts, _ in run_counts]
+    pairs = [np.frombuffer(blob, dtype=np.int32).reshape(-1, 2) for _, blob in run_counts]
+    if not pairs or not sum(len(p) for p in pairs):
+        return runs, [], np.zeros((0, len(runs)), dtype=np.int32)
+    flat = np.concatenate(pairs)
+    cols = np.repeat(np.arange(len(runs)), [len(p) for p in pairs])
+    # Fingerprint ids are small dense integers: map them to rows with a lookup table instead of a sort
+    seen = np.zeros(int(flat[:, 0].max()) + 1, dtype=bool)
+    seen[flat[:, 0]] = True
+    fp_ids = np.flatnonzero(seen)
+    fp_rows = (np.cumsum(seen, dtype=np.int64) - 1)[flat[:, 0]]
+    matrix = np.zeros((len(fp_ids), len(runs)), dtype=np.int32)
+    matrix[fp_rows, cols] = flat[:, 1]
+    names = store.fingerprint_names(fp_ids.tolist())
+    return runs, [names[i] for i in fp_ids.tolist()], matrix
+
+
+def _last_true(mask: np.ndarray) -> np.ndarray:
+    """Column index of the last True per row, -1 for rows without any."""
+    idx = mask.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)
+    return np.where(mask.any(axis=1), idx, -1)
+
+
+def _analyze_block(counts: np.ndarray, clean_runs: int, window: int, spike_z: float) -> Dict[str, np.ndarray]:
+    n_runs = counts.shape[1]
+    present = counts > 0
+    seen_prefix = np.zeros((counts.shape[0], n_runs + 1), dtype=np.int32)
+    np.cumsum(present, axis=1, out=seen_prefix[:, 1:])
+
+    runs_seen = seen_prefix[:, -1]
+    first = present.argmax(axis=1)
+    last = _last_true(present)
+
+    # Flakiness: present/absent flips per run since the first appearance (alternating = 1.0)
+    flips = np.count_nonzero(present[:, 1:] != present[:, :-1], axis=1) - (first > 0)
+    flakiness = flips / np.maximum(n_runs - first - 1, 1)
+
+    # Regression onset: present after `clean_runs` consecutive clean runs
+    onset = np.full(counts.shape[0], -1, dtype=np.int64)
+    if n_runs > clean_runs:
+        clean_before = (seen_prefix[:, clean_runs:n_runs] - seen_prefix[:, :n_runs - clean_runs]) == 0
+        latest = _last_true(present[:, clean_runs:] & clean_before)
+        onset = np.where(latest >= 0, latest + clean_runs, -1)
+
+    count_prefix = np.zeros((counts.shape[0], n_runs + 1), dtype=np.int64)
+    np.cumsum(counts, axis=1, out=count_prefix[:, 1:])
+    total = count_prefix[:, -1]
+    w = min(window, n_runs)
+    moving_average = (count_prefix[:, -1] - count_prefix[:, -1 - w]) / w
+
+    # Spikes: count > mean + z * noise over the trailing window, noise = max(std, sqrt(mean), 1).
+    # Evaluated scaled by the window: (W*c - S)^2 > z^2 * max(W*Q - S^2, W*S, W^2), W*c > S.
+    # Prefix sums are kept in int64; the window-scaled squares would overflow it and are compared in float64.
+    spike_count = np.zeros(counts.shape[0], dtype=np.int64)
+    spike_latest = np.zeros(counts.shape[0], dtype=bool)
+    if n_runs > window:
+        wide = counts.astype(np.int64)
+        sq_prefix = np.zeros_like(count_prefix)
+        np.cumsum(wide * wide, axis=1, out=sq_prefix[:, 1:])
+        sums = (count_prefix[:, window:n_runs] - count_prefix[:, :n_runs - window]).astype(np.float64)
+        noise = (sq_prefix[:, window:n_runs] - sq_prefix[:, :n_runs - window]).astype(np.float64)
+        noise *= window
+        noise -= sums * sums
+        excess = wide[:, window:] * np.float64(window)
+        excess -= sums
+        sums *= window
+        np.maximum(noise, sums, out=noise)
+        np.maximum(noise, window * window, out=noise)
+        rising = excess > 0
+        np.multiply(excess, excess, out=excess)
+        spikes = excess > noise * (spike_z * spike_z)
+        spikes &= rising
+        spike_count = spikes.sum(axis=1)
+        spike_latest = spikes[:, -1]
+
+    return {
+        "total": total,
+        "runs_seen": runs_seen,
+        "first": first,
+        "last": last,
+        "flakiness": flakiness,
+        "onset": onset,
+        "reappeared": (onset >= 0) & (onset > first),
+        "moving_average": moving_average,
+        "spike_count": spike_count,
+        "spike_latest": spike_latest,
+    }
+
+
+def analyze_matrix(counts: np.ndarray, clean_runs: int = 5, window: int = 5,
+                   spike_z: float = 3.0) -> Dict[str, np.ndarray]:
+    """Per-fingerprint metric arrays for a fingerprints x runs count matrix, computed block by block."""
+    if counts.shape[1] == 0:
+        raise ValueError("count matrix has no runs")
+    blocks = [_analyze_block(counts[i:i + _BLOCK_ROWS], clean_runs, window, spike_z)
+              for i in range(0, max(counts.shape[0], 1), _BLOCK_ROWS)]
+    return {key: np.concatenate([b[key] for b in blocks]) for key in blocks[0]}
+
+
+def trend_analytics(store: TrendStore, first_day: date, limit: int = 10, clean_runs: int = 5,
+                    window: int = 5, spike_z: float = 3.0, recent_runs: int = 1,
+                    fingerprints: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Summary of the history from `first_day` on: the top `limit` flaky failures,
+    new failures and regressions in the last `recent_runs` runs, and failures
+    spiking in the latest run. With `fingerprints`, the per-run counts and
+    moving averages of those groups are included as well.
+    """
+    runs, fps, counts = count_matrix(store, first_day)
+    if not runs or not fps:
+        return {"runs": len(runs), "fingerprints": 0}
+    metrics = analyze_matrix(counts, clean_runs=clean_runs, window=window, spike_z=spike_z)
+    n_runs = len(runs)
+    recent_start = max(n_runs - recent_runs, 0)
+
+    def entry(i: int) -> Dict[str, Any]:
+        onset = int(metrics["onset"][i])
+        return {
+            "fingerprint": fps[i],
+            "title": fps[i].split('|', 1)[0],
+            "total_occurrences": int(metrics["total"][i]),
+            "seen_in_runs": int(metrics["runs_seen"][i]),
+            "first_seen": runs[int(metrics["first"][i])],
+            "last_seen": runs[int(metrics["last"][i])],
+            "flakiness": round(float(metrics["flakiness"][i]), 3),
+            "regression_onset": runs[onset] if onset >= 0 else None,
+            "moving_average": round(float(metrics["moving_average"][i]), 2),
+            "latest_count": int(counts[i, -1]),
+            "spikes": int(metrics["spike_count"][i]),
+        }
+
+    def top(mask: np.ndarray, key: np.ndarray) -> List[Dict[str, Any]]:
+        idx = np.flatnonzero(mask)
+        idx = idx[np.argsort(-key[idx], kind='stable')[:limit]]
+        return [entry(int(i)) for i in idx]
+
+    # Flakiness needs a few runs of history before it means anything
+    flaky_mask = (metrics["runs_seen"] >= 3) & (metrics["flakiness"] > 0)
+    new_mask = (metrics["first"] >= max(recent_start, 1))
+    regression_mask = metrics["reappeared"] & (metrics["onset"] >= recent_start)
+    result: Dict[str, Any] = {
+        "runs": n_runs,
+        "first_run": runs[0],
+        "last_run": runs[-1],
+        "fingerprints": len(fps),
+        "parameters": {"clean_runs": clean_runs, "window": window, "spike_z": spike_z, "recent_runs": recent_runs},
+        "most_flaky": top(flaky_mask, metrics["flakiness"] * np.log1p(metrics["runs_seen"])),
+        "new_failures": top(new_mask, counts[:, -1].astype(np.float64)),
+        "regressions": top(regression_mask, counts[:, -1].astype(np.float64)),
+        "spiking": top(metrics["spike_latest"], counts[:, -1] - metrics["moving_average"]),
+    }
+    if fingerprints:
+        fp_index = {fp: i for i, fp in enumerate(fps)}
+        w = min(window, n_runs)
+        series = {}
+        for fp in fingerprints:
+            i = fp_index.get(fp)
+            if i is None:
+                continue
+            row = counts[i].astype(np.float64)
+            ma = np.convolve(row, np.ones(w) / w)[:n_runs]  # trailing average (partial at the start)
+            ma[:w - 1] = np.cumsum(row[:w - 1]) / np.arange(1, w)
+            series[fp] = {**entry(i), "counts": counts[i].tolist(), "moving_averages": np.round(ma, 2).tolist()}
+        result["run_timestamps"] = runs
+        result["series"] = series
+    return result
@@ -0,0 +1,246 @@
+import json
+import os
+import sqlite3
+from array import array
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+TREND_STORE_VERSION = '2'
+
+# (fingerprint, count, failed, broken, facets)
+GroupRow = Tuple[str, int, int, int, Dict[str, Dict[str, int]]]
+
+
+def run_date_of(timestamp: str) -> str:
+    """'YYYY-MM-DD' part of a report directory name ('YYYY-MM-DD_HH-MM-SS')."""
+    return timestamp.split('_', 1)[0]
+
+
+def _split_fingerprint(fingerprint: str) -> Tuple[str, str]:
+    return tuple(fingerprint.split('|', 1)) if '|' in fingerprint else (fingerprint, '')
+
+
+class TrendStore:
+    """
+    Indexed history of per-group aggregates, one row per (report, fingerprint).
+    generate_report_json appends each new report; older reports are added with
+    backfill(). Trend, date-range and first/last-seen queries are answered from
+    the indexes instead of re-reading every report JSON.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        parent = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != TREND_STORE_VERSION:
+            if row is not None:
+                print("🟡 Trend store format changed, rebuilding it (run the backfill to re-index old reports).")
+            # Older formats have different columns, so the tables are recreated rather than emptied
+            self._conn.executescript("""
+                DROP TABLE IF EXISTS runs;
+                DROP TABLE IF EXISTS fingerprints;
+                DROP TABLE IF EXISTS group_stats;
+            """)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (TREND_STORE_VERSION,))
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT NOT NULL UNIQUE,
+                run_date TEXT NOT NULL,
+                total_failures INTEGER NOT NULL,
+                unique_groups INTEGER NOT NULL,
+                counts BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS runs_by_date ON runs (run_date);
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                id INTEGER PRIMARY KEY,
+                fingerprint TEXT NOT NULL UNIQUE,
+                fingerprint_what TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS group_stats (
+                run_id INTEGER NOT NULL,
+                fingerprint_id INTEGER NOT NULL,
+                run_date TEXT NOT NULL,
+                fingerprint_what TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                failed INTEGER NOT NULL,
+                broken INTEGER NOT NULL,
+                facets TEXT NOT NULL,
+                PRIMARY KEY (run_id, fingerprint_id)
+            );
+            CREATE INDEX IF NOT EXISTS group_stats_by_date ON group_stats (run_date);
+            -- Covers the trend aggregation, so it never touches the table rows
+            CREATE INDEX IF NOT EXISTS group_stats_by_what ON group_stats (fingerprint_what, run_date, count);
+        """)
+        self._conn.commit()
+
+    def __enter__(self) -> 'TrendStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # --- Writing ---
+
+    def add_run(self, timestamp: str, total_failures: int, groups: Iterable[GroupRow]) -> None:
+        """Stores (or replaces) the per-group aggregates of one report in a single transaction."""
+        run_date = run_date_of(timestamp)
+        rows = [
+            (fingerprint, _split_fingerprint(fingerprint)[0], count, failed, broken,
+             json.dumps(facets, ensure_ascii=False, separators=(',', ':')))
+            for fingerprint, count, failed, broken, facets in groups
+        ]
+        with self._conn:
+            old = self._conn.execute("SELECT id FROM runs WHERE timestamp = ?", (timestamp,)).fetchone()
+            if old:
+                self._conn.execute("DELETE FROM group_stats WHERE run_id = ?", old)
+                self._conn.execute("DELETE FROM runs WHERE id = ?", old)
+            run_id = self._conn.execute(
+                "INSERT INTO runs (timestamp, run_date, total_failures, unique_groups, counts) VALUES (?, ?, ?, ?, ?)",
+                (timestamp, run_date, total_failures, len(rows), b''),
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO fingerprints (fingerprint, fingerprint_what) VALUES (?, ?)",
+                (row[:2] for row in rows),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO group_stats "
+                "(run_id, fingerprint_id, run_date, fingerprint_what, count, failed, broken, facets) "
+                "SELECT ?, id, ?, fingerprint_what, ?, ?, ?, ? FROM fingerprints WHERE fingerprint = ?",
+                ((run_id, run_date, *row[2:], row[0]) for row in rows),
+            )
+            # Packed (fingerprint id, count) int32 pairs: one blob per run is all a count matrix needs
+            packed = array('i')
+            for pair in self._conn.execute("SELECT fingerprint_id, count FROM group_stats WHERE run_id = ?", (run_id,)):
+                packed.extend(pair)
+            self._conn.execute("UPDATE runs SET counts = ? WHERE id = ?", (packed.tobytes(), run_id))
+
+    def indexed_runs(self) -> List[str]:
+        return [ts for (ts,) in self._conn.execute("SELECT timestamp FROM runs")]
+
+    def backfill(self, history_dir: str, report_name: str = 'failure_analysis_report.json',
+                 force: bool = False) -> int:
+        """Indexes report directories that are not in the store yet. Returns the number added."""
+        if not os.path.isdir(history_dir):
+            return 0
+        known = set() if force else set(self.indexed_runs())
+        added = 0
+        for entry in sorted(os.scandir(history_dir), key=lambda e: e.name):
+            if not entry.is_dir() or entry.name in known:
+                continue
+            report_path = os.path.join(entry.path, report_name)
+            try:
+                with open(report_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"🟡 Warning: skipping report '{entry.name}' during trend backfill: {e}")
+                continue
+            self.add_run(entry.name, *_group_rows_from_report(data))
+            added += 1
+        return added
+
+    # --- Queries ---
+
+    def runs_since(self, first_day: date) -> List[str]:
+        """Report timestamps from `first_day` on, newest first."""
+        rows = self._conn.execute(
+            "SELECT timestamp FROM runs WHERE run_date >= ? ORDER BY timestamp DESC", (first_day.isoformat(),)
+        )
+        return [ts for (ts,) in rows]
+
+    def run_counts_since(self, first_day: date) -> List[Tuple[str, bytes]]:
+        """
+        (timestamp, packed counts) of the runs from `first_day` on, oldest first. The
+        counts are native int32 (fingerprint id, count) pairs, see fingerprint_names().
+        """
+        return self._conn.execute(
+            "SELECT timestamp, counts FROM runs WHERE run_date >= ? ORDER BY timestamp", (first_day.isoformat(),)
+        ).fetchall()
+
+    def fingerprint_names(self, ids: Iterable[int]) -> Dict[int, str]:
+        names: Dict[int, str] = {}
+        ids = list(ids)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            names.update(self._conn.execute(
+                f"SELECT id, fingerprint FROM fingerprints WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return names
+
+    def trends_since(self, first_day: date) -> Dict[str, Dict[str, Any]]:
+        """Occurrences and first/last-seen dates per failure message from `first_day` on."""
+        rows = self._conn.execute(
+            "SELECT fingerprint_what, SUM(count), MIN(run_date), MAX(run_date), COUNT(*) "
+            "FROM group_stats WHERE run_date >= ? GROUP BY fingerprint_what",
+            (first_day.isoformat(),),
+        )
+        return {
+            what: {
+                "total_occurrences": total,
+                "first_seen": first_seen,
+                "last_seen": last_seen,
+                "seen_in_reports": seen,
+                "title": what,
+            }
+            for what, total, first_seen, last_seen, seen in rows
+        }
+
+    def failure_history(self, fingerprint_what: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        """First/last-seen dates and per-report counts of one failure message over all indexed reports."""
+        summary = self._conn.execute(
+            "SELECT MIN(run_date), MAX(run_date), SUM(count), COUNT(DISTINCT run_id) "
+            "FROM group_stats WHERE fingerprint_what = ?",
+            (fingerprint_what,),
+        ).fetchone()
+        if not summary or summary[0] is None:
+            return {}
+        sql = ("SELECT r.timestamp, SUM(g.count), SUM(g.failed), SUM(g.broken) "
+               "FROM group_stats g JOIN runs r ON r.id = g.run_id "
+               "WHERE g.fingerprint_what = ? GROUP BY r.timestamp ORDER BY r.timestamp DESC")
+        params: Tuple = (fingerprint_what,)
+        if limit:
+            sql += " LIMIT ?"
+            params += (int(limit),)
+        occurrences = [
+            {"timestamp": ts, "count": count, "failed": failed, "broken": broken}
+            for ts, count, failed, broken in self._conn.execute(sql, params)
+        ]
+        return {
+            "title": fingerprint_what,
+            "first_seen": summary[0],
+            "last_seen": summary[1],
+            "total_occurrences": summary[2],
+            "seen_in_reports": summary[3],
+            "occurrences": occurrences,
+        }
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
+
+
+def _group_rows_from_report(data: Dict[str, Any]) -> Tuple[int, List[GroupRow]]:
+    """(total_failures, group rows) of a parsed report JSON, including reports written before facets existed."""
+    rows: List[GroupRow] = []
+    for group in data.get('groups') or []:
+        what = group.get('fingerprint_what')
+        if not what:
+            continue
+        where = group.get('fingerprint_where') or ''
+        status_counts = group.get('status_counts') or {}
+        facets = group.get('facets')
+        if facets is None:
+            facets = {
+                'epic': {name: 1 for name in group.get('epics') or []},
+                'feature': {name: 1 for name in group.get('features') or []},
+            }
+        rows.append((f"{what}|{where}", int(group.get('count', 0)),
+                     int(status_counts.get('failed', 0)), int(status_counts.get('broken', 0)), facets))
+    metadata = data.get('metadata') or {}
+    total = metadata.get('total_failures')
+    if total is None:
+        total = sum(row[1] for row in rows)
+    return int(total), rows
@@ -0,0 +1,197 @@
+"""
+Watch mode: follows an Allure results directory while a test run is still
+writing to it. Only result files that appeared since the last poll are
+fingerprinted (by a small, long-lived worker pool) and counted into a
+FailureAggregate; the server streams each batch's changes to the browser.
+
+Allure writes every result file once under a unique name, so a file is
+ingested as soon as it has not been modified for `settle_seconds` and is never
+looked at again. Each poll only stats directory entries it has not ingested
+yet, and at most `max_batch_files` files are ingested per batch, which keeps
+CPU use bounded when thousands of files arrive per minute.
+"""
+import heapq
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from .aggregate import FailureAggregate
+from .cache import IngestionCache
+from .fingerprinter import Fingerprinter
+from .ingestion import (
+    DEFAULT_CHUNK_SIZE, FileEntry, IngestionOptions, ingestion_cache_signature, iter_failures_from_files,
+    load_attachment_excerpt, start_worker_pool
+)
+from .records import FailureRecord
+from .search_index import GroupIndex
+
+# Changed-group sets kept for clients that fall behind; older clients are told to reload
+_HISTORY_LENGTH = 64
+
+
+class LiveReport:
+    """
+    Thread-safe view of a FailureAggregate that grows while it is being served.
+    The watcher applies batches; every batch that changes any group bumps the
+    version and wakes the clients waiting in wait_for_update().
+    """
+
+    def __init__(self, aggregate: FailureAggregate, max_changed_groups: int = 200):
+        self.aggregate = aggregate
+        self.max_changed_groups = max_changed_groups
+        self.version = 0
+        self.files_ingested = 0
+        self.counters: Counter = Counter()
+        self._changes: Deque[Tuple[int, Set[str]]] = deque(maxlen=_HISTORY_LENGTH)
+        self._condition = threading.Condition()
+        self._index: Optional[Tuple[int, GroupIndex]] = None
+
+    def apply(self, records: List[FailureRecord], files: int) -> int:
+        """Counts one ingested batch. Returns the number of groups that changed."""
+        with self._condition:
+            changed = self.aggregate.add_records(records)
+            self.files_ingested += files
+            if changed:
+                self.version += 1
+                self._changes.append((self.version, changed))
+                self._condition.notify_all()
+            return len(changed)
+
+    def metadata(self) -> Dict[str, Any]:
+        with self._condition:
+            return self._metadata()
+
+    def _metadata(self) -> Dict[str, Any]:
+        return {**self.aggregate.metadata(), "live": True, "version": self.version,
+                "files_ingested": self.files_ingested}
+
+    def group_index(self) -> Tuple[int, GroupIndex]:
+        """(version, search index over all groups), rebuilt only after the aggregate changed."""
+        cached = self._index
+        if cached is not None and cached[0] == self.version:
+            return cached
+        with self._condition:
+            version, groups = self.version, self.aggregate.report_groups()
+        self._index = (version, GroupIndex(groups))
+        return self._index
+
+    def example_trace(self, group_id: int) -> Optional[str]:
+        """The exemplar trace of a group, loaded from its attachment on demand. None for unknown ids."""
+        with self._condition:
+            group = self.aggregate.group_by_id(group_id)
+            exemplar = dict(group.exemplar or {}) if group is not None else None
+        if exemplar is None:
+            return None
+        if not exemplar.get('trace') and exemplar.get('trace_attachment'):
+            return load_attachment_excerpt(exemplar['trace_attachment'])
+        return exemplar.get('trace') or ''
+
+    def wait_for_update(self, since: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Blocks until the version moves past `since` (or `timeout` expires, returning None).
+        The update holds the current totals and the groups changed since `since`; `reset`
+        is set when the client fell too far behind and should reload the list.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.version != since, timeout=timeout):
+                return None
+            oldest = self._changes[0][0] if self._changes else self.version + 1
+            reset = since + 1 < oldest
+            changed: Set[str] = set()
+            if not reset:
+                for version, fingerprints in self._changes:
+                    if version > since:
+                        changed |= fingerprints
+            # The largest changed groups only; the client reloads the list when truncated
+            changed_groups = heapq.nlargest(self.max_changed_groups,
+                                            (self.aggregate.groups[fp] for fp in changed), key=lambda g: g.count)
+            return {
+                "version": self.version,
+                "reset": reset,
+                "truncated": len(changed) > len(changed_groups),
+                "changed_count": len(changed),
+                "metadata": self._metadata(),
+                "groups": [self.aggregate.group_dict(g) for g in changed_groups],
+            }
+
+
+class ResultWatcher:
+    """Polls a results directory and feeds settled new result files into a LiveReport in batches."""
+
+    def __init__(self, results_dir: str, live: LiveReport, fingerprinter: Fingerprinter,
+                 options: Optional[IngestionOptions] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_workers: int = 2, poll_interval: float = 2.0, settle_seconds: float = 1.0,
+                 max_batch_files: int = 2000, cache_file: Optional[str] = None):
+        self.results_dir = os.path.abspath(results_dir)
+        self.live = live
+        self.fingerprinter = fingerprinter
+        self.options = options or IngestionOptions()
+        self.chunk_size = chunk_size
+        self.max_workers = max(1, max_workers)
+        self.poll_interval = poll_interval
+        self.settle_ns = int(settle_seconds * 1e9)
+        self.max_batch_files = max(1, max_batch_files)
+        self.cache_file = cache_file
+        self._ingested: Set[str] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def scan(self) -> List[FileEntry]:
+        """Settled result files that were not ingested yet, oldest first, at most max_batch_files."""
+        if not os.path.isdir(self.results_dir):
+            return []
+        now_ns = time.time_ns()
+        ready = []
+        with os.scandir(self.results_dir) as it:
+            for entry in it:
+                # Names seen before are skipped without a stat call
+                if entry.path in self._ingested or not entry.name.endswith('-result.json'):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if now_ns - st.st_mtime_ns >= self.settle_ns:
+                    ready.append((entry.path, st.st_size, st.st_mtime_ns))
+        ready.sort(key=lambda e: e[2])
+        return ready[:self.max_batch_files]
+
+    def run(self) -> None:
+        """Polls until stop() is called. Runs in the calling thread."""
+        cache = None
+        if self.cache_file:
+            # Opened here: SQLite connections belong to the thread that created them
+            cache = IngestionCache(self.cache_file, ingestion_cache_signature(self.fingerprinter, self.options))
+            cache.load_directory(self.results_dir)
+        try:
+            with start_worker_pool(self.max_workers, self.fingerprinter, self.options) as executor:
+                while not self._stop.is_set():
+                    batch = self.scan()
+                    if batch:
+                        started = time.perf_counter()
+                        records = list(iter_failures_from_files(
+                            batch, executor, self.fingerprinter, chunk_size=self.chunk_size, cache=cache,
+                            counters=self.live.counters, max_in_flight=self.max_workers * 2))
+                        if cache is not None:
+                            cache.commit()
+                        self._ingested.update(entry[0] for entry in batch)
+                        changed = self.live.apply(records, len(batch))
+                        print(f"Watch: ingested {len(batch)} files ({len(records)} failures, {changed} groups changed) "
+                              f"in {time.perf_counter() - started:.2f}s.")
+                        if len(batch) == self.max_batch_files:
+                            continue  # more files are waiting, do not sleep
+                    self._stop.wait(self.poll_interval)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, name='result-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
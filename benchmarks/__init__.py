@@ -0,0 +1 @@
+"""Benchmarks on synthetic Allure corpora (see benchmarks/run.py)."""
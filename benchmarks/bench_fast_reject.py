@@ -0,0 +1,90 @@
+"""
+Benchmark: fast-reject decoding of Allure result files.
+
+Builds a temporary mixed pass/fail corpus and compares the original approach
+(full json.load of every file, then a status check) against _process_single_file,
+which rejects passed results from the raw bytes and decodes the rest with the
+fastest available JSON backend.
+
+Usage:
+    python benchmarks/bench_fast_reject.py [--files 5000] [--fail-ratio 0.05]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer import ingestion  # noqa: E402
+
+
+def _make_result(i: int, failed: bool, rng: random.Random) -> dict:
+    status = rng.choice(["failed", "broken"]) if failed else rng.choice(["passed"] * 9 + ["skipped"])
+    details = {"message": f"Error: timeout {i} ms exceeded",
+               "trace": f"Error\n    at Object.<anonymous> (/repo/tests/t{i % 50}.spec.ts:{i % 90}:5)"} if failed else {}
+
+    def step(depth: int) -> dict:
+        return {
+            "name": f"step {depth}",
+            "status": status if depth == 0 else "passed",
+            "statusDetails": details if depth == 0 else {},
+            "parameters": [{"name": f"p{k}", "value": "v" * 64} for k in range(8)],
+            "steps": [step(depth - 1)] if depth > 0 else [],
+        }
+
+    return {
+        "uuid": f"{i:08d}", "name": f"test {i}", "fullName": f"suite.test{i}",
+        "status": status, "statusDetails": details,
+        "labels": [{"name": "epic", "value": f"E{i % 7}"}, {"name": "feature", "value": f"F{i % 13}"}],
+        "parameters": [{"name": f"param{k}", "value": "x" * 128} for k in range(10)],
+        "steps": [step(4) for _ in range(6)],
+    }
+
+
+def _baseline_process(path: str) -> bool:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get("status") in ["failed", "broken"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=5000)
+    parser.add_argument('--fail-ratio', type=float, default=0.05)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"{i:08d}-result.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(_make_result(i, rng.random() < args.fail_ratio, rng), f)
+            paths.append(path)
+
+        def timed(fn) -> float:
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for p in paths:
+                    fn(p)
+                best = min(best, time.perf_counter() - start)
+            return best
+
+        before = timed(_baseline_process)
+        after = timed(ingestion._process_single_file)
+
+    backend = 'orjson' if ingestion._fast_json is not None else 'json (stdlib)'
+    print(f"Corpus: {args.files} files, fail ratio {args.fail_ratio:.0%}, JSON backend: {backend}")
+    print(f"  full json.load per file : {before:.3f}s ({args.files / before:,.0f} files/s)")
+    print(f"  fast-reject + decode    : {after:.3f}s ({args.files / after:,.0f} files/s)")
+    print(f"  speedup                 : {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Deterministic synthetic Allure results for benchmarks.
+
+A CorpusSpec (including its seed) always produces the same files with the same
+content, so timings of different revisions are measured on identical input.
+Failures are drawn from `message_variety` root causes with a skewed frequency,
+like real suites where a few causes dominate. Their messages contain the
+volatile parts the fingerprinter normalizes (UUIDs, long numbers), and Allure's
+copying of failure details up to every failed parent step is reproduced.
+
+    python -m benchmarks.corpus /tmp/corpus --files 10000 --fail-ratio 0.3
+"""
+import argparse
+import json
+import os
+import random
+import uuid
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Written next to the results; a corpus is regenerated only when its spec changed
+SPEC_FILE = 'corpus-spec.json'
+
+_MESSAGE_TEMPLATES = (
+    "waiting for selector `#{entity}-button` failed: timeout {ms}ms exceeded",
+    "Custom message:\n Expected the status code to be 200, but found {status}",
+    "Failed to load resource: net::ERR_{net}",
+    "NO_ENTITY_FOUND_ERROR: {entity} {uuid} was not found",
+    "expect(received).toBe(expected) // {entity} count\n\nExpected: {expected}\nReceived: {received}",
+    "TimeoutError: page.click: Timeout {ms}ms exceeded while waiting for {entity}",
+    "Error: request {uuid} to /api/{entity} failed with status of {status}",
+    "AssertionError: {entity} order {long} is missing from the list",
+)
+_ENTITIES = ('checkout', 'invoice', 'user', 'cart', 'report', 'export', 'toggle', 'search',
+             'payment', 'profile', 'session', 'catalog', 'upload', 'dashboard', 'filter', 'widget')
+_NET_ERRORS = ('FAILED', 'CONNECTION_RESET', 'TIMED_OUT', 'NAME_NOT_RESOLVED', 'ABORTED')
+_AREAS = ('auth', 'billing', 'orders', 'admin', 'search', 'reports', 'settings', 'onboarding')
+_SEVERITIES = ('blocker', 'critical', 'normal', 'minor', 'trivial')
+_BASE_TIME_MS = 1_700_000_000_000
+
+
+class CorpusSpec(NamedTuple):
+    """Shape of a synthetic corpus."""
+    files: int = 1000
+    # Share of tests that fail, and of those the share reported as broken
+    fail_ratio: float = 0.2
+    broken_ratio: float = 0.3
+    # Step tree of every test: nesting depth and children per step
+    step_depth: int = 3
+    steps_per_level: int = 2
+    # Number of distinct failure root causes (roughly the number of groups)
+    message_variety: int = 200
+    # Share of failures whose trace is only in an attachment, and its size
+    attachment_ratio: float = 0.1
+    attachment_kb: int = 32
+    # Distinct values of the feature/suite/owner/host labels (epics get a quarter)
+    label_cardinality: int = 20
+    # Distinct test names the files are spread over
+    tests: int = 2000
+    seed: int = 1
+
+
+class _Cause(NamedTuple):
+    template: str
+    values: Dict[str, Any]
+    spec_file: str
+    line: int
+    function: str
+
+
+def _causes(spec: CorpusSpec) -> List[_Cause]:
+    rng = random.Random(f"{spec.seed}-causes")
+    causes = []
+    for i in range(max(spec.message_variety, 1)):
+        entity = f"{_ENTITIES[i % len(_ENTITIES)]}{i // len(_ENTITIES) or ''}"
+        area = _AREAS[i % len(_AREAS)]
+        causes.append(_Cause(
+            template=_MESSAGE_TEMPLATES[i % len(_MESSAGE_TEMPLATES)],
+            values={"entity": entity, "ms": rng.choice((5000, 10000, 30000)),
+                    "status": rng.choice((400, 404, 409, 500, 502, 503)),
+                    "net": rng.choice(_NET_ERRORS), "expected": rng.randint(1, 9), "received": 0},
+            spec_file=f"tests/{area}/{entity}.spec.ts",
+            line=rng.randint(10, 400),
+            function=f"{entity.capitalize()}Page.{rng.choice(('open', 'submit', 'verify', 'select'))}",
+        ))
+    return causes
+
+
+def _pick_cause(rng: random.Random, count: int) -> int:
+    # Skewed: the first causes are by far the most frequent
+    return min(int(count * rng.random() ** 3), count - 1)
+
+
+def _message(cause: _Cause, rng: random.Random) -> str:
+    return cause.template.format(uuid=uuid.UUID(int=rng.getrandbits(128), version=4),
+                                 long=rng.randint(10_000, 99_999_999), **cause.values)
+
+
+def _trace(cause: _Cause, message: str) -> str:
+    first_line = message.splitlines()[0]
+    return (f"Error: {first_line}\n"
+            f"    at {cause.function} (/repo/{cause.spec_file}:{cause.line}:7)\n"
+            f"    at /repo/node_modules/@playwright/test/lib/worker/workerRunner.js:409:11\n"
+            f"    at processTicksAndRejections (node:internal/process/task_queues:95:5)\n")
+
+
+def iter_failure_samples(spec: CorpusSpec, count: int) -> Iterator[Dict[str, str]]:
+    """`count` failure details (message, trace, step name) with the corpus' distribution of causes."""
+    rng = random.Random(f"{spec.seed}-samples")
+    causes = _causes(spec)
+    for _ in range(count):
+        cause = causes[_pick_cause(rng, len(causes))]
+        message = _message(cause, rng)
+        yield {"message": message, "trace": _trace(cause, message), "step_name": "step"}
+
+
+def _labels(rng: random.Random, spec: CorpusSpec, test: int) -> List[Dict[str, str]]:
+    card = max(spec.label_cardinality, 1)
+    return [
+        {"name": "epic", "value": f"Epic {test % max(card // 4, 1)}"},
+        {"name": "feature", "value": f"Feature {test % card}"},
+        {"name": "story", "value": f"Story {test % (card * 3)}"},
+        {"name": "suite", "value": f"Suite {(test // 7) % card}"},
+        {"name": "owner", "value": f"owner{(test // 3) % card}"},
+        {"name": "severity", "value": _SEVERITIES[test % len(_SEVERITIES)]},
+        {"name": "host", "value": f"ci-runner-{rng.randrange(card)}"},
+        {"name": "thread", "value": f"worker-{rng.randrange(8)}"},
+        {"name": "framework", "value": "playwright"},
+        {"name": "language", "value": "javascript"},
+    ]
+
+
+def _step_tree(rng: random.Random, spec: CorpusSpec, depth: int, start: int,
+               failing: bool) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Steps of one level and, when failing, the chain of steps from this level to the failing leaf."""
+    steps, chain = [], []
+    fail_index = rng.randrange(spec.steps_per_level) if failing else -1
+    for i in range(spec.steps_per_level):
+        children, child_chain = ([], []) if depth <= 1 else _step_tree(rng, spec, depth - 1, start, i == fail_index)
+        step = {
+            "name": f"step {depth}.{i}: {rng.choice(('click', 'fill', 'expect', 'goto', 'wait for'))} "
+                    f"{rng.choice(_ENTITIES)}",
+            "status": "passed", "statusDetails": {}, "stage": "finished",
+            "steps": children, "attachments": [],
+            "parameters": [{"name": "value", "value": f"{rng.getrandbits(32):08x}"}],
+            "start": start, "stop": start + rng.randint(5, 500),
+        }
+        steps.append(step)
+        if i == fail_index:
+            chain = [step] + child_chain
+    return steps, chain
+
+
+def _result(rng: random.Random, spec: CorpusSpec, causes: List[_Cause], index: int,
+            results_dir: str) -> Dict[str, Any]:
+    test = rng.randrange(max(spec.tests, 1))
+    start = _BASE_TIME_MS + index * 1000
+    failing = rng.random() < spec.fail_ratio
+    status = ('broken' if rng.random() < spec.broken_ratio else 'failed') if failing else 'passed'
+    steps, chain = _step_tree(rng, spec, max(spec.step_depth, 1), start, failing) if spec.step_depth > 0 else ([], [])
+    details: Dict[str, str] = {}
+    if failing:
+        cause = causes[_pick_cause(rng, len(causes))]
+        message = _message(cause, rng)
+        trace = _trace(cause, message)
+        leaf_details = {"message": message, "trace": trace}
+        if chain and rng.random() < spec.attachment_ratio:
+            source = f"{uuid.UUID(int=rng.getrandbits(128), version=4)}-attachment.txt"
+            _write_attachment(os.path.join(results_dir, source), rng, message, trace, spec.attachment_kb)
+            chain[-1]["attachments"].append({"name": "console error log", "source": source, "type": "text/plain"})
+            leaf_details = {}
+        # Allure copies the failure up to every failed parent step
+        for step in chain:
+            step["status"] = status
+            step["statusDetails"] = dict(leaf_details)
+        details = {"message": message, "trace": trace} if leaf_details or not chain else {}
+    area = _AREAS[test % len(_AREAS)]
+    return {
+        "uuid": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        "historyId": f"{test:032x}",
+        "name": f"test {test}",
+        "fullName": f"tests/{area}/suite{test % 50}.spec.ts#test {test}",
+        "status": status, "statusDetails": details, "stage": "finished",
+        "steps": steps, "attachments": [], "parameters": [],
+        "labels": _labels(rng, spec, test),
+        "start": start, "stop": start + rng.randint(500, 60_000),
+    }
+
+
+def _write_attachment(path: str, rng: random.Random, message: str, trace: str, size_kb: int) -> None:
+    lines = [message.splitlines()[0], trace]
+    size = sum(len(line) for line in lines)
+    while size < size_kb * 1024:
+        line = f"[{rng.randint(0, 10**6):07d}] console.log: rendering {rng.choice(_ENTITIES)} ({rng.getrandbits(48):012x})\n"
+        lines.append(line)
+        size += len(line)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines[:2]) + ''.join(lines[2:]))
+
+
+def generate_corpus(spec: CorpusSpec, results_dir: str, force: bool = False) -> bool:
+    """
+    Writes the corpus for `spec` to results_dir. An existing corpus of the same spec
+    is kept (returns False); otherwise the directory's result files are replaced.
+    """
+    spec_path = os.path.join(results_dir, SPEC_FILE)
+    if not force and os.path.exists(spec_path):
+        with open(spec_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == spec._asdict():
+                return False
+    os.makedirs(results_dir, exist_ok=True)
+    for name in os.listdir(results_dir):
+        if name.endswith(('-result.json', '-attachment.txt')) or name == SPEC_FILE:
+            os.remove(os.path.join(results_dir, name))
+
+    rng = random.Random(spec.seed)
+    causes = _causes(spec)
+    for index in range(spec.files):
+        result = _result(rng, spec, causes, index, results_dir)
+        with open(os.path.join(results_dir, f"{result['uuid']}-result.json"), 'w', encoding='utf-8') as f:
+            json.dump(result, f, separators=(',', ':'))
+    # Written last: an interrupted generation is redone
+    with open(spec_path, 'w', encoding='utf-8') as f:
+        json.dump(spec._asdict(), f, indent=2)
+    return True
+
+
+def spec_from_args(args: argparse.Namespace, files: Optional[int] = None) -> CorpusSpec:
+    """CorpusSpec from the options added by add_spec_arguments."""
+    return CorpusSpec(**{name: getattr(args, name) for name in CorpusSpec._fields if name != 'files'},
+                      files=files if files is not None else args.files)
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds one option per CorpusSpec field, defaulting to the spec's defaults."""
+    for name, default in CorpusSpec._field_defaults.items():
+        parser.add_argument('--' + name.replace('_', '-'), dest=name, type=type(default), default=default,
+                            metavar=name.upper())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic Allure results corpus.")
+    parser.add_argument('results_dir')
+    parser.add_argument('--force', action='store_true', help="regenerate even if the spec is unchanged")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+    spec = spec_from_args(args)
+    if generate_corpus(spec, args.results_dir, force=args.force):
+        print(f"✅ Generated {spec.files} result files in {args.results_dir}")
+    else:
+        print(f"✅ {args.results_dir} already holds this corpus ({spec.files} result files)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""
+End-to-end benchmarks on synthetic corpora (benchmarks/corpus.py), fully offline.
+
+Every scale runs in a fresh interpreter, so imports are cold and peak memory is
+that of the scale alone. The stages are:
+
+  ingest       iter_failures_from_allure (worker pool) + grouping and facets
+  fingerprint  Fingerprinter.create_fingerprint on corpus-like failures, in-process
+  report       generate_report_json for all groups
+  serve        Flask test client: metadata, group pages and searches, a trace,
+               the full report and the AI summary (fake model, no network)
+
+Results are compared with a stored baseline; a metric that got worse by more than
+the tolerance (and by more than its noise floor) is a regression, and the run
+exits with status 1.
+
+    python -m benchmarks.run --scales 1k,10k         # compare with benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline         # record the baseline on this machine
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.corpus import SPEC_FILE, CorpusSpec, add_spec_arguments, generate_corpus, iter_failure_samples, spec_from_args
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000}
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_DIR, 'benchmarks', 'baseline.json')
+DEFAULT_WORK_DIR = os.path.join(REPO_DIR, '.benchmarks')
+DEFAULT_TOLERANCE = 0.25
+FINGERPRINT_SAMPLES = 20_000
+FINGERPRINT_ROUNDS = 3
+
+# Compared metrics: path in a scale's result -> (unit, noise floor). All are lower-is-better.
+METRICS = {
+    ('stages', 'ingest', 'seconds'): ('s', 0.05),
+    ('stages', 'fingerprint', 'per_call_us'): ('µs', 1.0),
+    ('stages', 'report', 'seconds'): ('s', 0.05),
+    ('stages', 'serve', 'import_seconds'): ('s', 0.05),
+    ('stages', 'serve', 'first_request_ms'): ('ms', 5.0),
+    ('stages', 'serve', 'warm_request_ms'): ('ms', 1.0),
+    ('stages', 'serve', 'summary_ms'): ('ms', 5.0),
+    ('peak_rss_mb',): ('MB', 10.0),
+    ('workers_peak_rss_mb',): ('MB', 10.0),
+}
+
+
+# --- Stages (run in the child interpreter) ---
+
+def _stage_ingest(results_dir: str, workers: Optional[int]):
+    from analyzer import Fingerprinter, IngestionOptions, iter_failures_from_allure
+    from analyzer.aggregate import FailureAggregate
+
+    files = sum(1 for name in os.listdir(results_dir) if name.endswith('-result.json'))
+    options = IngestionOptions(collapse_propagated=True)
+    counters: Counter = Counter()
+    aggregate = FailureAggregate(options.label_names)
+    started, cpu = time.perf_counter(), time.process_time()
+    aggregate.add_records(iter_failures_from_allure(results_dir, max_workers=workers, fingerprinter=Fingerprinter(),
+                                                    options=options, counters=counters))
+    seconds = time.perf_counter() - started
+    failures = aggregate.total_failures
+    stats = {"seconds": round(seconds, 3), "main_cpu_seconds": round(time.process_time() - cpu, 3),
+             "files": files, "files_per_s": round(files / seconds), "failures": failures,
+             "failures_per_s": round(failures / seconds), "groups": len(aggregate.groups)}
+    return stats, aggregate, counters
+
+
+def _stage_fingerprint(spec: CorpusSpec) -> Dict[str, Any]:
+    from analyzer import Fingerprinter
+
+    samples = list(iter_failure_samples(spec, FINGERPRINT_SAMPLES))
+    seconds = float('inf')
+    # Best of a few rounds: a microbenchmark is easily disturbed
+    for _ in range(FINGERPRINT_ROUNDS):
+        fp = Fingerprinter()
+        started = time.perf_counter()
+        fingerprints = {fp.create_fingerprint(sample) for sample in samples}
+        seconds = min(seconds, time.perf_counter() - started)
+    return {"seconds": round(seconds, 3), "calls": len(samples), "fingerprints": len(fingerprints),
+            "per_call_us": round(seconds / len(samples) * 1e6, 2)}
+
+
+def _stage_report(aggregate, counters: Counter) -> Tuple[Dict[str, Any], str]:
+    from analyzer import generate_report_json
+
+    started = time.perf_counter()
+    ranked = [(group.fingerprint, group) for group in aggregate.ranked()]
+    report_path = generate_report_json(ranked, {'report_compression': 'gzip'}, counters=counters,
+                                       facet_index=aggregate.facet_index)
+    seconds = time.perf_counter() - started
+    return {"seconds": round(seconds, 3), "groups": len(ranked),
+            "report_bytes": os.path.getsize(report_path)}, report_path
+
+
+def _stage_serve(report_path: str) -> Dict[str, Any]:
+    # Offline: AI calls are answered by the fake model without latency
+    os.environ['ALLURE_ANALYZER_FAKE_MODEL'] = '0'
+    started = time.perf_counter()
+    import server
+    import_seconds = time.perf_counter() - started
+    client = server.app.test_client()
+    timestamp = os.path.basename(os.path.dirname(report_path))
+    base = f'/reports/{timestamp}'
+
+    def get(url: str, **kwargs) -> float:
+        t = time.perf_counter()
+        response = client.get(url, **kwargs)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        return (time.perf_counter() - t) * 1000
+
+    first = get('/reports') + get(f'{base}/metadata') + get(f'{base}/groups?limit=50')
+    warm_urls = [f'{base}/groups?offset={50 * i}&limit=50' for i in range(1, 6)] + [
+        f'{base}/groups?sort=failed&limit=50', f'{base}/groups?sort=title&order=asc&limit=50',
+        f'{base}/groups?q=timeout&limit=50', f'{base}/groups?q=checkout&status=broken&limit=50',
+        f'{base}/groups?epic=Epic%200&limit=50', f'{base}/metadata', f'{base}/groups/1/trace',
+    ]
+    warm = [get(url) for url in warm_urls]
+    full = get(base, headers={'Accept-Encoding': 'gzip'})
+    summary = get(f'{base}/summary')
+    return {"seconds": round(time.perf_counter() - started, 3), "import_seconds": round(import_seconds, 3),
+            "first_request_ms": round(first, 1), "warm_request_ms": round(sum(warm) / len(warm), 2),
+            "full_report_gzip_ms": round(full, 1), "summary_ms": round(summary, 1)}
+
+
+def run_stages(results_dir: str, workers: Optional[int]) -> Dict[str, Any]:
+    """All stages on one corpus, in this process (the working directory receives reports_history)."""
+    from analyzer.profiling import peak_rss_mb
+
+    with open(os.path.join(results_dir, SPEC_FILE), 'r', encoding='utf-8') as f:
+        spec = CorpusSpec(**json.load(f))
+    stages: Dict[str, Any] = {}
+    started = time.perf_counter()
+    stages['ingest'], aggregate, counters = _stage_ingest(results_dir, workers)
+    stages['fingerprint'] = _stage_fingerprint(spec)
+    stages['report'], report_path = _stage_report(aggregate, counters)
+    del aggregate
+    stages['serve'] = _stage_serve(report_path)
+    return {"files": spec.files, "stages": stages, "total_seconds": round(time.perf_counter() - started, 3),
+            "peak_rss_mb": peak_rss_mb(), "workers_peak_rss_mb": peak_rss_mb(children=True)}
+
+
+# --- Harness ---
+
+def _machine() -> Dict[str, Any]:
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                  text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        revision = None
+    return {"platform": platform.platform(), "python": platform.python_version(),
+            "cpus": os.cpu_count(), "revision": revision}
+
+
+def run_scale(name: str, spec: CorpusSpec, work_dir: str, workers: Optional[int], repeat: int) -> Dict[str, Any]:
+    """Generates (or reuses) the corpus of one scale and runs the stages in fresh interpreters."""
+    results_dir = os.path.join(work_dir, f'corpus-{name}')
+    started = time.perf_counter()
+    if generate_corpus(spec, results_dir):
+        print(f"Generated the {name} corpus ({spec.files} files) in {time.perf_counter() - started:.1f}s.")
+    runs = []
+    for _ in range(max(repeat, 1)):
+        run_dir = tempfile.mkdtemp(prefix=f'run-{name}-', dir=work_dir)
+        output = os.path.join(run_dir, 'stages.json')
+        command = [sys.executable, '-m', 'benchmarks.run', '--run-stages', os.path.abspath(results_dir),
+                   '--stages-output', output]
+        if workers:
+            command += ['--workers', str(workers)]
+        env = {**os.environ, 'PYTHONPATH': REPO_DIR + os.pathsep + os.environ.get('PYTHONPATH', '')}
+        try:
+            subprocess.run(command, cwd=run_dir, env=env, check=True, stdout=subprocess.DEVNULL)
+            with open(output, 'r', encoding='utf-8') as f:
+                runs.append(json.load(f))
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+    # The fastest repetition is the least disturbed by other load on the machine
+    return min(runs, key=lambda r: r['total_seconds'])
+
+
+def _metric(result: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    value: Any = result
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Prints the changes against the baseline and returns the regressions."""
+    regressions = []
+    for scale, result in results['scales'].items():
+        base = baseline.get('scales', {}).get(scale)
+        if base is None:
+            print(f"🟡 {scale}: no baseline for this scale.")
+            continue
+        for path, (unit, floor) in METRICS.items():
+            current, previous = _metric(result, path), _metric(base, path)
+            if current is None or not previous:
+                continue
+            ratio = current / previous
+            name = '.'.join(path[1:] if path[0] == 'stages' else path)
+            line = f"{scale} {name}: {previous:g} -> {current:g} {unit} ({(ratio - 1) * 100:+.0f}%)"
+            if ratio > 1 + tolerance and current - previous > floor:
+                regressions.append(line)
+                print(f"❌ REGRESSION {line}")
+            elif ratio < 1 - tolerance and previous - current > floor:
+                print(f"✅ improved {line}")
+    return regressions
+
+
+def _print_table(results: Dict[str, Any]) -> None:
+    header = (f"{'scale':>6} {'files':>7} {'ingest s':>9} {'files/s':>8} {'fp µs':>7} {'report s':>9} "
+              f"{'1st req ms':>10} {'req ms':>7} {'RSS MB':>7} {'workers MB':>10}")
+    print(header)
+    print('-' * len(header))
+    for scale, r in results['scales'].items():
+        s = r['stages']
+        print(f"{scale:>6} {r['files']:>7} {s['ingest']['seconds']:>9.2f} {s['ingest']['files_per_s']:>8} "
+              f"{s['fingerprint']['per_call_us']:>7.1f} {s['report']['seconds']:>9.2f} "
+              f"{s['serve']['first_request_ms']:>10.1f} {s['serve']['warm_request_ms']:>7.2f} "
+              f"{r['peak_rss_mb'] or 0:>7.0f} {r['workers_peak_rss_mb'] or 0:>10.0f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, fingerprinting, reporting and serving "
+                                                 "on synthetic Allure corpora.")
+    parser.add_argument('--scales', default=','.join(SCALES),
+                        help=f"comma-separated scales from {', '.join(SCALES)} (default: all)")
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help="where corpora are kept between runs")
+    parser.add_argument('--workers', type=int, help="ingestion worker processes (default: as in production)")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per scale; the fastest is kept")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline results file")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="relative slowdown accepted before a metric counts as a regression")
+    parser.add_argument('--output', help="also write the results to this file")
+    add_spec_arguments(parser)
+    # Internal: run the stages of one corpus in this interpreter
+    parser.add_argument('--run-stages', metavar='RESULTS_DIR', help=argparse.SUPPRESS)
+    parser.add_argument('--stages-output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stages:
+        result = run_stages(args.run_stages, args.workers)
+        with open(args.stages_output, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return 0
+
+    scales = [s.strip() for s in args.scales.split(',') if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"unknown scales: {', '.join(unknown)}")
+    os.makedirs(args.work_dir, exist_ok=True)
+    spec = spec_from_args(args, files=0)
+    results: Dict[str, Any] = {"created": dt.datetime.now().isoformat(timespec='seconds'), "machine": _machine(),
+                               "corpus": {k: v for k, v in spec._asdict().items() if k != 'files'},
+                               "workers": args.workers, "scales": {}}
+    for scale in scales:
+        print(f"Running the {scale} benchmark ...")
+        results['scales'][scale] = run_scale(scale, spec._replace(files=SCALES[scale]), args.work_dir,
+                                             args.workers, args.repeat)
+    print()
+    _print_table(results)
+    print()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    regressions: List[str] = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('corpus') != results['corpus'] or baseline.get('workers') != results['workers']:
+            print("🟡 Warning: the baseline was measured with a different corpus spec or worker count.")
+        if (baseline.get('machine') or {}).get('platform') != results['machine']['platform']:
+            print("🟡 Warning: the baseline was measured on a different machine; timings may not be comparable.")
+        regressions = compare(results, baseline, args.tolerance)
+        if not regressions:
+            print(f"✅ No regressions against the baseline from {baseline.get('created')} "
+                  f"(tolerance {args.tolerance:.0%}).")
+    elif not args.save_baseline:
+        print(f"🟡 No baseline at {args.baseline}; record one with --save-baseline.")
+
+    if args.save_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                # Scales not run this time keep their previous baseline
+                results['scales'] = {**json.load(f).get('scales', {}), **results['scales']}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}")
+    return 1 if regressions and not args.save_baseline else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,23 @@
+import argparse
+import contextlib
+import glob
+import json
 import os
 import sys
+import time
+from collections import Counter
 import yaml
-import webbrowser
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, TextIO, Tuple
 
-# Local package imports
-from analyzer import collect_failures_from_allure, Fingerprinter, generate_report_json
-# Import the Flask app object from your server file
-from server import app 
+# Local package imports. The web server (Flask, google-genai) is imported only by the
+# commands that serve, so headless runs in CI start quickly.
+from analyzer import (
+    iter_failures_from_allure, ingestion_cache_signature, IngestionCache, IngestionOptions,
+    Fingerprinter, TrendStore, generate_report_json
+)
+from analyzer.aggregate import PARTIAL_SUFFIX, FailureAggregate, merge_partials, write_partial
+from analyzer.facets import DEFAULT_FACET_LABELS
+from analyzer.profiling import Profiler
 
 def _load_config(base_dir: str) -> Dict:
     """Load config.yaml from the project root."""
@@ -29,44 +39,270 @@ def _as_bool(value, default: bool = True) -> bool:
     s = str(value).strip().lower()
     return s not in ('false', '0', 'no', 'off', '')
 
-def main() -> None:
-    # --- STAGE 1: RUN ANALYSIS ---
+def _facet_labels(config: Dict) -> Tuple[str, ...]:
+    """Label names to index as facets; epic and feature are always included."""
+    configured = config.get('facet_labels') or list(DEFAULT_FACET_LABELS)
+    names = ['epic', 'feature'] + [str(n) for n in configured]
+    return tuple(dict.fromkeys(names))
+
+def _print_rule_stats(fp: Fingerprinter) -> None:
+    """Print per-rule hit counts and regex time collected during fingerprinting."""
+    stats = sorted(fp.rule_stats().items(), key=lambda kv: kv[1]['hits'], reverse=True)
+    print("Fingerprint rule stats (hits / regex evaluations / time):")
+    for name, s in stats:
+        print(f"  {name:<32} {s['hits']:>8} {s['evaluations']:>8} {s['seconds'] * 1000:>10.2f} ms")
+
+def _backfill_trends(config: Dict) -> Dict[str, Any]:
+    """Index existing reports in reports_history that are not in the trend store yet."""
+    trend_store_file = config.get('trend_store_file')
+    if not trend_store_file:
+        print("❌ ERROR: trend_store_file is not set in config.yaml.")
+        sys.exit(1)
+    report_name = os.path.splitext(config.get('output_report_file', 'failure_analysis_report.html'))[0] + '.json'
+    with TrendStore(trend_store_file) as store:
+        added = store.backfill('reports_history', report_name=report_name)
+        total = len(store.indexed_runs())
+    print(f"✅ Trend store: indexed {added} new reports ({total} in total) in {trend_store_file}")
+    return {"status": "ok", "trend_store_file": trend_store_file, "added_reports": added, "total_reports": total}
+
+def _serve(open_browser: bool = True) -> None:
+    """Start the web server on the report history and open the dashboard."""
+    print("\n" + "="*50)
+    print("STAGE 2: Starting the Web Server...")
+    print("="*50)
+
+    # Imported here: only the serving commands need Flask and the AI client
+    from server import app
+
+    url = "http://localhost:8000"
+    print(f"✅ Report server starting at: {url}")
+    if open_browser:
+        import webbrowser
+        webbrowser.open_new_tab(url)
+
+    # Run the Flask app from server.py
+    app.run(host='127.0.0.1', port=8000, debug=False)
+
+def _cluster_aggregate(config: Dict, aggregate: FailureAggregate) -> Dict[str, List[str]]:
+    """Merge near-duplicate groups of an aggregate when clustering is enabled; returns the merged members."""
+    clustering_cfg = config.get('clustering') or {}
+    if not _as_bool(clustering_cfg.get('enabled', False), default=False):
+        return {}
+    # Imported lazily: clustering is optional and needs NumPy
+    from analyzer.clustering import cluster_fingerprints
+    threshold = float(clustering_cfg.get('similarity_threshold', 0.8))
+    num_perm = int(clustering_cfg.get('num_perm', 64))
+    before = len(aggregate.groups)
+    fingerprints = list(aggregate.groups)
+    group_members: Dict[str, List[str]] = {}
+    for cluster in cluster_fingerprints(fingerprints, threshold=threshold, num_perm=num_perm):
+        members = sorted((fingerprints[i] for i in cluster), key=lambda f: aggregate.groups[f].count, reverse=True)
+        for member in members[1:]:
+            aggregate.merge_group(members[0], member)
+        group_members[members[0]] = members
+    print(f"Clustering near-duplicate groups (threshold={threshold}): {before} -> {len(aggregate.groups)} groups.")
+    return group_members
+
+def _top_groups(ranked: List[Tuple[str, int]], limit: int = 5) -> List[Dict[str, Any]]:
+    """The largest groups for a run summary: message, code location and count."""
+    top = []
+    for fingerprint, count in ranked[:limit]:
+        what, _, where = fingerprint.partition('|')
+        top.append({"title": what, "where": where, "count": count})
+    return top
+
+def _partial_paths(inputs: List[str]) -> List[str]:
+    """Partial aggregate files given directly or found in the given directories."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, '*' + PARTIAL_SUFFIX))))
+        else:
+            paths.append(item)
+    return paths
+
+def _run_map(config: Dict, results_dir: str, fp: Fingerprinter, options: IngestionOptions,
+             include_broken: bool, chunk_size: int, output: str) -> Dict[str, Any]:
+    """Analyze this shard's results into a partial aggregate file for a later reduce."""
+    cache = None
+    cache_file = config.get('ingestion_cache_file')
+    signature = ingestion_cache_signature(fp, options)
+    if cache_file:
+        cache = IngestionCache(cache_file, signature)
+    aggregate = FailureAggregate(options.label_names, include_broken=include_broken,
+                                 max_exemplars=int(config.get('partial_max_exemplars', 3)))
+    counters: Counter = Counter()
+    sources = set()  # result files with failures
+
+    def _track_sources(records):
+        for record in records:
+            sources.add(record.source)
+            yield record
+
+    try:
+        aggregate.add_records(_track_sources(iter_failures_from_allure(
+            results_dir, chunk_size=chunk_size, cache=cache, fingerprinter=fp, options=options, counters=counters)))
+    finally:
+        if cache is not None:
+            cache.close()
+    # Shards run on other machines: attachment traces are read now, while the files exist
+    aggregate.resolve_attachment_traces(counters)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    write_partial(aggregate, output, signature, sources=len(sources))
+    print(f"✅ Partial aggregate written to {output}: {aggregate.total_failures} failures "
+          f"in {len(aggregate.groups)} groups ({os.path.getsize(output):,} bytes).")
+    return {"status": "ok" if aggregate.groups else "no_failures", "results_dir": results_dir,
+            "partial_file": output, "total_failures": aggregate.total_failures,
+            "groups": len(aggregate.groups), "files_with_failures": len(sources)}
+
+def _run_reduce(config: Dict, inputs: List[str], merge_into: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Merge partial aggregates into a report (or, with `merge_into`, into one bigger
+    partial for a further reduce level). Returns a summary of the result.
+    """
+    paths = _partial_paths(inputs)
+    if not paths:
+        print("❌ ERROR: no partial aggregates found.")
+        return {"status": "error", "error": "no partial aggregates found", "partials": 0}
+    started = time.perf_counter()
+    aggregate, header = merge_partials(paths, max_workers=max(1, int(config.get('reduce_workers', 1))))
+    print(f"Merged {header['partials']} partial aggregates ({header['sources']} result files with failures) "
+          f"in {time.perf_counter() - started:.2f}s: {aggregate.total_failures} failures in {len(aggregate.groups)} groups.")
+    if len(header['signatures']) > 1:
+        print("🟡 Warning: the partials were produced with different fingerprint rules or options; "
+              "the same failure may appear in several groups.")
+
+    summary = {"status": "ok", "partials": header['partials'], "files_with_failures": header['sources'],
+               "total_failures": aggregate.total_failures, "groups": len(aggregate.groups)}
+    if merge_into:
+        os.makedirs(os.path.dirname(os.path.abspath(merge_into)), exist_ok=True)
+        write_partial(aggregate, merge_into, header['signatures'][0], sources=header['sources'])
+        print(f"✅ Merged partial aggregate written to {merge_into}.")
+        return {**summary, "partial_file": merge_into}
+
+    if not aggregate.groups:
+        print("\nNo failures to analyze after merging. Exiting.")
+        return {**summary, "status": "no_failures", "report_file": None}
+    group_members = _cluster_aggregate(config, aggregate)
+    try:
+        top_n = int(config.get('top_n_groups_to_report', 20))
+    except Exception:
+        top_n = 20
+    groups_to_report = [(g.fingerprint, g) for g in aggregate.ranked(top_n if top_n > 0 else None)]
+    report_file = generate_report_json(groups_to_report, config, group_members=group_members,
+                                       facet_index=aggregate.facet_index)
+    return {**summary, "groups": len(aggregate.groups), "reported_groups": len(groups_to_report),
+            "report_file": report_file, "top_groups": _top_groups([(f, g.count) for f, g in groups_to_report])}
+
+def _run_watch(config: Dict, results_dir: str, fp: Fingerprinter, options: IngestionOptions,
+               include_broken: bool, chunk_size: int, open_browser: bool = True) -> None:
+    """Serve a live report that grows while new result files arrive in results_dir."""
+    from analyzer.watch import LiveReport, ResultWatcher
+    from server import app, enable_live_report
+
+    watch_cfg = config.get('watch') or {}
+    live = LiveReport(FailureAggregate(options.label_names, include_broken=include_broken))
+    watcher = ResultWatcher(
+        results_dir, live, fp, options=options, chunk_size=chunk_size,
+        max_workers=int(watch_cfg.get('max_workers', 2)),
+        poll_interval=float(watch_cfg.get('poll_interval', 2.0)),
+        settle_seconds=float(watch_cfg.get('settle_seconds', 1.0)),
+        max_batch_files=int(watch_cfg.get('max_batch_files', 2000)),
+        cache_file=config.get('ingestion_cache_file') or None,
+    )
+    enable_live_report(live)
+    watcher.start()
+
+    url = "http://localhost:8000"
+    print(f"✅ Watching {results_dir} for new results. Live report at: {url}")
+    if open_browser:
+        import webbrowser
+        webbrowser.open_new_tab(url)
+    try:
+        # Threaded, so the event streams do not block the other routes
+        app.run(host='127.0.0.1', port=8000, debug=False, threaded=True)
+    finally:
+        watcher.stop(timeout=10)
+        print(f"Watch stopped: {live.files_ingested} files, {live.aggregate.total_failures} failures "
+              f"in {len(live.aggregate.groups)} groups.")
+
+def _ingestion_setup(config: Dict, results_dir: Optional[str] = None
+                     ) -> Tuple[str, Fingerprinter, IngestionOptions, bool, int]:
+    """Results directory, fingerprinter and ingestion options from the config (STAGE 1 preamble)."""
     print("="*50)
     print("STAGE 1: Analyzing Allure results...")
     print("="*50)
-    
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    config = _load_config(base_dir)
 
-    results_dir = config.get('allure_results_directory', './allure-results')
+    results_dir = results_dir or config.get('allure_results_directory', './allure-results')
     include_broken = _as_bool(config.get('include_broken', True), default=True)
+    options = IngestionOptions(
+        collapse_propagated=_as_bool(config.get('collapse_propagated_failures', True), default=True),
+        label_names=_facet_labels(config),
+    )
 
-    print(f"Scanning Allure results in: {results_dir}")
-    all_failures = collect_failures_from_allure(results_dir)
-    print(f"Found {len(all_failures)} individual failure steps (failed + broken).")
+    try:
+        chunk_size = int(config.get('ingestion_chunk_size', 64))
+    except Exception:
+        chunk_size = 64
 
     if include_broken:
-        failures = all_failures
         print("Including BROKEN tests in analysis (include_broken=true).")
     else:
-        failures = [f for f in all_failures if (f.get('status') or '').lower() == 'failed']
-        print(f"Excluding BROKEN tests (include_broken=false). Kept {len(failures)} failed steps.")
+        print("Excluding BROKEN tests (include_broken=false).")
 
-    if not failures:
-        print("\nNo failures to analyze after filtering. Exiting.")
-        return
+    print(f"Scanning Allure results in: {results_dir}")
+    print("Fingerprinting in ingestion workers and grouping failures as they arrive ...")
+    collect_rule_stats = _as_bool(config.get('fingerprint_rule_stats', False), default=False)
+    fp = Fingerprinter(rules=config.get('fingerprint_rules') or [], collect_stats=collect_rule_stats)
+    return results_dir, fp, options, include_broken, chunk_size
 
-    print("Fingerprinting and grouping failures ...")
-    fp = Fingerprinter()
+def _run_analyze(config: Dict, results_dir: str, fp: Fingerprinter, options: IngestionOptions,
+                 include_broken: bool, chunk_size: int, profiler: Optional[Profiler] = None) -> Dict[str, Any]:
+    """One-shot analysis of results_dir into a new report in reports_history; returns a summary."""
+    profiler = profiler or Profiler()
+    cache = None
+    cache_file = config.get('ingestion_cache_file')
+    if cache_file:
+        cache = IngestionCache(cache_file, ingestion_cache_signature(fp, options))
 
-    groups: Dict[str, List[Dict]] = {}
-    for failure in failures:
-        key = fp.create_fingerprint(failure)
-        groups.setdefault(key, []).append(failure)
+    # Failures are counted as workers finish: groups keep counts, facet counts and a
+    # few exemplars, never the records themselves
+    total_found = 0
+    counters: Counter = Counter()
+    aggregate = FailureAggregate(options.label_names, include_broken=include_broken)
+    with profiler.stage('ingest'):
+        try:
+            records = iter_failures_from_allure(results_dir, chunk_size=chunk_size, cache=cache, fingerprinter=fp,
+                                                options=options, counters=counters, profiler=profiler)
+            for record in records:
+                total_found += 1
+                aggregate.add(record)
+        finally:
+            if cache is not None:
+                cache.close()
+    if profiler.enabled:
+        profiler.rule_stats = fp.rule_stats()
 
-    sorted_groups: List[Tuple[str, List[Dict]]] = sorted(
-        groups.items(), key=lambda kv: len(kv[1]), reverse=True
-    )
+    kept = aggregate.total_failures
+    status_counts = {status: n for status, n in (('failed', aggregate.failed), ('broken', aggregate.broken)) if n}
+    summary: Dict[str, Any] = {"results_dir": results_dir, "failures_found": total_found, "failures_kept": kept,
+                               "status_counts": status_counts}
+    if cache is not None:
+        print(f"Ingestion cache: reused {cache.hits} files, parsed {cache.misses} new or changed files.")
+        summary["files"] = {"reused": cache.hits, "parsed": cache.misses}
+
+    print(f"Found {total_found} individual failure steps (failed + broken).")
+    if fp.collect_stats:
+        _print_rule_stats(fp)
+    if not include_broken:
+        print(f"Kept {kept} failed steps after excluding BROKEN.")
+
+    if not aggregate.groups:
+        print("\nNo failures to analyze after filtering.")
+        return {"status": "no_failures", **summary, "groups": 0, "report_file": None}
+
+    with profiler.stage('clustering'):
+        group_members = _cluster_aggregate(config, aggregate)
 
     top_n_raw = config.get('top_n_groups_to_report', 20)
     try:
@@ -76,24 +312,169 @@ def main() -> None:
         
     if top_n > 0:
         print(f"Generating report for the top {top_n} failure groups...")
-        groups_to_report = sorted_groups[:top_n]
     else:
         print("Generating report for ALL failure groups...")
-        groups_to_report = sorted_groups
+    # Heap selection for the top N: O(n log k) instead of sorting every group
+    groups_to_report = [(g.fingerprint, g) for g in aggregate.ranked(top_n if top_n > 0 else None)]
 
-    generate_report_json(groups_to_report, config)
-    
-    # --- STAGE 2: START THE WEB SERVER ---
-    print("\n" + "="*50)
-    print("STAGE 2: Starting the Web Server...")
-    print("="*50)
+    with profiler.stage('report'):
+        report_file = generate_report_json(groups_to_report, config, group_members=group_members,
+                                           counters=counters, facet_index=aggregate.facet_index,
+                                           profiler=profiler)
+    print(f"Attachments: {counters['attachment_bytes_read']:,} bytes read in {counters['attachment_reads']} reads.")
+    if profiler.enabled:
+        profiler.print_summary()
+        summary["profile"] = profiler.metadata()
+    return {"status": "ok", **summary, "groups": len(aggregate.groups), "reported_groups": len(groups_to_report),
+            "report_file": report_file,
+            "top_groups": _top_groups([(f, g.count) for f, g in groups_to_report])}
 
-    url = "http://localhost:8000"
-    print(f"✅ Analysis complete. Opening report at: {url}")
-    webbrowser.open_new_tab(url)
-    
-    # Run the Flask app from server.py
-    app.run(host='127.0.0.1', port=8000, debug=False)
+def _run_profiled_analyze(args: argparse.Namespace, config: Dict, results_dir: str, fp: Fingerprinter,
+                          options: IngestionOptions, include_broken: bool, chunk_size: int) -> Dict[str, Any]:
+    """_run_analyze with the profiling requested on the command line."""
+    profiler = Profiler(args.profile, args.profile_output)
+    if profiler.enabled:
+        # Per-rule regex timing is part of the profile
+        fp.collect_stats = True
+    profiler.start()
+    try:
+        summary = _run_analyze(config, results_dir, fp, options, include_broken, chunk_size, profiler)
+    finally:
+        stats_file = profiler.stop()
+    if stats_file:
+        print(f"✅ cProfile stats written to {stats_file} (view with: python -m pstats {stats_file})")
+    return summary
+
+def _write_summary(summary: Dict[str, Any], target: str, stdout: Optional[TextIO] = None) -> None:
+    """Writes the machine-readable run summary to a file, or to `stdout` for '-'."""
+    text = json.dumps(summary, indent=2, default=str)
+    if target == '-':
+        print(text, file=stdout or sys.stdout)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    with open(target, 'w', encoding='utf-8') as f:
+        f.write(text + '\n')
+    print(f"Run summary written to {target}")
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Analyze Allure results and serve the failure report. "
+                    "Without a command, analyzes and then serves (same as `analyze --serve`).")
+    # Options of the commands that read allure-results
+    results = argparse.ArgumentParser(add_help=False)
+    results.add_argument('--results-dir', metavar='DIR',
+                         help="Allure results directory (default: allure_results_directory from config.yaml)")
+    # Options of the commands that finish with a result
+    summary = argparse.ArgumentParser(add_help=False)
+    summary.add_argument('--summary-json', metavar='FILE',
+                         help="write a machine-readable summary of the run to FILE ('-' for stdout)")
+    # Options of the commands that start the web server
+    serving = argparse.ArgumentParser(add_help=False)
+    serving.add_argument('--no-browser', action='store_true', help="do not open the dashboard in a browser")
+
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    analyze = commands.add_parser('analyze', parents=[results, summary, serving],
+                                  help="analyze the results into a new report (headless unless --serve)")
+    analyze.add_argument('--serve', action='store_true', help="start the web server after the analysis")
+    analyze.add_argument('--profile', action='store_true',
+                         help="time every stage and store the profile in the report's metadata")
+    analyze.add_argument('--profile-output', metavar='FILE',
+                         help="also run cProfile on the main process and write its stats to FILE (implies --profile)")
+    commands.add_parser('serve', parents=[serving], help="serve the existing reports without analyzing")
+    commands.add_parser('watch', parents=[results, serving],
+                        help="keep ingesting new result files and serve a live report")
+    map_cmd = commands.add_parser('map', parents=[results, summary],
+                                  help="analyze this shard's results into a partial aggregate file")
+    map_cmd.add_argument('partial_file', metavar='PARTIAL_FILE')
+    reduce = commands.add_parser('reduce', parents=[summary, serving],
+                                 help="merge partial aggregate files (or directories of them) into a report")
+    reduce.add_argument('partials', nargs='+', metavar='PARTIAL')
+    reduce.add_argument('--merge-into', metavar='PARTIAL_FILE',
+                        help="write the merged partial aggregate instead of a report")
+    reduce.add_argument('--serve', action='store_true', help="start the web server after writing the report")
+    commands.add_parser('backfill-trends', parents=[summary],
+                        help="index existing reports in reports_history into the trend store")
+
+    # Flags of earlier versions, still accepted
+    parser.add_argument('--backfill-trends', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--watch', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--map', metavar='PARTIAL_FILE', help=argparse.SUPPRESS)
+    parser.add_argument('--reduce', nargs='+', metavar='PARTIAL', help=argparse.SUPPRESS)
+    parser.add_argument('--merge-into', metavar='PARTIAL_FILE', help=argparse.SUPPRESS)
+    return parser
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        # No command: the old flags, or analyze and serve as before
+        legacy = argparse.Namespace(results_dir=None, summary_json=None, no_browser=False, serve=True,
+                                    profile=False, profile_output=None)
+        if args.backfill_trends:
+            legacy.command = 'backfill-trends'
+        elif args.watch:
+            legacy.command = 'watch'
+        elif args.map:
+            legacy.command, legacy.partial_file = 'map', args.map
+        elif args.reduce:
+            legacy.command, legacy.partials = 'reduce', args.reduce
+            legacy.merge_into = args.merge_into
+            legacy.serve = not args.merge_into
+        else:
+            legacy.command = 'analyze'
+        if args.merge_into and legacy.command != 'reduce':
+            parser.error("--merge-into requires --reduce")
+        return legacy
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    if getattr(args, 'summary_json', None) == '-':
+        # stdout carries only the JSON summary; progress and log lines go to stderr
+        stdout = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            return _run_command(args, stdout)
+    return _run_command(args, sys.stdout)
+
+def _run_command(args: argparse.Namespace, stdout: TextIO) -> int:
+    """Runs the parsed command; returns the process exit code (1 when the summary status is 'error')."""
+    started = time.perf_counter()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    config = _load_config(base_dir)
+    open_browser = not getattr(args, 'no_browser', False)
+
+    if args.command == 'serve':
+        _serve(open_browser)
+        return 0
+    if args.command == 'watch':
+        results_dir, fp, options, include_broken, chunk_size = _ingestion_setup(config, args.results_dir)
+        _run_watch(config, results_dir, fp, options, include_broken, chunk_size, open_browser)
+        return 0
+    try:
+        if args.command == 'backfill-trends':
+            summary = _backfill_trends(config)
+        elif args.command == 'reduce':
+            summary = _run_reduce(config, args.partials, args.merge_into)
+        else:
+            results_dir, fp, options, include_broken, chunk_size = _ingestion_setup(config, args.results_dir)
+            if args.command == 'map':
+                summary = _run_map(config, results_dir, fp, options, include_broken, chunk_size, args.partial_file)
+            else:
+                summary = _run_profiled_analyze(args, config, results_dir, fp, options, include_broken, chunk_size)
+    except FileNotFoundError as e:
+        # A missing results directory or partial file must fail the CI step, not look like a clean run
+        print(f"❌ Error: {e}")
+        summary = {"status": "error", "error": str(e)}
+
+    summary = {"command": args.command, **summary, "elapsed_seconds": round(time.perf_counter() - started, 3)}
+    if args.summary_json:
+        _write_summary(summary, args.summary_json, stdout)
+    if summary["status"] == "error":
+        return 1
+    if getattr(args, 'serve', False) and summary.get('report_file'):
+        # --- STAGE 2: START THE WEB SERVER ---
+        _serve(open_browser)
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
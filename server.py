@@ -1,27 +1,71 @@
 import os
+import hashlib
 import json
-from flask import Flask, jsonify, render_template, request, send_from_directory
-from google import genai
-from google.genai import types
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import Flask, Response, jsonify, render_template, request, send_from_directory, stream_with_context
 from dotenv import load_dotenv
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+from datetime import date, datetime, timedelta
 import yaml
 
+from analyzer import GroupIndex, ReportCache, TrendStore
+from analyzer.ai_tools import (
+    CHARS_PER_TOKEN, DEFAULT_TOKEN_BUDGET, DEFAULT_TOP_K, compact_group, estimate_tokens, fit_to_budget,
+    group_details, report_summary, top_groups, truncate_text
+)
+from analyzer.chat_sessions import ChatSessionStore, truncate_history
+from analyzer.diff import (
+    DEFAULT_BASELINE_RUNS, DEFAULT_MIN_CHANGE, DEFAULT_MIN_RATIO, DIFF_KINDS, GroupCounts, baseline_counts,
+    diff_group_counts, report_group_counts
+)
+from analyzer.model_calls import FakeModelClient, ModelBusyError, ModelCallExecutor
+from analyzer.reporting import TRACES_SUFFIX
+from analyzer.search_index import SORT_KEYS
+from analyzer.watch import LiveReport
+from analyzer.trend_analytics import trend_analytics
+
+if TYPE_CHECKING:
+    from google.genai import types
+
 load_dotenv() 
 
 app = Flask(__name__, static_folder='static', template_folder='.')
 
-# Client Initialization
+# Client Initialization: deferred to the first model call, since importing google.genai
+# alone takes about half a second and most requests never need it
 client = None
-try:
-    client = genai.Client()
-    print("✅ Gemini API Client initialized successfully.")
-except Exception as e:
-    print(f"❌ Error initializing Gemini Client: {e}")
+_client_initialized = False
+_client_lock = threading.Lock()
+
+def _ai_client() -> Any:
+    """The model client, created on first use (None when it cannot be configured)."""
+    global client, _client_initialized
+    with _client_lock:
+        if _client_initialized:
+            return client
+        _client_initialized = True
+        if os.getenv('ALLURE_ANALYZER_FAKE_MODEL'):
+            # Local load testing without an API key: canned answers after the given latency in seconds
+            client = FakeModelClient(latency=float(os.getenv('ALLURE_ANALYZER_FAKE_MODEL')))
+            print(f"🟡 Using a fake model with {client.latency}s latency (ALLURE_ANALYZER_FAKE_MODEL).")
+            return client
+        try:
+            from google import genai
+            client = genai.Client()
+            print("✅ Gemini API Client initialized successfully.")
+        except Exception as e:
+            print(f"❌ Error initializing Gemini Client: {e}")
+        return client
+
+def set_ai_client(new_client: Any) -> None:
+    """Replaces the model client, e.g. with a local stub that implements `models.generate_content`."""
+    global client, _client_initialized
+    with _client_lock:
+        client = new_client
+        _client_initialized = True
 
 HISTORY_BASE_DIR = 'reports_history'
-chat_histories: Dict[str, List[types.Content]] = {}
 
 # --- The AI's "Toolbox" (Our Python Functions) ---
 
@@ -30,12 +74,8 @@ def get_list_of_all_reports() -> List[str]:
     Returns a sorted list of all available report timestamps, from newest to oldest.
     """
     print("TOOLBOX: Called get_list_of_all_reports")
-    if not os.path.isdir(HISTORY_BASE_DIR):
-        return []
-    return sorted(
-        [d for d in os.listdir(HISTORY_BASE_DIR) if os.path.isdir(os.path.join(HISTORY_BASE_DIR, d))],
-        reverse=True
-    )
+    # Re-listed only when the history directory changes (a report was added or removed)
+    return report_cache.listing(HISTORY_BASE_DIR, lambda entry: entry.is_dir(), reverse=True)
 
 def _load_config(base_dir: str) -> Dict:
     """Loads config.yaml from the project root."""
@@ -49,65 +89,350 @@ def _load_config(base_dir: str) -> Dict:
     
 config = _load_config('.')
 
+# Report files are named after output_report_file, as written by generate_report_json
+REPORT_JSON_NAME = os.path.splitext(config.get('output_report_file', 'failure_analysis_report.html'))[0] + '.json'
 
-def read_data_from_report(timestamp: str) -> Dict[str, Any]:
+# Parsed and compressed reports shared by the routes and the AI tools
+report_cache = ReportCache(max_bytes=int(config.get('report_cache_mb', 256)) * 1024 * 1024)
+
+ai_cfg = config.get('ai_chat') or {}
+AI_MODEL = ai_cfg.get('model', 'gemini-1.5-flash')
+TOOL_TOKEN_BUDGET = int(ai_cfg.get('tool_token_budget', DEFAULT_TOKEN_BUDGET))
+TOOL_TOP_K = int(ai_cfg.get('top_k', DEFAULT_TOP_K))
+MAX_HISTORY_TURNS = int(ai_cfg.get('max_history_turns', 10))
+
+MODEL_CALL_TIMEOUT = float(ai_cfg.get('call_timeout_seconds', 120))
+
+# Model calls run on a bounded pool; identical in-flight calls share one result
+model_calls = ModelCallExecutor(max_concurrent=int(ai_cfg.get('max_concurrent_calls', 4)),
+                                max_queued=int(ai_cfg.get('max_queued_calls', 32)))
+
+# Chat histories, forgotten when idle or least recently used
+chat_sessions = ChatSessionStore(max_sessions=int(ai_cfg.get('max_sessions', 200)),
+                                 ttl_seconds=float(ai_cfg.get('session_ttl_minutes', 120)) * 60)
+
+diff_cfg = config.get('diff') or {}
+DIFF_BASELINE_RUNS = int(diff_cfg.get('baseline_runs', DEFAULT_BASELINE_RUNS))
+DIFF_MIN_CHANGE = float(diff_cfg.get('min_change', DEFAULT_MIN_CHANGE))
+DIFF_MIN_RATIO = float(diff_cfg.get('min_ratio', DEFAULT_MIN_RATIO))
+
+def _report_tool_result(timestamp: str, kind: str, build) -> Dict[str, Any]:
     """
-    Reads and returns the full JSON data for a single report given its timestamp.
+    Result of a report tool, built from the parsed report and memoized in the
+    report cache until the report file changes.
     """
-    print(f"TOOLBOX: Called read_data_from_report with timestamp: {timestamp}")
-    report_path = os.path.join(HISTORY_BASE_DIR, timestamp, 'failure_analysis_report.json')
-    if not os.path.exists(report_path):
+    file_path = _existing_report_path(timestamp)
+    if not file_path:
         return {"error": f"Report with timestamp '{timestamp}' not found."}
     try:
-        with open(report_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            return json.loads(content) if content else {"error": "File is empty."}
+        return report_cache.derived(file_path, f"ai-{kind}", build,
+                                    cost=lambda value: estimate_tokens(value) * CHARS_PER_TOKEN).value
     except Exception as e:
         return {"error": f"Error reading report '{timestamp}': {str(e)}"}
 
+def read_data_from_report(timestamp: str) -> Dict[str, Any]:
+    """
+    Returns a report given its timestamp: totals, status counts, most frequent facet
+    values and as many failure groups (largest first, without stack traces) as fit
+    the size limit. Use get_failure_group_details for a group's stack trace.
+    """
+    print(f"TOOLBOX: Called read_data_from_report with timestamp: {timestamp}")
+    return _report_tool_result(timestamp, 'report',
+                               lambda data: report_summary(data, top_k=None, token_budget=TOOL_TOKEN_BUDGET))
+
+def get_report_summary(timestamp: str) -> Dict[str, Any]:
+    """
+    Returns a short summary of a report given its timestamp: totals, status counts,
+    most frequent facet values and its largest failure groups.
+    """
+    print(f"TOOLBOX: Called get_report_summary with timestamp: {timestamp}")
+    return _report_tool_result(timestamp, f'summary-{TOOL_TOP_K}',
+                               lambda data: report_summary(data, top_k=TOOL_TOP_K, token_budget=TOOL_TOKEN_BUDGET))
+
+def get_top_failure_groups(timestamp: str, top_k: int) -> Dict[str, Any]:
+    """
+    Returns the top_k largest failure groups of a report (title, counts, statuses,
+    code location, top facet values and an example message), largest first.
+    """
+    print(f"TOOLBOX: Called get_top_failure_groups with timestamp: {timestamp}, top_k: {top_k}")
+    top_k = max(int(top_k), 1)
+    return _report_tool_result(
+        timestamp, f'top-{top_k}',
+        lambda data: fit_to_budget({"groups": top_groups((data or {}).get('groups') or [], top_k)},
+                                   "groups", TOOL_TOKEN_BUDGET, convert=compact_group))
+
+def search_failure_groups(timestamp: str, query: str) -> Dict[str, Any]:
+    """
+    Searches the failure groups of a report for words (matched as word prefixes in
+    titles, messages, test names, code locations and facet values, e.g. an epic,
+    owner or host) and returns the matching groups, largest first.
+    """
+    print(f"TOOLBOX: Called search_failure_groups with timestamp: {timestamp}, query: {query}")
+
+    def build(data) -> Dict[str, Any]:
+        index = _group_index(_existing_report_path(timestamp))
+        positions = index.search(text=query, sort='count', descending=True)
+        return fit_to_budget({"query": query, "matches": int(len(positions)),
+                              "groups": index.page(positions, 0, len(positions))},
+                             "groups", TOOL_TOKEN_BUDGET, convert=compact_group)
+    return _report_tool_result(timestamp, f'search-{query}', build)
+
+def get_failure_group_details(timestamp: str, group_id: int) -> Dict[str, Any]:
+    """
+    Returns one failure group of a report by its id, with all its facet counts and
+    the (possibly shortened) stack trace of its example failure.
+    """
+    print(f"TOOLBOX: Called get_failure_group_details with timestamp: {timestamp}, group_id: {group_id}")
+
+    def build(data) -> Dict[str, Any]:
+        group = _group_index(_existing_report_path(timestamp)).group_by_id(int(group_id))
+        if group is None:
+            return {"error": f"Group {group_id} not found in report '{timestamp}'."}
+        return group_details(group, _read_group_trace(_existing_report_path(timestamp), group),
+                             token_budget=TOOL_TOKEN_BUDGET)
+    return _report_tool_result(timestamp, f'group-{int(group_id)}', build)
+
+def _compact_change(change: Dict[str, Any]) -> Dict[str, Any]:
+    compact = {k: v for k, v in change.items() if k != 'fingerprint_hash' and v is not None}
+    compact['title'] = truncate_text(change['title'], 200)
+    return compact
+
+def _budgeted_diff(result: Dict[str, Any]) -> Dict[str, Any]:
+    """A diff trimmed for the model: each list gets an equal share of the budget, `counts` keeps the full numbers."""
+    for kind in DIFF_KINDS:
+        result[kind] = fit_to_budget({kind: result[kind]}, kind, TOOL_TOKEN_BUDGET // len(DIFF_KINDS),
+                                     convert=_compact_change)[kind]
+    return result
+
+def compare_reports(timestamp: str, other: str) -> Dict[str, Any]:
+    """
+    Compares report `timestamp` with an earlier run: `other` is a report timestamp,
+    'previous' for the run just before it, or 'baseline' for the average of the last
+    few runs before it. Returns the failure groups that are new, resolved, grown or
+    shrunk (largest changes first) with their counts in both runs.
+    """
+    print(f"TOOLBOX: Called compare_reports with timestamp: {timestamp}, other: {other}")
+    try:
+        result, _ = _diff_reports(timestamp, other or 'previous', limit=TOOL_TOP_K)
+    except LookupError as e:
+        return {"error": str(e)}
+    return _budgeted_diff(result)
+
+# Set by `main.py --watch`: the running analysis served under /live
+live_report: Optional[LiveReport] = None
+
+def enable_live_report(live: LiveReport) -> None:
+    global live_report
+    live_report = live
+
+TREND_STORE_FILE = config.get('trend_store_file')
+_trend_store_synced = False
+
+def _open_trend_store() -> TrendStore:
+    """
+    Opens the trend index. Reports not indexed yet (e.g. written before the store
+    existed) are backfilled once per process; without a configured store file an
+    in-memory index is built from the reports on every call.
+    """
+    global _trend_store_synced
+    if not TREND_STORE_FILE:
+        store = TrendStore(':memory:')
+        store.backfill(HISTORY_BASE_DIR, report_name=REPORT_JSON_NAME)
+        return store
+    store = TrendStore(TREND_STORE_FILE)
+    if not _trend_store_synced:
+        added = store.backfill(HISTORY_BASE_DIR, report_name=REPORT_JSON_NAME)
+        if added:
+            print(f"Trend store: indexed {added} reports that were missing.")
+        _trend_store_synced = True
+    return store
+
+def _first_day(days_ago: int) -> date:
+    return (datetime.now() - timedelta(days=days_ago)).date()
+
 def get_reports_in_date_range(days_ago: int) -> List[str]:
     """
     Returns a list of report timestamps from the last N days.
     """
     print(f"TOOLBOX: Called get_reports_in_date_range for last {days_ago} days")
-    start_date = datetime.now() - timedelta(days=days_ago)
-    all_reports = get_list_of_all_reports()
-    return [
-        r for r in all_reports 
-        if datetime.strptime(r.split('_')[0], '%Y-%m-%d') >= start_date
-    ]
+    with _open_trend_store() as store:
+        return store.runs_since(_first_day(days_ago))
 
 def analyze_failure_trends(days_ago: int) -> Dict[str, Any]:
     """
-    Analyzes all reports from the last N days to identify trends.
+    Analyzes all reports from the last N days to identify trends: the most frequent
+    failures with their total occurrences, first/last-seen dates and the number of
+    reports they appeared in.
     """
     print(f"TOOLBOX: Called analyze_failure_trends for last {days_ago} days")
-    report_timestamps = get_reports_in_date_range(days_ago)
-    if not report_timestamps:
+    with _open_trend_store() as store:
+        trends = store.trends_since(_first_day(days_ago))
+    if not trends:
         return {"error": f"No reports found in the last {days_ago} days."}
+    failures = sorted(trends.values(), key=lambda t: t['total_occurrences'], reverse=True)
+    for failure in failures:
+        failure['title'] = truncate_text(failure['title'], 200)
+    return fit_to_budget({"days": days_ago, "distinct_failures": len(failures), "failures": failures},
+                         "failures", TOOL_TOKEN_BUDGET)
+
+def get_failure_history(failure_title: str) -> Dict[str, Any]:
+    """
+    Returns when a failure (by its group title) was first and last seen, and its
+    count in each report where it appeared (newest first, at most 50 reports).
+    """
+    print(f"TOOLBOX: Called get_failure_history for: {failure_title}")
+    with _open_trend_store() as store:
+        history = store.failure_history(failure_title, limit=50)
+    if not history:
+        return {"error": f"Failure '{failure_title}' was not found in any report."}
+    return history
+
+def _trend_analytics_params() -> Dict[str, Any]:
+    """Detection parameters from the `trend_analytics` config block."""
+    cfg = config.get('trend_analytics') or {}
+    return {
+        "clean_runs": int(cfg.get('clean_runs', 5)),
+        "window": int(cfg.get('window', 5)),
+        "spike_z": float(cfg.get('spike_z', 3.0)),
+        "recent_runs": int(cfg.get('recent_runs', 1)),
+    }
+
+def get_trend_analytics(days_ago: int) -> Dict[str, Any]:
+    """
+    Analyzes the per-run failure counts of the last N days and returns the most
+    flaky (intermittent) failures, failures that are new or regressed (came back
+    after several clean runs) in the latest run, and failures spiking above their
+    recent moving average.
+    """
+    print(f"TOOLBOX: Called get_trend_analytics for last {days_ago} days")
+    with _open_trend_store() as store:
+        result = trend_analytics(store, _first_day(days_ago), limit=10, **_trend_analytics_params())
+    if not result.get("fingerprints"):
+        return {"error": f"No reports found in the last {days_ago} days."}
+    return result
+
+def _cached_file_response(file_path: str, mimetype: str) -> Response:
+    """
+    Serves a file from the report cache, compressed when the client accepts it,
+    with ETag/Last-Modified validators so unchanged files are answered with 304.
+    """
+    entry, encoding = None, None
+    for candidate in ('zstd', 'gzip'):
+        if request.accept_encodings[candidate]:
+            entry = report_cache.encoded(file_path, candidate)
+            if entry is not None:
+                encoding = candidate
+                break
+    if entry is None:
+        entry = report_cache.raw(file_path)
 
-    trends = {}
-    for timestamp in reversed(report_timestamps):
-        data = read_data_from_report(timestamp)
-        if data and "groups" in data:
-            for group in data["groups"]:
-                fingerprint = group.get("fingerprint_what")
-                if not fingerprint: continue
-                
-                if fingerprint not in trends:
-                    trends[fingerprint] = {
-                        "total_occurrences": 0,
-                        "first_seen": timestamp.split('_')[0],
-                        "last_seen": timestamp.split('_')[0],
-                        "seen_in_reports": 0,
-                        "title": group.get("title")
-                    }
-                
-                trends[fingerprint]["total_occurrences"] += group.get("count", 0)
-                trends[fingerprint]["last_seen"] = timestamp.split('_')[0]
-                trends[fingerprint]["seen_in_reports"] += 1
-
-    return trends
+    response = Response(entry.value, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(entry.etag)
+    response.last_modified = entry.mtime
+    response.cache_control.no_cache = True  # always revalidate; unchanged reports cost a 304
+    return response.make_conditional(request)
+
+def _existing_report_path(timestamp: str) -> Optional[str]:
+    """Path of a report's JSON file, or None for unknown or invalid timestamps."""
+    if '..' in timestamp or timestamp.startswith('/'):
+        return None
+    file_path = os.path.join(HISTORY_BASE_DIR, timestamp, REPORT_JSON_NAME)
+    return file_path if os.path.exists(file_path) else None
+
+def _group_counts(file_path: str) -> Dict[str, GroupCounts]:
+    """Per-group counts of a report by fingerprint hash, cached until the report file changes."""
+    return report_cache.derived(file_path, 'diff-counts', report_group_counts,
+                                cost=lambda counts: len(counts) * 256).value
+
+def _earlier_reports(timestamp: str, limit: int) -> List[str]:
+    """Up to `limit` reports older than `timestamp`, newest first."""
+    reports = report_cache.listing(HISTORY_BASE_DIR, lambda entry: entry.is_dir(), reverse=True)
+    return [ts for ts in reports if ts < timestamp and _existing_report_path(ts)][:limit]
+
+def _diff_reports(timestamp: str, other: str, limit: Optional[int] = None,
+                  baseline_runs: Optional[int] = None, min_change: Optional[float] = None,
+                  min_ratio: Optional[float] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    (diff, report files involved) of report `timestamp` against report `other`, 'previous'
+    or 'baseline' (the mean of the `baseline_runs` reports before it). Raises LookupError
+    for unknown reports or when there is no earlier report.
+    """
+    head_path = _existing_report_path(timestamp)
+    if not head_path:
+        raise LookupError(f"Report with timestamp '{timestamp}' not found.")
+    if other in ('previous', 'baseline'):
+        runs = _earlier_reports(timestamp, (baseline_runs or DIFF_BASELINE_RUNS) if other == 'baseline' else 1)
+        if not runs:
+            raise LookupError(f"There is no report before '{timestamp}'.")
+    else:
+        if not _existing_report_path(other):
+            raise LookupError(f"Report with timestamp '{other}' not found.")
+        runs = [other]
+    paths = [_existing_report_path(ts) for ts in runs]
+    if other == 'baseline':
+        base = baseline_counts([_group_counts(path) for path in paths])
+    else:
+        base = _group_counts(paths[0])
+    result = diff_group_counts(base, _group_counts(head_path),
+                               min_change=DIFF_MIN_CHANGE if min_change is None else min_change,
+                               min_ratio=DIFF_MIN_RATIO if min_ratio is None else min_ratio, limit=limit)
+    return {"report": timestamp, "base": other if other == 'baseline' else runs[0], "base_reports": runs,
+            **result}, [head_path] + paths
+
+def _group_index(file_path: str) -> GroupIndex:
+    """Search index of a report, cached next to the parsed report and rebuilt when the file changes."""
+    return report_cache.derived(file_path, 'groups', lambda data: GroupIndex((data or {}).get('groups') or [])).value
+
+def _traces_path(file_path: str) -> str:
+    """The traces file of a report, as named in its metadata (the name follows output_report_file)."""
+    metadata = (report_cache.parsed(file_path).value or {}).get('metadata') or {}
+    name = metadata.get('traces_file') or os.path.splitext(os.path.basename(file_path))[0] + TRACES_SUFFIX
+    return os.path.join(os.path.dirname(file_path), os.path.basename(name))
+
+def _read_group_trace(file_path: str, group: Dict[str, Any]) -> str:
+    """The example trace of a report group, from the traces file (trace_ref) or inline in older reports."""
+    example = group.get('example') or {}
+    ref = example.get('trace_ref')
+    if not ref:
+        return example.get('trace') or ''
+    with open(_traces_path(file_path), 'rb') as f:
+        f.seek(ref['offset'])
+        line = json.loads(f.read(ref['length']))
+    return line.get('trace') or ''
+
+def _conditional_json(payload: Any, etag: str) -> Response:
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def _groups_page(index: GroupIndex, etag: str) -> Response:
+    """One page of groups from `index` for the query parameters of the current request."""
+    args = request.args
+    try:
+        offset = max(int(args.get('offset', 0)), 0)
+        limit = min(max(int(args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({"error": "'offset' and 'limit' must be integers"}), 400
+    sort = args.get('sort', 'count')
+    if sort not in SORT_KEYS:
+        return jsonify({"error": f"'sort' must be one of: {', '.join(SORT_KEYS)}"}), 400
+
+    facets = {name: args[name] for name in index.facet_names if args.get(name)}
+    positions = index.search(text=args.get('q'), status=args.get('status') or None, facets=facets,
+                             sort=sort, descending=args.get('order', 'desc') != 'asc')
+    groups = []
+    for group in index.page(positions, offset, limit):
+        example = group.get('example') or {}
+        if 'trace' in example:
+            # Inline traces (older reports) are fetched on demand like trace_ref ones
+            group = {**group, "example": {k: v for k, v in example.items() if k != 'trace'}}
+        groups.append(group)
+    payload = {"total": int(len(positions)), "offset": offset, "limit": limit, "groups": groups}
+    return _conditional_json(payload, etag)
 
 # --- Flask Routes ---
 @app.route('/')
@@ -123,65 +448,328 @@ def list_reports():
 def get_report_data(timestamp):
     if '..' in timestamp or timestamp.startswith('/'):
         return "Invalid path", 400
-    file_path = os.path.join(HISTORY_BASE_DIR, timestamp, 'failure_analysis_report.json')
+    file_path = os.path.join(HISTORY_BASE_DIR, timestamp, REPORT_JSON_NAME)
     if os.path.exists(file_path):
-        return send_from_directory(os.path.dirname(file_path), os.path.basename(file_path))
+        return _cached_file_response(file_path, 'application/json')
     else:
         return "Report not found", 404
 
-# --- Stateful Chat Logic with Priming and Trend Analysis Tool ---
-@app.route('/chat', methods=['POST'])
-def chat():
-    if not client:
+@app.route('/reports/<timestamp>/traces')
+def get_report_traces(timestamp):
+    """Serves the example traces of a report; clients fetch single traces with HTTP Range requests."""
+    if '..' in timestamp or timestamp.startswith('/'):
+        return "Invalid path", 400
+    report_path = _existing_report_path(timestamp)
+    if not report_path:
+        return "Report not found", 404
+    file_path = _traces_path(report_path)
+    if os.path.exists(file_path):
+        # Absolute: Flask resolves relative directories against the app's root, not the working directory
+        return send_from_directory(os.path.abspath(os.path.dirname(file_path)), os.path.basename(file_path),
+                                   mimetype='application/x-ndjson', conditional=True)
+    else:
+        return "Traces not found", 404
+
+@app.route('/reports/<timestamp>/metadata')
+def get_report_metadata(timestamp):
+    """Report metadata plus the status and facet totals the dashboard needs, without the groups."""
+    file_path = _existing_report_path(timestamp)
+    if not file_path:
+        return "Report not found", 404
+    entry = report_cache.parsed(file_path)
+    payload = {**((entry.value or {}).get('metadata') or {}), **_group_index(file_path).summary()}
+    return _conditional_json(payload, entry.etag + '-metadata')
+
+@app.route('/reports/<timestamp>/groups')
+def get_report_groups(timestamp):
+    """
+    One page of a report's groups. Query parameters: offset, limit (max 500),
+    sort (count, failed, broken, id, title), order (desc/asc), q (word prefixes),
+    status (failed/broken) and any facet name (epic=..., feature=..., ...).
+    """
+    file_path = _existing_report_path(timestamp)
+    if not file_path:
+        return "Report not found", 404
+    return _groups_page(_group_index(file_path), report_cache.parsed(file_path).etag + '-groups')
+
+@app.route('/reports/<timestamp>/groups/<int:group_id>/trace')
+def get_group_trace(timestamp, group_id):
+    """The example trace of one group, from the traces file (trace_ref) or inline in older reports."""
+    file_path = _existing_report_path(timestamp)
+    if not file_path:
+        return "Report not found", 404
+    group = _group_index(file_path).group_by_id(group_id)
+    if group is None:
+        return "Group not found", 404
+    try:
+        trace = _read_group_trace(file_path, group)
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Could not read trace: {e}"}), 500
+    return jsonify({"id": group_id, "trace": trace})
+
+@app.route('/reports/<timestamp>/diff/<other>')
+def get_report_diff(timestamp, other):
+    """
+    Failure groups of report `timestamp` that are new, resolved, grown or shrunk compared
+    with report `other`, 'previous' (the report before it) or 'baseline' (the mean of the
+    reports before it). Query parameters: limit (entries per list, default 100), runs
+    (baseline size), min_change and min_ratio (thresholds for grown/shrunk).
+    """
+    args = request.args
+    try:
+        limit = min(max(int(args.get('limit', 100)), 0), 10000)
+        runs = int(args['runs']) if args.get('runs') else None
+        min_change = float(args['min_change']) if args.get('min_change') else None
+        min_ratio = float(args['min_ratio']) if args.get('min_ratio') else None
+    except ValueError:
+        return jsonify({"error": "'limit' and 'runs' must be integers, 'min_change' and 'min_ratio' numbers"}), 400
+    if runs is not None and runs < 1:
+        return jsonify({"error": "'runs' must be at least 1"}), 400
+    try:
+        result, paths = _diff_reports(timestamp, other, limit, runs, min_change, min_ratio)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    # Valid as long as none of the compared reports changed
+    etags = '|'.join(report_cache.parsed(path).etag for path in paths) + '|' + request.query_string.decode()
+    return _conditional_json(result, hashlib.blake2b(etags.encode(), digest_size=12).hexdigest())
+
+_SUMMARY_PROMPT = """Provide a brief 'executive summary' of the test report {timestamp} compared to the report before it ({previous}). Highlight the main trend, any new critical failures, and any significant resolved issues.
+
+Report {timestamp}:
+{current_data}
+
+Report {previous}:
+{previous_data}
+
+Failure groups that are new, resolved, grown or shrunk since {previous}:
+{changes}
+"""
+
+def _generate_executive_summary(timestamp: str, file_path: str) -> str:
+    """Asks the model for an executive summary of a report, given compact views of it, the report before it and their diff."""
+    reports = report_cache.listing(HISTORY_BASE_DIR, lambda entry: entry.is_dir(), reverse=True)
+    previous = next((ts for ts in reports if ts < timestamp), None)
+    previous_path = _existing_report_path(previous) if previous else None
+
+    def compact(path: Optional[str]) -> str:
+        if not path:
+            return "(there is no earlier report)"
+        return json.dumps(report_summary(report_cache.parsed(path).value, TOOL_TOP_K, TOOL_TOKEN_BUDGET))
+
+    changes = "(there is no earlier report)"
+    if previous_path:
+        changes = json.dumps(_budgeted_diff(_diff_reports(timestamp, previous, limit=TOOL_TOP_K)[0]))
+    prompt = _SUMMARY_PROMPT.format(timestamp=timestamp, previous=previous or 'none', current_data=compact(file_path),
+                                    previous_data=compact(previous_path), changes=changes)
+    from google.genai import types
+    response = _ai_client().models.generate_content(
+        model=AI_MODEL, contents=[types.Content(role='user', parts=[types.Part(text=prompt)])])
+    return response.text
+
+def _model_error_response(error: Exception) -> Response:
+    if isinstance(error, ModelBusyError):
+        response = jsonify({"error": "The AI analyst is busy, please retry in a moment."})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    if isinstance(error, FutureTimeoutError):
+        response = jsonify({"error": f"The model did not answer within {MODEL_CALL_TIMEOUT:g}s."})
+        response.status_code = 504
+        return response
+    print(f"An error occurred during content generation: {error}")
+    response = jsonify({"error": f"An unexpected error occurred: {str(error)}"})
+    response.status_code = 500
+    return response
+
+@app.route('/reports/<timestamp>/summary')
+def get_report_executive_summary(timestamp):
+    """
+    AI executive summary of a report compared to the one before it. Generated once
+    per report version and cached; concurrent first requests share one model call.
+    """
+    if not _ai_client():
         return jsonify({"error": "Gemini Client is not configured."}), 500
+    file_path = _existing_report_path(timestamp)
+    if not file_path:
+        return "Report not found", 404
+    try:
+        entry = report_cache.derived(
+            file_path, 'ai-executive-summary',
+            lambda data: model_calls.run(('summary', file_path), _generate_executive_summary, timestamp, file_path,
+                                         timeout=MODEL_CALL_TIMEOUT),
+            cost=len)
+    except Exception as e:
+        return _model_error_response(e)
+    return _conditional_json({"timestamp": timestamp, "summary": entry.value}, entry.etag)
 
-    data = request.json
-    user_question = data.get('question', '')
-    session_id = data.get('session_id')
-    if not all([user_question, session_id]):
-        return jsonify({"error": "Missing user question or session_id"}), 400
+@app.route('/live')
+def get_live_status():
+    """Whether a watch-mode analysis is running (404 otherwise) and its current version."""
+    if live_report is None:
+        return jsonify({"live": False}), 404
+    return jsonify({"live": True, "version": live_report.version, "files_ingested": live_report.files_ingested})
 
-    if session_id not in chat_histories:
-        print(f"Creating and priming new chat session for ID: {session_id}")
-        system_instruction = """
+@app.route('/live/metadata')
+def get_live_metadata():
+    if live_report is None:
+        return "Watch mode is not running", 404
+    return jsonify(live_report.metadata())
+
+@app.route('/live/groups')
+def get_live_groups():
+    """Like /reports/<timestamp>/groups, over the groups of the running analysis."""
+    if live_report is None:
+        return "Watch mode is not running", 404
+    version, index = live_report.group_index()
+    return _groups_page(index, f"live-{id(live_report):x}-{version}")
+
+@app.route('/live/groups/<int:group_id>/trace')
+def get_live_group_trace(group_id):
+    if live_report is None:
+        return "Watch mode is not running", 404
+    trace = live_report.example_trace(group_id)
+    if trace is None:
+        return "Group not found", 404
+    return jsonify({"id": group_id, "trace": trace})
+
+@app.route('/live/events')
+def live_events():
+    """
+    Server-Sent Events stream of the running analysis: one `update` event per ingested
+    batch with the new totals and the changed groups. `since` (or the Last-Event-ID
+    header on reconnects) is the version the client already has.
+    """
+    if live_report is None:
+        return "Watch mode is not running", 404
+    live = live_report
+    try:
+        since = int(request.args.get('since') or request.headers.get('Last-Event-ID') or live.version)
+    except ValueError:
+        return "'since' must be an integer", 400
+
+    def events():
+        version = since
+        yield "retry: 3000\n\n"
+        while True:
+            update = live.wait_for_update(version, timeout=15.0)
+            if update is None:
+                yield ": keep-alive\n\n"  # also detects clients that went away
+                continue
+            version = update["version"]
+            yield f"id: {version}\nevent: update\ndata: {json.dumps(update, ensure_ascii=False)}\n\n"
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/trends')
+def get_trends():
+    """Trend analytics over the last `days` days; repeat `fingerprint` to get per-run series for those groups."""
+    try:
+        days = int(request.args.get('days', 30))
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({"error": "'days' and 'limit' must be integers"}), 400
+    with _open_trend_store() as store:
+        result = trend_analytics(store, _first_day(days), limit=limit,
+                                 fingerprints=request.args.getlist('fingerprint'), **_trend_analytics_params())
+    return jsonify(result)
+
+# --- Stateful Chat Logic with Priming and Trend Analysis Tool ---
+_PRIMING_MESSAGES = 2
+_SUMMARY_MESSAGE_CHARS = 300
+_SUMMARY_CHARS = 2000
+_SUMMARY_PREFIX = "Summary of our earlier conversation:\n"
+_SUMMARY_REPLY = "Noted, I will keep that context in mind."
+
+def _new_chat_history() -> List['types.Content']:
+    from google.genai import types
+    system_instruction = """
 You are an expert QA analyst agent. Your task is to answer user questions about test failure reports by using the provided tools.
 
 **Your thinking process MUST be:**
 1.  Analyze the user's question to understand what information is needed.
 2.  If you don't know what reports are available, your first step is ALWAYS to call `get_list_of_all_reports()` to see what files exist.
-3.  Once you have the list of reports, use `read_data_from_report(timestamp)` or `analyze_failure_trends(days_ago)` to get the content you need.
+3.  Once you have the list of reports, start with `get_report_summary(timestamp)` or `analyze_failure_trends(days_ago)`. Use `get_top_failure_groups(timestamp, top_k)` or `search_failure_groups(timestamp, query)` for more groups, `read_data_from_report(timestamp)` only when you need as many groups as possible, and `get_failure_group_details(timestamp, group_id)` for a group's stack trace. Use `compare_reports(timestamp, other)` for what changed between two runs (`other` may be 'previous' or 'baseline') instead of reading both reports, `get_failure_history(failure_title)` to find when a specific failure first and last appeared, and `get_trend_analytics(days_ago)` for flaky, new, regressed and spiking failures.
 4.  After gathering all necessary data, synthesize it into a final, helpful answer for the user.
 
 **Example Conversation:**
 * User asks: "What's the difference between the two most recent reports?"
-* Your internal thought process: The user wants to compare. First, I need to know what reports are available. I must call `get_list_of_all_reports`.
+* Your internal thought process: The user wants to compare. First, I need to know what reports are available. I must call `get_list_of_all_reports`, then `compare_reports` with the newest timestamp and 'previous'.
 * (You then proceed to call the tool).
 """
-        chat_histories[session_id] = [
-            types.Content(role='user', parts=[types.Part(text=system_instruction)]),
-            types.Content(role='model', parts=[types.Part(text="Understood. I am a QA analyst agent, ready to help. How can I assist with the test reports?")])
-        ]
-    
-    history = chat_histories[session_id]
+    return [
+        types.Content(role='user', parts=[types.Part(text=system_instruction)]),
+        types.Content(role='model', parts=[types.Part(text="Understood. I am a QA analyst agent, ready to help. How can I assist with the test reports?")])
+    ]
+
+def _summarize_turns(dropped: List['types.Content']) -> List['types.Content']:
+    """Condenses the oldest turns of a chat (and any earlier summary) into one short exchange."""
+    from google.genai import types
+    lines = []
+    for content in dropped:
+        text = ' '.join(part.text for part in (content.parts or []) if getattr(part, 'text', None))
+        if text.startswith(_SUMMARY_PREFIX):
+            lines.append(text[len(_SUMMARY_PREFIX):])  # the previous summary, carried over as is
+        elif text != _SUMMARY_REPLY:
+            lines.append(f"{content.role}: {truncate_text(' '.join(text.split()), _SUMMARY_MESSAGE_CHARS)}")
+    # The newest part of the digest is kept when it grows too long
+    digest = '\n'.join(lines)
+    if len(digest) > _SUMMARY_CHARS:
+        digest = digest[-_SUMMARY_CHARS:].partition('\n')[2]
+    return [
+        types.Content(role='user', parts=[types.Part(text=_SUMMARY_PREFIX + digest)]),
+        types.Content(role='model', parts=[types.Part(text=_SUMMARY_REPLY)])
+    ]
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    """
+    Answers a chat question. The model call runs on the bounded model_calls pool and
+    the request waits for its result (504 after MODEL_CALL_TIMEOUT, 503 when the queue
+    is full). This caps the concurrent model calls, but a waiting request still holds
+    its server thread: the endpoint does not hand out a job id to poll or stream.
+    """
+    ai_client = _ai_client()
+    if not ai_client:
+        return jsonify({"error": "Gemini Client is not configured."}), 500
+    from google.genai import types
+
+    data = request.json
+    user_question = data.get('question', '')
+    session_id = data.get('session_id')
+    if not all([user_question, session_id]):
+        return jsonify({"error": "Missing user question or session_id"}), 400
+
+    history = chat_sessions.get(session_id)
+    if history is None:
+        print(f"Creating and priming new chat session for ID: {session_id}")
+        history = _new_chat_history()
     history.append(types.Content(role='user', parts=[types.Part(text=user_question)]))
 
-    tools = [get_list_of_all_reports, read_data_from_report, get_reports_in_date_range, analyze_failure_trends]
+    tools = [get_list_of_all_reports, get_report_summary, get_top_failure_groups, search_failure_groups,
+             get_failure_group_details, compare_reports, read_data_from_report, get_reports_in_date_range,
+             analyze_failure_trends, get_failure_history, get_trend_analytics]
     
-    try:
-        response = client.models.generate_content(
-            model='gemini-1.5-flash',
+    def generate():
+        return ai_client.models.generate_content(
+            model=AI_MODEL,
             contents=history,
             config=types.GenerateContentConfig(tools=tools),
         )
-        
+
+    try:
+        # A resubmitted question (e.g. a double click) shares the call already in flight
+        response = model_calls.run((session_id, user_question, len(history)), generate, timeout=MODEL_CALL_TIMEOUT)
         history.append(response.candidates[0].content)
+        # Older turns are condensed so every request resends a bounded history
+        chat_sessions.put(session_id, truncate_history(history, _PRIMING_MESSAGES, MAX_HISTORY_TURNS * 2,
+                                                       _summarize_turns))
         return jsonify({"response": response.text})
 
     except Exception as e:
-        print(f"An error occurred during content generation: {e}")
-        if history and history[-1].role == 'user':
-            history.pop()
-        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+        return _model_error_response(e)
 
 if __name__ == '__main__':
     app.run(host='127.0.0.1', port=8000, debug=True)
\ No newline at end of file
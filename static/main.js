@@ -2,14 +2,31 @@
 const sessionId = 'session_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
 
 // Global state
-let currentReportDataAsText = '';
 let reportTimestamps = [];
+let currentTimestamp = null;
+let currentGroupsById = {};
 const charts = {}; // Object to hold our chart instances
 
+// Groups are fetched page by page from the server; pages far from the viewport are emptied
+const PAGE_SIZE = 50;
+const listState = { generation: 0, total: 0, nextOffset: 0, loading: false, pages: [] };
+const expandedGroups = new Set();
+const traceCache = new Map();
+
+// Watch mode: the running analysis is listed as a pseudo-report and updated over Server-Sent Events
+const LIVE = 'live';
+let liveEvents = null;
+let liveNewGroups = 0;
+
 document.addEventListener('DOMContentLoaded', () => {
     // --- UI elements ---
     const groupsContainer = document.getElementById('groups-container');
+    const groupsSummary = document.getElementById('groups-summary');
     const searchBox = document.getElementById('search-box');
+    const statusFilter = document.getElementById('status-filter');
+    const epicFilter = document.getElementById('epic-filter');
+    const featureFilter = document.getElementById('feature-filter');
+    const sortSelect = document.getElementById('sort-select');
     const darkModeToggle = document.getElementById('dark-mode-toggle');
     const reportSelector = document.getElementById('report-selector');
     const chatMessages = document.getElementById('chat-messages');
@@ -21,22 +38,23 @@ document.addEventListener('DOMContentLoaded', () => {
         unsafe.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;").replace(/"/g, "&quot;").replace(/'/g, "&#039;");
 
     // --- NEW: Dashboard Rendering ---
-    function renderDashboard(data) {
+    // `meta` comes from /reports/<ts>/metadata: report metadata plus status and facet totals
+    function facetCounts(meta, facet) {
+        const precomputed = meta.facet_totals?.[facet];
+        const counts = { ...(precomputed || meta.group_facet_totals?.[facet] || {}) };
+        // Older reports without facet totals fall back to group counts summed per value
+        const missing = precomputed ? meta.facet_missing?.[facet] : meta.group_facet_missing?.[facet];
+        return { counts, missing: missing || 0 };
+    }
+
+    function renderDashboard(meta) {
         if (charts.failuresByEpic) charts.failuresByEpic.destroy();
         if (charts.statusBreakdown) charts.statusBreakdown.destroy();
 
-        const epicCounts = {};
-        let totalFailed = 0;
-        let totalBroken = 0;
-
-        (data.groups || []).forEach(group => {
-            totalFailed += group.status_counts?.failed || 0;
-            totalBroken += group.status_counts?.broken || 0;
-            const epics = group.epics && group.epics.length > 0 ? group.epics : ['Uncategorized'];
-            epics.forEach(epic => {
-                epicCounts[epic] = (epicCounts[epic] || 0) + (group.count || 0);
-            });
-        });
+        const { counts: epicCounts, missing } = facetCounts(meta, 'epic');
+        if (missing > 0) epicCounts['Uncategorized'] = missing;
+        const totalFailed = meta.status_totals?.failed || 0;
+        const totalBroken = meta.status_totals?.broken || 0;
 
         const epicCtx = document.getElementById('failuresByEpicChart').getContext('2d');
         charts.failuresByEpic = new Chart(epicCtx, {
@@ -89,10 +107,12 @@ document.addEventListener('DOMContentLoaded', () => {
             statusTagsHtml += `<span class="status-tag status-broken">${brokenCount} B</span>`;
             progressBarTitle.push(`${brokenCount} Broken`);
         }
+        const expanded = expandedGroups.has(String(group.id));
+        const cachedTrace = traceCache.get(String(group.id));
         return `
-        <div class="group-card" data-index="${group.id}">
+        <div class="group-card" data-index="${group.id}"${cachedTrace !== undefined ? ' data-trace-loaded="true"' : ''}>
             <div class="card-header">
-                <div class="card-title"><span class="arrow">▶</span> Group ${group.id}: ${escapeHtml(group.title || '')}</div>
+                <div class="card-title"><span class="arrow${expanded ? ' expanded' : ''}">▶</span> Group ${group.id}: ${escapeHtml(group.title || '')}</div>
                 <div class="card-summary">
                     <div class="status-tags">${statusTagsHtml}</div>
                     <div class="progress-bar" title="${progressBarTitle.join(', ')}">
@@ -101,7 +121,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     </div>
                 </div>
             </div>
-            <div class="card-content">
+            <div class="card-content"${expanded ? ' style="display: block;"' : ''}>
                 <h4>Fingerprint</h4>
                 <code><b>What:</b> ${escapeHtml(group.fingerprint_what || '')}</code><br>
                 <code><b>Where:</b> ${escapeHtml(group.fingerprint_where || '')}</code>
@@ -110,33 +130,179 @@ document.addEventListener('DOMContentLoaded', () => {
                 <p><b>Features:</b> ${featuresHtml}</p>
                 <h4>Example from Test: <code>${escapeHtml(group.example?.test_name || '')}</code></h4>
                 <b>Original Message:</b><pre>${escapeHtml(group.example?.message || '')}</pre>
-                <b>Full Stack Trace:</b><pre>${escapeHtml(group.example?.trace || '')}</pre>
+                <b>Full Stack Trace:</b><pre class="example-trace">${cachedTrace !== undefined ? escapeHtml(cachedTrace) : 'Loading trace...'}</pre>
             </div>
         </div>`;
     }
 
-    function renderReport(data) {
-        let totalFailed = 0, totalBroken = 0;
-        (data.groups || []).forEach(g => {
-            totalFailed += g.status_counts?.failed || 0;
-            totalBroken += g.status_counts?.broken || 0;
+    function renderHeader(meta) {
+        document.getElementById('meta-date').textContent = new Date(meta.generation_date || Date.now()).toLocaleString();
+        document.getElementById('meta-total').innerHTML = `${meta.total_failures || 0} (<span style="color:var(--status-failed-bg);">${meta.status_totals?.failed || 0} F</span>, <span style="color:var(--status-broken-bg);">${meta.status_totals?.broken || 0} B</span>)`;
+        document.getElementById('meta-groups').textContent = meta.unique_groups || 0;
+    }
+
+    function fillFacetFilter(select, meta, facet, label) {
+        const selected = select.value;
+        const values = Object.keys(facetCounts(meta, facet).counts).sort();
+        select.innerHTML = `<option value="">All ${label}</option>` +
+            values.map(v => `<option value="${escapeHtml(v)}">${escapeHtml(v)}</option>`).join('');
+        if (values.includes(selected)) select.value = selected;
+    }
+
+    const reportBase = (timestamp) => timestamp === LIVE ? '/live' : `/reports/${timestamp}`;
+
+    function groupsQuery(offset) {
+        const params = new URLSearchParams({ offset, limit: PAGE_SIZE, sort: sortSelect.value });
+        const q = searchBox.value.trim();
+        if (q) params.set('q', q);
+        if (statusFilter.value) params.set('status', statusFilter.value);
+        if (epicFilter.value) params.set('epic', epicFilter.value);
+        if (featureFilter.value) params.set('feature', featureFilter.value);
+        return `${reportBase(currentTimestamp)}/groups?${params}`;
+    }
+
+    // Pages near the viewport are rendered; the others keep only their height
+    const pageObserver = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            const page = entry.target;
+            const groups = listState.pages[page.dataset.page];
+            if (!groups) return;
+            if (entry.isIntersecting && page.dataset.rendered !== 'true') {
+                page.innerHTML = groups.map(createGroupCardHTML).join('');
+                page.style.height = '';
+                page.dataset.rendered = 'true';
+                page.querySelectorAll('.group-card:not([data-trace-loaded]) .card-content[style]')
+                    .forEach(content => loadExampleTrace(content.closest('.group-card')));
+            } else if (!entry.isIntersecting && page.dataset.rendered === 'true') {
+                page.style.height = `${page.offsetHeight}px`;
+                page.innerHTML = '';
+                page.dataset.rendered = 'false';
+            }
+        });
+    }, { rootMargin: '2000px 0px' });
+
+    const sentinelObserver = new IntersectionObserver((entries) => {
+        if (entries.some(e => e.isIntersecting)) loadNextPage();
+    }, { rootMargin: '800px 0px' });
+
+    async function loadNextPage() {
+        if (listState.loading || !currentTimestamp) return;
+        if (listState.pages.length > 0 && listState.nextOffset >= listState.total) return;
+        const generation = listState.generation;
+        listState.loading = true;
+        try {
+            const response = await fetch(groupsQuery(listState.nextOffset));
+            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+            const result = await response.json();
+            if (generation !== listState.generation) return; // filters changed while loading
+            listState.total = result.total;
+            listState.nextOffset = result.offset + result.groups.length;
+            result.groups.forEach(g => { currentGroupsById[g.id] = g; });
+
+            const pageIndex = listState.pages.length;
+            listState.pages.push(result.groups);
+            const page = document.createElement('div');
+            page.className = 'group-page';
+            page.dataset.page = pageIndex;
+            page.dataset.rendered = 'true';
+            page.innerHTML = result.groups.map(createGroupCardHTML).join('');
+            groupsContainer.insertBefore(page, document.getElementById('groups-sentinel'));
+            pageObserver.observe(page);
+
+            renderGroupsSummary();
+            if (listState.total === 0) {
+                groupsContainer.insertAdjacentHTML('afterbegin', '<div id="loader">No groups match the current filters.</div>');
+            }
+        } catch (error) {
+            groupsSummary.textContent = `Failed to load groups: ${error.message}`;
+            console.error("Failed to fetch groups:", error);
+        } finally {
+            if (generation === listState.generation) listState.loading = false;
+        }
+        // Keep filling while the sentinel is still on screen
+        if (generation === listState.generation && listState.nextOffset < listState.total) {
+            const sentinel = document.getElementById('groups-sentinel');
+            if (sentinel && sentinel.getBoundingClientRect().top < window.innerHeight + 800) loadNextPage();
+        }
+    }
+
+    function renderGroupsSummary() {
+        groupsSummary.textContent = `Showing ${listState.nextOffset} of ${listState.total} matching groups`;
+        if (liveNewGroups > 0) {
+            groupsSummary.insertAdjacentHTML('beforeend',
+                ` · <button id="live-refresh" type="button">${liveNewGroups} new or reordered groups, refresh list</button>`);
+        }
+    }
+
+    function resetGroupList() {
+        liveNewGroups = 0;
+        listState.generation += 1;
+        listState.total = 0;
+        listState.nextOffset = 0;
+        listState.loading = false;
+        listState.pages = [];
+        pageObserver.disconnect();
+        sentinelObserver.disconnect();
+        groupsContainer.innerHTML = '<div id="groups-sentinel"></div>';
+        sentinelObserver.observe(document.getElementById('groups-sentinel'));
+        loadNextPage();
+    }
+
+    // Live updates: header and charts are redrawn, loaded cards are patched in place and
+    // groups that are not in the list yet are announced instead of reshuffling the list
+    function applyLiveUpdate(update) {
+        renderHeader(update.metadata);
+        renderDashboard(update.metadata);
+        fillFacetFilter(epicFilter, update.metadata, 'epic', 'epics');
+        fillFacetFilter(featureFilter, update.metadata, 'feature', 'features');
+        let unseen = update.reset || update.truncated ? update.changed_count : 0;
+        update.groups.forEach(group => {
+            const current = currentGroupsById[group.id];
+            if (!current) {
+                unseen += 1;
+                return;
+            }
+            Object.assign(current, group);
+            const card = groupsContainer.querySelector(`.group-card[data-index="${group.id}"]`);
+            if (card) card.outerHTML = createGroupCardHTML(current);
+        });
+        if (unseen > 0) {
+            liveNewGroups += unseen;
+            renderGroupsSummary();
+        }
+    }
+
+    function stopLiveEvents() {
+        if (liveEvents) liveEvents.close();
+        liveEvents = null;
+    }
+
+    function startLiveEvents(version) {
+        stopLiveEvents();
+        liveEvents = new EventSource(`/live/events?since=${version || 0}`);
+        liveEvents.addEventListener('update', (event) => {
+            if (currentTimestamp === LIVE) applyLiveUpdate(JSON.parse(event.data));
         });
-        const metadata = data.metadata || {};
-        document.getElementById('meta-date').textContent = new Date(metadata.generation_date || Date.now()).toLocaleString();
-        document.getElementById('meta-total').innerHTML = `${metadata.total_failures || 0} (<span style="color:var(--status-failed-bg);">${totalFailed} F</span>, <span style="color:var(--status-broken-bg);">${totalBroken} B</span>)`;
-        document.getElementById('meta-groups').textContent = metadata.unique_groups || 0;
-        groupsContainer.innerHTML = (data.groups || []).map(createGroupCardHTML).join('');
     }
 
     async function loadReport(timestamp) {
         groupsContainer.innerHTML = '<div id="loader">Loading report data...</div>';
+        groupsSummary.textContent = '';
+        stopLiveEvents();
         try {
-            const response = await fetch(`/reports/${timestamp}`);
+            const response = await fetch(`${reportBase(timestamp)}/metadata`);
             if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-            currentReportDataAsText = await response.text();
-            const data = JSON.parse(currentReportDataAsText);
-            renderDashboard(data);
-            renderReport(data);
+            const meta = await response.json();
+            currentTimestamp = timestamp;
+            currentGroupsById = {};
+            expandedGroups.clear();
+            traceCache.clear();
+            renderDashboard(meta);
+            renderHeader(meta);
+            fillFacetFilter(epicFilter, meta, 'epic', 'epics');
+            fillFacetFilter(featureFilter, meta, 'feature', 'features');
+            resetGroupList();
+            if (timestamp === LIVE) startLiveEvents(meta.version);
         } catch (error) {
             groupsContainer.innerHTML = `<div id="loader" style="color: var(--status-failed-bg);">Failed to load report data: ${error.message}.</div>`;
             console.error("Failed to fetch report data:", error);
@@ -148,8 +314,11 @@ document.addEventListener('DOMContentLoaded', () => {
             const response = await fetch('/reports');
             if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
             reportTimestamps = await response.json();
+            const liveResponse = await fetch('/live');
+            if (liveResponse.ok) reportTimestamps.unshift(LIVE);
             if (reportTimestamps && reportTimestamps.length > 0) {
-                reportSelector.innerHTML = reportTimestamps.map(ts => `<option value="${ts}">${ts.replace('_', ' ')}</option>`).join('');
+                reportSelector.innerHTML = reportTimestamps.map(ts =>
+                    `<option value="${ts}">${ts === LIVE ? '● Live (watching)' : ts.replace('_', ' ')}</option>`).join('');
                 await loadReport(reportTimestamps[0]);
                 // Read the config value from the body's data attribute
                 const proactiveSummaryEnabled = document.body.dataset.proactiveSummary === 'True';
@@ -171,6 +340,38 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
+    // Example traces are not part of the group pages; fetch one when its card is expanded.
+    // New reports keep them in a separate file read with an HTTP Range request.
+    async function loadExampleTrace(card) {
+        const groupId = card.dataset.index;
+        const group = currentGroupsById[groupId];
+        const traceEl = card.querySelector('.example-trace');
+        if (!group || !traceEl || card.dataset.traceLoaded) return;
+        card.dataset.traceLoaded = 'true';
+        const ref = group.example?.trace_ref;
+        try {
+            let trace;
+            if (ref) {
+                const response = await fetch(`/reports/${currentTimestamp}/traces`, {
+                    headers: { 'Range': `bytes=${ref.offset}-${ref.offset + ref.length - 1}` }
+                });
+                if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+                trace = JSON.parse(await response.text()).trace;
+            } else {
+                const response = await fetch(`${reportBase(currentTimestamp)}/groups/${groupId}/trace`);
+                if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+                trace = (await response.json()).trace;
+            }
+            traceCache.set(groupId, trace || '');
+            // The card may have been re-rendered while loading
+            const current = groupsContainer.querySelector(`.group-card[data-index="${groupId}"] .example-trace`);
+            if (current) current.textContent = trace || '';
+        } catch (error) {
+            delete card.dataset.traceLoaded;
+            traceEl.textContent = `Failed to load trace: ${error.message}`;
+        }
+    }
+
     function addMessageToUI(content, sender, isLoading = false) {
         const messageDiv = document.createElement('div');
         messageDiv.classList.add('chat-message', `${sender}-message`);
@@ -188,11 +389,9 @@ document.addEventListener('DOMContentLoaded', () => {
         chatMessages.scrollTop = chatMessages.scrollHeight;
     }
 
-    async function getAIResponse(userInput, isProactive = false) {
-        if (!isProactive) {
-            addMessageToUI(userInput, 'user');
-            chatInput.value = '';
-        }
+    async function getAIResponse(userInput) {
+        addMessageToUI(userInput, 'user');
+        chatInput.value = '';
         addMessageToUI('', 'ai', true);
         try {
             const response = await fetch('/chat', {
@@ -217,9 +416,25 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    function getProactiveSummary() {
-        const proactivePrompt = "Provide a brief 'executive summary' comparing the latest report to the one before it. Highlight the main trend, any new critical failures, and any significant resolved issues.";
-        getAIResponse(proactivePrompt, true);
+    // Generated once per report on the server and shared by every viewer
+    async function getProactiveSummary() {
+        const latest = reportTimestamps.find(ts => ts !== LIVE);
+        if (!latest) return;
+        addMessageToUI('', 'ai', true);
+        try {
+            const response = await fetch(`/reports/${latest}/summary`);
+            if (!response.ok) {
+                const errData = await response.json();
+                throw new Error(errData.error || `API error! status: ${response.status}`);
+            }
+            const result = await response.json();
+            chatMessages.querySelector('.loading').remove();
+            addMessageToUI(result.summary, 'ai');
+        } catch (error) {
+            chatMessages.querySelector('.loading').remove();
+            addMessageToUI(`Sorry, I could not summarize the latest report: ${error.message}`, 'ai');
+            console.error("AI Summary Error:", error);
+        }
     }
     
     // --- EVENT LISTENERS ---
@@ -256,17 +471,28 @@ document.addEventListener('DOMContentLoaded', () => {
             const content = header.nextElementSibling;
             const arrow = header.querySelector('.arrow');
             if (content.classList.contains('card-content')) {
+                const card = header.closest('.group-card');
                 content.style.display = content.style.display === 'block' ? 'none' : 'block';
                 arrow.classList.toggle('expanded');
+                if (content.style.display === 'block') {
+                    expandedGroups.add(card.dataset.index);
+                    loadExampleTrace(card);
+                } else {
+                    expandedGroups.delete(card.dataset.index);
+                }
             }
         }
     });
     
-    searchBox.addEventListener('input', (event) => {
-        const searchTerm = event.target.value.toLowerCase();
-        document.querySelectorAll('.group-card').forEach(card => {
-            card.style.display = card.textContent.toLowerCase().includes(searchTerm) ? '' : 'none';
-        });
+    // Filtering happens on the server; debounce so typing sends one request per pause
+    let searchTimer = null;
+    searchBox.addEventListener('input', () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(resetGroupList, 250);
+    });
+    [statusFilter, epicFilter, featureFilter, sortSelect].forEach(el => el.addEventListener('change', resetGroupList));
+    groupsSummary.addEventListener('click', (event) => {
+        if (event.target.id === 'live-refresh') resetGroupList();
     });
 
     // --- INITIALIZE THE APP ---
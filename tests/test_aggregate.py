@@ -0,0 +1,86 @@
+import itertools
+import random
+
+from analyzer.aggregate import FailureAggregate, merge_partials, write_partial
+from analyzer.records import FailureRecord
+
+FACETS = ('epic', 'feature', 'severity')
+
+
+def _shard_records(shard: int, rng: random.Random):
+    for file_no in range(40):
+        source = f"shard{shard}-{file_no}-result.json"
+        labels = tuple((name, f"{name}-{rng.randrange(3)}") for name in FACETS if rng.random() < 0.8)
+        seen = set()
+        for step in range(rng.randrange(1, 4)):
+            fingerprint = f"Error {rng.randrange(8)}|spec.ts:{rng.randrange(3)}:1"
+            exemplar = None
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                exemplar = {"name": f"test {file_no}", "fullName": f"suite#test {file_no}",
+                            "step_path": [f"step {step}"], "message": f"failure in {source}", "trace": "at x"}
+            yield FailureRecord(fingerprint, rng.choice(('failed', 'broken')), labels, source, exemplar)
+
+
+def _state(aggregate: FailureAggregate):
+    """Everything a merge must reproduce, without the order-dependent group ids."""
+    groups = {
+        fp: (g.count, g.failed, g.broken, aggregate.facet_index.group_counts(fp),
+             aggregate.facet_index.group_missing(fp), g.exemplars)
+        for fp, g in aggregate.groups.items()
+    }
+    metadata = aggregate.metadata()
+    return (groups, aggregate.total_failures, aggregate.failed, aggregate.broken,
+            metadata["facet_totals"], metadata["facet_missing"])
+
+
+def _aggregate(records):
+    aggregate = FailureAggregate(FACETS, max_exemplars=3)
+    aggregate.add_records(records)
+    return aggregate
+
+
+def test_merge_is_independent_of_order_and_tree_shape(tmp_path):
+    rng = random.Random(5)
+    shards = [list(_shard_records(i, rng)) for i in range(6)]
+    paths = []
+    for i, records in enumerate(shards):
+        path = str(tmp_path / f"shard{i}.partial.json.gz")
+        write_partial(_aggregate(records), path, "sig", sources=len({r.source for r in records}))
+        paths.append(path)
+
+    expected = _state(_aggregate(itertools.chain.from_iterable(shards)))
+
+    for order in (paths, paths[::-1], [paths[i] for i in (3, 0, 5, 1, 4, 2)]):
+        for workers in (1, 2, 3):
+            merged, header = merge_partials(order, max_workers=workers)
+            assert _state(merged) == expected
+            assert header["sources"] == 240 and header["signatures"] == ["sig"]
+
+    # Deeper trees: ((0 1) 2) and (3 (4 5)) merged into partials, then merged
+    left, right = str(tmp_path / "left.partial.json.gz"), str(tmp_path / "right.partial.json.gz")
+    inner, _ = merge_partials(paths[:2])
+    inner_path = str(tmp_path / "inner.partial.json.gz")
+    write_partial(inner, inner_path, "sig")
+    write_partial(merge_partials([paths[2], inner_path])[0], left, "sig")
+    write_partial(merge_partials(paths[3:])[0], right, "sig")
+    assert _state(merge_partials([right, left])[0]) == expected
+
+
+def test_in_memory_merge_matches_single_pass():
+    rng = random.Random(11)
+    shards = [list(_shard_records(i, rng)) for i in range(4)]
+    expected = _state(_aggregate(itertools.chain.from_iterable(shards)))
+
+    for order in itertools.permutations(range(4)):
+        merged = FailureAggregate(FACETS, max_exemplars=3)
+        for i in order:
+            merged.merge(_aggregate(shards[i]))
+        assert _state(merged) == expected
+
+    pairs = FailureAggregate(FACETS, max_exemplars=3)
+    pairs.merge(_aggregate(shards[0] + shards[3]))
+    second = _aggregate(shards[2])
+    second.merge(_aggregate(shards[1]))
+    pairs.merge(second)
+    assert _state(pairs) == expected
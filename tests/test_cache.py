@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from analyzer import ingestion
+from analyzer.cache import IngestionCache
+from analyzer.fingerprinter import Fingerprinter
+from analyzer.ingestion import iter_failures_from_allure, ingestion_cache_signature
+
+
+def _write_result(path, message, mtime_ns=None):
+    result = {"name": "login", "fullName": "suite#login", "status": "failed",
+              "labels": [{"name": "epic", "value": "Auth"}],
+              "steps": [{"name": "submit", "status": "failed", "statusDetails": {"message": message, "trace": ""}}]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _ingest(results_dir, cache_file, fingerprinter=None):
+    """(failure messages, cache hits, cache misses) of one cached ingestion run."""
+    fingerprinter = fingerprinter or Fingerprinter()
+    cache = IngestionCache(cache_file, ingestion_cache_signature(fingerprinter))
+    try:
+        records = list(iter_failures_from_allure(results_dir, max_workers=1, cache=cache,
+                                                 fingerprinter=fingerprinter))
+    finally:
+        cache.close()
+    return sorted(r.fingerprint.split('|')[0] for r in records), cache.hits, cache.misses
+
+
+@pytest.fixture
+def results(tmp_path):
+    results_dir = tmp_path / "allure-results"
+    results_dir.mkdir()
+    _write_result(results_dir / "a-result.json", "Login failed", mtime_ns=1_000_000_000)
+    _write_result(results_dir / "b-result.json", "Timeout", mtime_ns=1_000_000_000)
+    return str(results_dir), str(tmp_path / "cache.sqlite")
+
+
+def test_unchanged_files_are_served_from_the_cache(results):
+    results_dir, cache_file = results
+    assert _ingest(results_dir, cache_file) == (["Login failed", "Timeout"], 0, 2)
+    assert _ingest(results_dir, cache_file) == (["Login failed", "Timeout"], 2, 0)
+
+
+def test_rewritten_file_is_parsed_again(results):
+    results_dir, cache_file = results
+    _ingest(results_dir, cache_file)
+
+    # Different size
+    _write_result(os.path.join(results_dir, "a-result.json"), "Login failed badly", mtime_ns=1_000_000_000)
+    assert _ingest(results_dir, cache_file) == (["Login failed badly", "Timeout"], 1, 1)
+
+    # Same size, new mtime
+    _write_result(os.path.join(results_dir, "b-result.json"), "Tymeout", mtime_ns=2_000_000_000)
+    assert _ingest(results_dir, cache_file) == (["Login failed badly", "Tymeout"], 1, 1)
+
+
+def test_deleted_file_is_forgotten(results):
+    results_dir, cache_file = results
+    _ingest(results_dir, cache_file)
+    os.remove(os.path.join(results_dir, "b-result.json"))
+    assert _ingest(results_dir, cache_file) == (["Login failed"], 1, 0)
+
+
+def test_version_change_discards_the_cache(results, monkeypatch):
+    results_dir, cache_file = results
+    _ingest(results_dir, cache_file)
+    monkeypatch.setattr(ingestion, 'INGESTION_CACHE_VERSION', ingestion.INGESTION_CACHE_VERSION + 1)
+    assert _ingest(results_dir, cache_file) == (["Login failed", "Timeout"], 0, 2)
+
+
+def test_rule_change_discards_the_cache(results):
+    results_dir, cache_file = results
+    _ingest(results_dir, cache_file)
+    renamed = Fingerprinter(rules=[{"pattern": r"Timeout", "replacement": "Step timed out"}])
+    assert _ingest(results_dir, cache_file, renamed) == (["Login failed", "Step timed out"], 0, 2)
+    # Only the literal differs: still a different rule set
+    literal = Fingerprinter(rules=[{"pattern": r"Timeout", "replacement": "Step timed out", "literal": "time"}])
+    assert _ingest(results_dir, cache_file, literal) == (["Login failed", "Step timed out"], 0, 2)
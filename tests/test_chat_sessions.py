@@ -0,0 +1,132 @@
+import pytest
+
+import server
+from analyzer.chat_sessions import ChatSessionStore, truncate_history
+from analyzer.model_calls import FakeModelClient, ModelCallExecutor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_session_is_evicted():
+    store = ChatSessionStore(max_sessions=2, ttl_seconds=60, clock=Clock())
+    store.put('a', ['a1'])
+    store.put('b', ['b1'])
+    assert store.get('a') == ['a1']  # 'b' is now the least recently used
+    store.put('c', ['c1'])
+
+    assert len(store) == 2
+    assert store.get('b') is None
+    assert store.get('a') == ['a1']
+    assert store.get('c') == ['c1']
+
+
+def test_idle_sessions_expire():
+    clock = Clock()
+    store = ChatSessionStore(max_sessions=10, ttl_seconds=60, clock=clock)
+    store.put('old', ['o1'])
+    clock.now = 30
+    store.put('new', ['n1'])
+    clock.now = 61
+
+    assert store.get('old') is None
+    assert store.get('new') == ['n1']
+    clock.now = 200
+    assert store.get('new') is None
+    assert len(store) == 0
+
+
+def test_get_returns_a_copy():
+    store = ChatSessionStore()
+    history = ['q1', 'a1']
+    store.put('s', history)
+    history.append('changed by the caller')
+    copy = store.get('s')
+    copy.append('q2')
+
+    assert store.get('s') == ['q1', 'a1']
+
+
+def test_truncate_history_keeps_head_and_newest_turns():
+    history = ['prime-q', 'prime-a'] + [f'{role}{i}' for i in range(6) for role in ('q', 'a')]
+    summarized = []
+
+    def summarize(dropped):
+        summarized.append(list(dropped))
+        return ['summary-q', 'summary-a']
+
+    result = truncate_history(history, keep_head=2, max_messages=5, summarize=summarize)
+
+    # 12 body messages, 5 kept, rounded up to whole turns: the 4 newest messages survive
+    assert result == ['prime-q', 'prime-a', 'summary-q', 'summary-a', 'q4', 'a4', 'q5', 'a5']
+    assert summarized == [['q0', 'a0', 'q1', 'a1', 'q2', 'a2', 'q3', 'a3']]
+    assert truncate_history(history[:6], keep_head=2, max_messages=5, summarize=summarize) == history[:6]
+
+
+def test_chat_history_stays_bounded(monkeypatch):
+    fake = FakeModelClient(latency=0)
+    executor = ModelCallExecutor()
+    sessions = ChatSessionStore()
+    monkeypatch.setattr(server, 'client', fake)
+    monkeypatch.setattr(server, '_client_initialized', True)
+    monkeypatch.setattr(server, 'model_calls', executor)
+    monkeypatch.setattr(server, 'chat_sessions', sessions)
+    monkeypatch.setattr(server, 'MAX_HISTORY_TURNS', 2)
+    client = server.app.test_client()
+
+    for i in range(6):
+        response = client.post('/chat', json={"question": f"question {i}", "session_id": "s"})
+        assert response.status_code == 200
+    executor.shutdown()
+
+    history = sessions.get('s')
+    # Priming, one summary exchange and the two newest turns
+    assert len(history) == 2 + 2 + 2 * 2
+    assert history[2].parts[0].text.startswith(server._SUMMARY_PREFIX)
+    assert "question 0" in history[2].parts[0].text
+    assert history[-2].parts[0].text == "question 5"
+    assert fake.calls == 6
+
+
+@pytest.mark.parametrize("budget", [50, 200, 1000])
+def test_fit_to_budget_trims_items(budget):
+    from analyzer.ai_tools import estimate_tokens, fit_to_budget
+
+    payload = {"title": "report", "groups": [{"id": i, "message": "x" * 100} for i in range(50)]}
+    result = fit_to_budget(payload, "groups", budget)
+
+    kept = result["groups"]
+    assert kept == payload["groups"][:len(kept)]
+    assert len(kept) >= 1
+    assert result["omitted"] == 50 - len(kept)
+    if len(kept) > 1:
+        assert estimate_tokens(result) <= budget + estimate_tokens(result["note"]) + 10
+
+
+def test_fit_to_budget_keeps_everything_within_budget():
+    from analyzer.ai_tools import fit_to_budget
+
+    payload = {"groups": [{"id": 1}, {"id": 2}]}
+    assert fit_to_budget(payload, "groups", 1000) == payload
+
+
+def test_report_summary_and_group_details_fit_budget():
+    from analyzer.ai_tools import estimate_tokens, group_details, report_summary
+
+    groups = [{"id": i, "title": f"Error {i} " + "y" * 500, "count": i,
+               "status_counts": {"failed": i}, "example": {"message": "m" * 2000, "test_name": f"t{i}"}}
+              for i in range(1, 101)]
+    summary = report_summary({"metadata": {"total_failures": 5050}, "groups": groups}, top_k=None,
+                             token_budget=1500)
+    assert summary["groups"][0]["id"] == 100  # largest first
+    assert summary["omitted"] == 100 - len(summary["groups"])
+    assert estimate_tokens(summary) < 1500 + 100
+
+    details = group_details(groups[0], "trace line\n" * 10_000, token_budget=800)
+    assert "more characters" in details["example_trace"]
+    assert estimate_tokens(details) < 800 + 50
@@ -0,0 +1,87 @@
+import pytest
+
+from analyzer.diff import GroupCounts, baseline_counts, diff_group_counts, fingerprint_hash, group_hash
+
+
+def _counts(**counts):
+    return {key: GroupCounts(None, key, '', count, count, 0) for key, count in counts.items()}
+
+
+def _bucket(result, key):
+    for kind in ('new', 'resolved', 'grown', 'shrunk'):
+        if any(change['fingerprint_hash'] == key for change in result[kind]):
+            return kind
+    return 'unchanged'
+
+
+# (base count or None, head count or None, bucket) with the defaults min_change=2, min_ratio=0.25
+@pytest.mark.parametrize("base, head, bucket", [
+    (None, 1, 'new'),
+    (0, 3, 'new'),               # absent from every baseline run
+    (5, None, 'resolved'),
+    (10, 10, 'unchanged'),
+    (10, 12, 'unchanged'),       # +2 but below 25%
+    (10, 13, 'grown'),           # +3 and 30%
+    (8, 10, 'grown'),            # exactly at both thresholds
+    (8, 6, 'shrunk'),            # exactly at both thresholds, downwards
+    (8, 9, 'unchanged'),         # 1 < min_change
+    (4, 5, 'unchanged'),         # 25% but 1 < min_change
+    (100, 124, 'unchanged'),     # 24 < 25% of 100
+    (100, 125, 'grown'),
+    (100, 75, 'shrunk'),
+    (2, 0, 'shrunk'),            # still reported with a count of 0
+])
+def test_buckets(base, head, bucket):
+    result = diff_group_counts(_counts(g=base) if base is not None else {},
+                               _counts(g=head) if head is not None else {})
+    assert _bucket(result, 'g') == bucket
+    assert sum(result['counts'].values()) == 1
+
+
+@pytest.mark.parametrize("min_change, min_ratio, bucket", [
+    (2, 0.25, 'grown'),
+    (3, 0.25, 'unchanged'),
+    (2, 0.3, 'unchanged'),
+    (0, 0, 'grown'),
+])
+def test_thresholds_are_inclusive(min_change, min_ratio, bucket):
+    result = diff_group_counts(_counts(g=8), _counts(g=10), min_change=min_change, min_ratio=min_ratio)
+    assert _bucket(result, 'g') == bucket
+
+
+def test_ordering_limit_and_totals():
+    base = _counts(a=10, b=10, c=3, d=20, e=1)
+    head = _counts(a=30, b=15, d=5, f=4, g=9)
+    result = diff_group_counts(base, head, limit=1)
+
+    assert result['counts'] == {'new': 2, 'resolved': 2, 'grown': 2, 'shrunk': 1, 'unchanged': 0}
+    assert [c['fingerprint_hash'] for c in result['new']] == ['g']
+    assert [c['fingerprint_hash'] for c in result['resolved']] == ['c']
+    assert [c['fingerprint_hash'] for c in result['grown']] == ['a']
+    assert result['shrunk'][0] == {"fingerprint_hash": 'd', "id": None, "base_id": None, "title": 'd', "where": '',
+                                   "base_count": 20, "count": 5, "change": -15}
+    assert (result['base_failures'], result['failures']) == (44, 63)
+    assert (result['base_groups'], result['groups']) == (5, 5)
+
+
+def test_baseline_is_the_mean_over_runs():
+    runs = [_counts(a=6, b=3, d=20), _counts(a=2, d=20), _counts(a=4, c=5, d=20)]  # newest first
+    baseline = baseline_counts(runs)
+
+    assert baseline['a'].count == 4
+    assert baseline['b'].count == 1       # 0 in the runs without it
+    assert baseline['c'].count == 1.67
+    assert baseline['d'].count == 20
+    assert baseline_counts([]) == {}
+
+    result = diff_group_counts(baseline, _counts(a=6, b=3, c=3, d=24))
+    assert _bucket(result, 'a') == 'grown'       # +2 on a mean of 4
+    assert _bucket(result, 'b') == 'grown'       # +2 on a mean of 1
+    assert _bucket(result, 'c') == 'unchanged'   # +1.33 < min_change
+    assert _bucket(result, 'd') == 'unchanged'   # +4 < 25% of 20
+
+
+def test_group_hash_falls_back_to_the_fingerprint():
+    assert group_hash({"fingerprint_hash": "abc"}) == "abc"
+    assert group_hash({"fingerprint_what": "Timeout", "fingerprint_where": "a.spec.ts:1:2"}) == \
+        fingerprint_hash("Timeout|a.spec.ts:1:2")
@@ -0,0 +1,21 @@
+from analyzer.fingerprinter import Fingerprinter, _required_literal
+
+
+def test_required_literal_skips_escape_arguments():
+    assert _required_literal(r"Error \x41BC timeout") == "bc timeout"
+    assert _required_literal(r"\N{LATIN CAPITAL LETTER A}BC timeout") == "bc timeout"
+    assert _required_literal(r"abc\0123def") == "3def"
+    assert _required_literal(r"(a)bc\1 timeout") == " timeout"
+    assert _required_literal(r"foo\.bar") == "foo.bar"
+
+
+def test_rule_with_hex_escape_fires():
+    fingerprinter = Fingerprinter(rules=[{"pattern": r"Error \x41BC timeout", "replacement": "ABC timed out"}])
+    fingerprint = fingerprinter.create_fingerprint({"message": "Error ABC timeout after 5s", "trace": ""})
+    assert fingerprint.startswith("ABC timed out|")
+
+
+def test_rules_signature_includes_literal():
+    rule = {"pattern": r"Error \x41BC timeout", "replacement": "ABC timed out"}
+    assert (Fingerprinter(rules=[rule]).rules_signature()
+            != Fingerprinter(rules=[{**rule, "literal": "timeout"}]).rules_signature())
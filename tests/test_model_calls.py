@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+import server
+from analyzer.model_calls import FakeModelClient, ModelBusyError, ModelCallExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = ModelCallExecutor(max_concurrent=1, max_queued=0)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    fake = FakeModelClient(latency=0.3)
+    monkeypatch.setattr(server, 'client', fake)
+    monkeypatch.setattr(server, '_client_initialized', True)
+    client = server.app.test_client()
+    return fake, lambda: client.post('/chat', json={"question": "What failed?", "session_id": "test"})
+
+
+def test_identical_calls_are_coalesced():
+    fake = FakeModelClient(latency=0.2)
+    executor = ModelCallExecutor(max_concurrent=4, max_queued=4)
+    results = []
+
+    def ask():
+        results.append(executor.run(('summary', 'report'), fake.models.generate_content, 'model', 'prompt'))
+
+    threads = [threading.Thread(target=ask) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    executor.shutdown()
+
+    assert fake.calls == 1
+    assert executor.stats()["coalesced"] == 5
+    assert len({id(result) for result in results}) == 1
+
+
+def test_full_queue_rejects(executor):
+    fake = FakeModelClient(latency=0.2)
+    executor.submit(None, fake.models.generate_content, 'model', 'first')
+    with pytest.raises(ModelBusyError):
+        executor.submit(None, fake.models.generate_content, 'model', 'second')
+    assert executor.stats()["rejected"] == 1
+
+
+def test_chat_returns_503_when_queue_is_full(chat, executor, monkeypatch):
+    fake, post = chat
+    monkeypatch.setattr(server, 'model_calls', executor)
+    release = threading.Event()
+    executor.submit(None, release.wait)  # holds the only slot
+
+    response = post()
+    release.set()
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    assert fake.calls == 0
+
+
+def test_chat_returns_504_on_timeout(chat, monkeypatch):
+    fake, post = chat
+    executor = ModelCallExecutor(max_concurrent=1, max_queued=1)
+    monkeypatch.setattr(server, 'model_calls', executor)
+    monkeypatch.setattr(server, 'MODEL_CALL_TIMEOUT', 0.05)
+
+    response = post()
+    executor.shutdown()
+    assert response.status_code == 504
+
+
+def test_chat_answers_with_fake_model(chat, monkeypatch):
+    fake, post = chat
+    executor = ModelCallExecutor()
+    monkeypatch.setattr(server, 'model_calls', executor)
+
+    response = post()
+    executor.shutdown()
+    assert response.status_code == 200
+    assert "fake model" in response.get_json()["response"]
+    assert fake.calls == 1
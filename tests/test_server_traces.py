@@ -0,0 +1,30 @@
+import os
+
+import server
+from analyzer.aggregate import FailureAggregate
+from analyzer.records import FailureRecord
+from analyzer.reporting import generate_report_json
+
+
+def test_traces_follow_the_output_report_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(server, 'REPORT_JSON_NAME', 'nightly.json')
+    aggregate = FailureAggregate()
+    aggregate.add(FailureRecord('Timeout|login.spec.ts:3:1', 'failed', (), 'a-result.json',
+                                {"name": "login", "fullName": "suite#login", "step_path": ["submit"],
+                                 "message": "Timeout", "trace": "at login.spec.ts:3:1"}))
+    report = generate_report_json([(g.fingerprint, g) for g in aggregate.ranked()],
+                                  {'output_report_file': 'nightly.html'}, facet_index=aggregate.facet_index)
+    assert os.path.basename(report) == 'nightly.json'
+    timestamp = os.path.basename(os.path.dirname(report))
+    client = server.app.test_client()
+
+    response = client.get(f'/reports/{timestamp}/groups/1/trace')
+    assert response.status_code == 200
+    assert response.get_json()["trace"] == "at login.spec.ts:3:1"
+
+    response = client.get(f'/reports/{timestamp}/traces')
+    assert response.status_code == 200
+    assert b"at login.spec.ts:3:1" in response.data
+
+    assert client.get('/reports/1999-01-01_00-00-00/traces').status_code == 404
@@ -0,0 +1,35 @@
+import math
+
+import numpy as np
+
+from analyzer.trend_analytics import analyze_matrix
+
+
+def _spikes(row, window, spike_z):
+    """Reference spike flags of one row, computed with Python numbers."""
+    flags = []
+    for j in range(window, len(row)):
+        trailing = row[j - window:j]
+        mean = sum(trailing) / window
+        std = math.sqrt(max(sum(c * c for c in trailing) / window - mean * mean, 0))
+        noise = max(std, math.sqrt(mean), 1)
+        flags.append(row[j] > mean and (row[j] - mean) ** 2 > (spike_z * noise) ** 2)
+    return flags
+
+
+def test_spikes_with_large_counts():
+    rng = np.random.default_rng(7)
+    base = rng.integers(2_000, 60_000, size=(40, 1)).astype(np.int32)
+    counts = (base + rng.integers(-500, 500, size=(40, 30))).astype(np.int32)
+    counts[::3, -1] *= 4  # a spike in the latest run of every third fingerprint
+    counts[1, 12] = 2_000_000_000
+
+    metrics = analyze_matrix(counts, window=5, spike_z=3.0)
+
+    rows = counts.astype(np.int64).tolist()
+    assert metrics["total"].tolist() == [sum(row) for row in rows]
+    assert metrics["moving_average"].tolist() == [sum(row[-5:]) / 5 for row in rows]
+    expected = [_spikes(row, 5, 3.0) for row in rows]
+    assert metrics["spike_count"].tolist() == [sum(flags) for flags in expected]
+    assert metrics["spike_latest"].tolist() == [flags[-1] for flags in expected]
+    assert metrics["spike_latest"][::3].all()